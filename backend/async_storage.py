@@ -0,0 +1,116 @@
+# async_storage.py
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import storage
+
+# Storage calls are blocking sqlite3 calls, so async code must never make
+# them on the event loop. Writes are handed to storage's group-commit writer
+# thread and awaited through their commit futures; reads (and the encoding of
+# large results) get a small pool of their own because WAL lets them run
+# alongside the writer. Each thread keeps
+# its own pooled connection from db.py.
+_read_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='db-reader')
+
+
+async def _run(executor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def store_scan(scan_id, domain, start_time):
+    """Async version of storage.store_scan."""
+    return await asyncio.wrap_future(storage.submit_store_scan(scan_id, domain, start_time))
+
+
+async def enqueue_scan(scan_id, domain, start_time, priority=storage.INTERACTIVE, submitter=''):
+    """Async version of storage.enqueue_scan."""
+    return await asyncio.wrap_future(storage.submit_enqueue_scan(scan_id, domain, start_time, priority, submitter))
+
+
+async def request_scan(scan_id, domain, start_time, priority=storage.INTERACTIVE, submitter='', max_age=None, force=False):
+    """Async version of storage.request_scan."""
+    return await asyncio.wrap_future(
+        storage.submit_request_scan(scan_id, domain, start_time, priority, submitter, max_age, force)
+    )
+
+
+async def enqueue_batch(batch_id, scans, start_time, priority=storage.BULK, submitter='', max_age=None, force=False):
+    """Async version of storage.enqueue_batch."""
+    return await asyncio.wrap_future(
+        storage.submit_enqueue_batch(batch_id, scans, start_time, priority, submitter, max_age, force)
+    )
+
+
+async def get_batch(batch_id):
+    """Async version of storage.get_batch."""
+    return await _run(_read_executor, storage.get_batch, batch_id)
+
+
+async def update_scan_results(scan_id, results, end_time, sources=None, status='completed'):
+    """Async version of storage.update_scan_results."""
+    # Splitting and compressing big results is CPU work, so it happens off the loop too
+    future = await _run(_read_executor, storage.submit_update_scan_results, scan_id, results, end_time, sources,
+                        status)
+    return await asyncio.wrap_future(future)
+
+
+async def update_tool_states(scan_id, states):
+    """Async version of storage.update_tool_states."""
+    return await asyncio.wrap_future(storage.submit_update_tool_states(scan_id, states))
+
+
+async def get_scan_events(scan_ids, after_id, limit=1000):
+    """Async version of storage.get_scan_events."""
+    return await _run(_read_executor, storage.get_scan_events, scan_ids, after_id, limit)
+
+
+async def last_event_id():
+    """Async version of storage.last_event_id."""
+    return await _run(_read_executor, storage.last_event_id)
+
+
+async def cancel_scan(scan_id):
+    """Async version of storage.cancel_scan."""
+    return await asyncio.wrap_future(storage.submit_cancel_scan(scan_id))
+
+
+async def get_scan_by_id(scan_id):
+    """Async version of storage.get_scan_by_id."""
+    return await _run(_read_executor, storage.get_scan_by_id, scan_id)
+
+
+async def list_scans(limit=50, cursor=None, domain=None, status=None):
+    """Async version of storage.list_scans."""
+    return await _run(_read_executor, storage.list_scans, limit=limit, cursor=cursor, domain=domain, status=status)
+
+
+async def get_findings(scan_id, kind):
+    """Async version of storage.get_findings."""
+    return await _run(_read_executor, storage.get_findings, scan_id, kind)
+
+
+async def count_findings(scan_id):
+    """Async version of storage.count_findings."""
+    return await _run(_read_executor, storage.count_findings, scan_id)
+
+
+async def find_asset_sightings(kind, value):
+    """Async version of storage.find_asset_sightings."""
+    return await _run(_read_executor, storage.find_asset_sightings, kind, value)
+
+
+async def find_related_domains(domain):
+    """Async version of storage.find_related_domains."""
+    return await _run(_read_executor, storage.find_related_domains, domain)
+
+
+async def get_scan_diff(scan_id):
+    """Async version of storage.get_scan_diff."""
+    return await _run(_read_executor, storage.get_scan_diff, scan_id)
+
+
+async def scheduler_stats():
+    """Async version of storage.scheduler_stats."""
+    return await _run(_read_executor, storage.scheduler_stats)
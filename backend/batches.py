@@ -0,0 +1,51 @@
+# batches.py
+import re
+from urllib.parse import urlsplit
+
+# Most domains one batch may hold
+MAX_BATCH_DOMAINS = 10000
+
+# Largest domain list file accepted by POST /batches/upload
+MAX_UPLOAD_BYTES = 2 * 1024 * 1024
+
+_LABEL = r'(?!-)[a-z0-9-]{1,63}(?<!-)'
+_HOSTNAME = re.compile(rf'^(?=.{{1,253}}$){_LABEL}(?:\.{_LABEL})+$')
+
+
+def normalize_domain(value):
+    """Return value as a lowercase hostname, or None if it is not a valid domain.
+
+    Accepts surrounding whitespace, a trailing dot and URLs
+    ("https://example.com/about" gives "example.com").
+    """
+    value = value.strip().lower()
+    if '://' in value:
+        value = urlsplit(value).hostname or ''
+    value = value.rstrip('.')
+    return value if _HOSTNAME.match(value) else None
+
+
+def parse_domains(entries):
+    """Validate and deduplicate domains in one pass.
+
+    entries are raw strings: the items of a JSON list, or the lines of an
+    uploaded file (blank lines and # comments are skipped; for CSV only the
+    first column is read). Returns (domains, duplicates, invalid): the
+    valid domains in first-seen order, how many repeats were dropped, and
+    {'line', 'value'} for each invalid entry (1-based line numbers).
+    """
+    domains = {}
+    duplicates = 0
+    invalid = []
+    for line, entry in enumerate(entries, 1):
+        entry = str(entry).split(',', 1)[0].strip()
+        if not entry or entry.startswith('#'):
+            continue
+        domain = normalize_domain(entry)
+        if domain is None:
+            invalid.append({'line': line, 'value': entry})
+        elif domain in domains:
+            duplicates += 1
+        else:
+            domains[domain] = None
+    return list(domains), duplicates, invalid
@@ -0,0 +1,78 @@
+"""Wordlist brute force: one dnspython query per name vs the pipelined engine.
+
+Run from the backend directory:
+
+    python benchmarks/bench_bruteforce.py [--words 20000] [--hit-rate 0.01] [--concurrency 500]
+
+Both sides resolve "<word>.example.com" for every word of a generated
+wordlist against the local stub DNS server from tests/dns_stub.py, with the
+same number of queries in flight. "resolver" is resolver.AsyncResolver (a
+socket and a coroutine per query, A records only, cold cache); "engine" is
+bruteforce.BruteForcer. The stub answers from a single Python thread, so
+absolute rates are bounded by it; the comparison is what matters.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+
+from bruteforce import BruteForcer
+from dns_cache import DNSCache
+from dns_stub import StubDNSServer
+from resolver import AsyncResolver
+
+
+def make_zone(words, hit_rate):
+    step = max(1, int(1 / hit_rate))
+    return {f"{word}.example.com": {"A": ["192.0.2.1"]} for word in words[::step]}
+
+
+async def run_resolver(server, words, concurrency):
+    resolver = AsyncResolver(nameservers=[server.address], port=server.port,
+                             concurrency=concurrency, cache=DNSCache())
+    records = await resolver.resolve_many([f"{word}.example.com" for word in words], rdtypes=('A',))
+    return sum(1 for answer in records.values() if answer['A'])
+
+
+async def run_engine(server, wordlist, concurrency):
+    engine = BruteForcer([server.address], port=server.port, concurrency=concurrency, cache=DNSCache())
+    result = await engine.run('example.com', wordlist)
+    return len(result['subdomains'])
+
+
+def measure(label, server, coroutine, count):
+    started = time.perf_counter()
+    found = asyncio.run(coroutine)
+    elapsed = time.perf_counter() - started
+    print(f"{label:>9}: {count / elapsed:8,.0f} names/s  ({found} found, {elapsed:.2f}s)")
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--hit-rate', type=float, default=0.01)
+    parser.add_argument('--concurrency', type=int, default=500)
+    args = parser.parse_args()
+
+    words = [f"w{i:07d}" for i in range(args.words)]
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write("\n".join(words))
+        wordlist = f.name
+
+    try:
+        with StubDNSServer(make_zone(words, args.hit_rate)) as server:
+            before = measure("resolver", server, run_resolver(server, words, args.concurrency), len(words))
+            after = measure("engine", server, run_engine(server, wordlist, args.concurrency), len(words))
+        print(f"  speedup: x{after / before:.1f}")
+    finally:
+        os.unlink(wordlist)
+
+
+if __name__ == '__main__':
+    main()
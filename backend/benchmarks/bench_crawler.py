@@ -0,0 +1,97 @@
+"""Social profile crawling: requests + BeautifulSoup vs the pooled async crawler.
+
+Run from the backend directory:
+
+    python benchmarks/bench_crawler.py [--sites 30] [--anchors 2000] [--latency 0.02]
+
+Each site is a local HTTP server (tests/site_stub.py) with a homepage,
+/about and /contact of `anchors` links each, answering after `latency`
+seconds. "requests" fetches every page the way get_social_profiles used
+to: one blocking requests.get (new connection) per page, parsed with
+BeautifulSoup's html.parser. "crawler" is crawler.Crawler: all sites at
+once over one connection pool, links extracted while pages stream in.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import requests
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+
+from crawler import Crawler, DEFAULT_PATHS
+from site_stub import StubSite
+
+
+def make_page(anchors):
+    links = ''.join(
+        f'<li><a class="nav-link" href="/page/{i}">Page {i}</a> some text around the link</li>\n'
+        for i in range(anchors)
+    )
+    social = '<a href="https://twitter.com/example">Twitter</a><a href="https://linkedin.com/company/example">In</a>'
+    return f'<html><body><ul>{links}</ul><footer>{social}</footer></body></html>'.encode()
+
+
+def serve_sites(count, page, latency):
+    """Start the sites on a loop in a background thread; returns (sites, loop)."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    pages = {path: (200, 'text/html', page) for path in DEFAULT_PATHS}
+
+    async def start():
+        return [await StubSite(pages, delay=latency).start() for _ in range(count)]
+
+    return asyncio.run_coroutine_threadsafe(start(), loop).result(), loop
+
+
+def run_requests(sites):
+    found = 0
+    for site in sites:
+        for path in DEFAULT_PATHS:
+            response = requests.get(site.base_url + path.lstrip('/'), timeout=5)
+            soup = BeautifulSoup(response.text, 'html.parser')
+            found += len(soup.find_all('a', href=True))
+    return found
+
+
+def run_crawler(sites):
+    async def crawl():
+        crawler = Crawler()
+        crawls = await asyncio.gather(*(crawler.crawl(site.base_url) for site in sites))
+        return sum(len(page['links']) for crawl in crawls for page in crawl['pages'])
+
+    return asyncio.run(crawl())
+
+
+def measure(label, function, sites):
+    started = time.perf_counter()
+    found = function(sites)
+    elapsed = time.perf_counter() - started
+    pages = len(sites) * len(DEFAULT_PATHS)
+    print(f"{label:>8}: {pages / elapsed:8.1f} pages/s  ({found} links, {elapsed:.2f}s)")
+    return pages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', type=int, default=30)
+    parser.add_argument('--anchors', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    page = make_page(args.anchors)
+    sites, loop = serve_sites(args.sites, page, args.latency)
+    print(f"{args.sites} sites x {len(DEFAULT_PATHS)} pages of {len(page) / 1024:.0f} KB")
+    before = measure("requests", run_requests, sites)
+    after = measure("crawler", run_crawler, sites)
+    print(f"  speedup: x{after / before:.1f}")
+    loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == '__main__':
+    main()
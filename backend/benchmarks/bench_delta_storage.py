@@ -0,0 +1,86 @@
+"""Storage volume of daily re-scans: full copies vs delta storage.
+
+Run from the backend directory:
+
+    python benchmarks/bench_delta_storage.py [--days 30] [--subdomains 5000] [--churn 0.01]
+
+Simulates one domain re-scanned every day with a small fraction of its
+subdomains changing, and reports the findings rows written, database size
+and read time with SNAPSHOT_INTERVAL=1 (every scan a full copy) and with the
+default snapshot interval.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import storage
+
+
+def daily_results(days, size, churn):
+    rng = random.Random(42)
+    current = [f"host{i}.example.com" for i in range(size)]
+    next_id = size
+    for _ in range(days):
+        yield list(current)
+        for _ in range(int(size * churn)):
+            current.pop(rng.randrange(len(current)))
+            current.append(f"host{next_id}.example.com")
+            next_id += 1
+
+
+def run(label, snapshot_interval, args):
+    temp_dir = tempfile.mkdtemp()
+    default_interval = storage.SNAPSHOT_INTERVAL
+    storage.SNAPSHOT_INTERVAL = snapshot_interval
+    try:
+        storage.DB_FILE = os.path.join(temp_dir, 'bench.db')
+        storage.init_db()
+
+        start = datetime(2024, 1, 1)
+        started = time.perf_counter()
+        for day, subdomains in enumerate(daily_results(args.days, args.subdomains, args.churn)):
+            scan_id = f"day-{day}"
+            storage.store_scan(scan_id, 'example.com', start + timedelta(days=day))
+            storage.update_scan_results(scan_id, {"subdomains": subdomains, "errors": []}, start + timedelta(days=day, hours=1))
+        write_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for day in range(args.days):
+            storage.get_scan_by_id(f"day-{day}")
+        read_time = (time.perf_counter() - started) / args.days
+
+        conn = storage._connection()
+        rows = conn.execute('SELECT COUNT(*) FROM findings').fetchone()[0]
+        db.close_all()
+        size = os.path.getsize(storage.DB_FILE)
+        print(f"{label:>6}: {rows:>9,} findings rows  {size / 1e6:7.1f} MB  "
+              f"write {write_time:5.2f}s  read {read_time * 1000:6.1f} ms/scan")
+        return rows, size
+    finally:
+        storage.SNAPSHOT_INTERVAL = default_interval
+        db.close_all()
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--subdomains', type=int, default=5000)
+    parser.add_argument('--churn', type=float, default=0.01)
+    args = parser.parse_args()
+
+    full_rows, full_size = run("full", 1, args)
+    delta_rows, delta_size = run("delta", storage.SNAPSHOT_INTERVAL, args)
+    print(f" ratio: rows x{full_rows / delta_rows:.1f}  size x{full_size / delta_size:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Tool output extraction: a pattern and a pass per kind vs the single-pass extractor.
+
+Run from the backend directory:
+
+    python benchmarks/bench_extract.py [--megabytes 8] [--chunk-kb 64]
+
+The input is the recorded theHarvester report from tests/fixtures, repeated
+with fresh hostnames, emails and addresses until it reaches the requested
+size. "per-kind" is how the tool output used to be parsed: patterns built
+for the scan, and the text split into lines and searched once per kind of
+finding. "extractor" is extract.Extractor fed the same text as bytes, in
+chunks, the way it arrives from a tool's stdout.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from extract import Extractor
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures', 'theharvester_output.txt')
+
+
+def make_output(megabytes):
+    with open(FIXTURE) as f:
+        report = f.read()
+    parts, size, i = [], 0, 0
+    while size < megabytes * 1024 * 1024:
+        part = (report.replace('mail.example.com', f'mail{i}.example.com')
+                      .replace('admin@', f'admin{i}@')
+                      .replace('192.0.2.1', f'192.0.{i % 256}.{i // 256 % 256}'))
+        parts.append(part)
+        size += len(part)
+        i += 1
+    return ''.join(parts)
+
+
+def run_per_kind(text, domain):
+    patterns = {
+        'subdomains': re.compile(r'(?:[\w-]+\.)+' + re.escape(domain)),
+        'emails': re.compile(r'[\w\.-]+@[\w\.-]+\.\w+'),
+        'ips': re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b'),
+        'urls': re.compile(r'https?://[^\s"\'<>]+'),
+    }
+    found = {kind: set() for kind in patterns}
+    for kind, pattern in patterns.items():
+        for line in text.splitlines():
+            found[kind].update(pattern.findall(line))
+    return sum(len(values) for values in found.values())
+
+
+def run_extractor(data, domain, chunk_size):
+    extractor = Extractor(domain)
+    count = 0
+    for i in range(0, len(data), chunk_size):
+        count += len(extractor.feed(data[i:i + chunk_size]))
+    return count + len(extractor.close())
+
+
+def measure(label, function, *args, megabytes):
+    started = time.perf_counter()
+    found = function(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label:>9}: {megabytes / elapsed:8.1f} MB/s  ({found} findings, {elapsed:.2f}s)")
+    return megabytes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--megabytes', type=float, default=8)
+    parser.add_argument('--chunk-kb', type=int, default=64)
+    args = parser.parse_args()
+
+    text = make_output(args.megabytes)
+    data = text.encode()
+    megabytes = len(data) / 1024 / 1024
+    print(f"{megabytes:.1f} MB of theHarvester output")
+    before = measure("per-kind", run_per_kind, text, 'example.com', megabytes=megabytes)
+    after = measure("extractor", run_extractor, data, 'example.com', args.chunk_kb * 1024, megabytes=megabytes)
+    print(f"  speedup: x{after / before:.1f}")
+
+
+if __name__ == '__main__':
+    main()
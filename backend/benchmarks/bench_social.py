@@ -0,0 +1,80 @@
+"""Social link detection: substring checks per platform vs the hostname-indexed classifier.
+
+Run from the backend directory:
+
+    python benchmarks/bench_social.py [--anchors 50000] [--distinct 0.5]
+
+The links are those of a big page: mostly the site's own pages, some
+share buttons and look-alike hosts, and a few profile links, with a
+`distinct` share of unique links. "substring" is the loop
+get_social_profiles used to run (every link against every platform host,
+matches appended as they are), extended to the same platforms; "classifier"
+is social.find_profiles.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from social import PLATFORMS, find_profiles
+
+SOCIAL_DOMAINS = [host for hosts, _, _, _ in PLATFORMS.values() for host in hosts]
+
+
+def make_links(count, distinct):
+    rng = random.Random(0)
+    unique = max(1, int(count * distinct))
+    pool = []
+    for i in range(unique):
+        kind = rng.random()
+        if kind < 0.90:
+            pool.append(f"https://www.example.com/catalog/item-{i}?ref=nav")
+        elif kind < 0.95:
+            pool.append(f"https://www.facebook.com/sharer/sharer.php?u=https%3A%2F%2Fexample.com%2F{i}")
+        elif kind < 0.97:
+            pool.append(f"https://notfacebook.com/page-{i}")
+        else:
+            host = rng.choice(SOCIAL_DOMAINS)
+            pool.append(f"https://www.{host}/acme{i % 7}/?utm_source=site")
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def run_substring(links):
+    profiles = []
+    for href in links:
+        for social_domain in SOCIAL_DOMAINS:
+            if social_domain in href:
+                profiles.append(href)
+    return len(profiles)
+
+
+def run_classifier(links):
+    return len(find_profiles(links))
+
+
+def measure(label, function, links):
+    started = time.perf_counter()
+    found = function(links)
+    elapsed = time.perf_counter() - started
+    print(f"{label:>10}: {len(links) / elapsed:10,.0f} links/s  ({found} profiles, {elapsed * 1000:.1f} ms)")
+    return len(links) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anchors', type=int, default=50000)
+    parser.add_argument('--distinct', type=float, default=0.5)
+    args = parser.parse_args()
+
+    links = make_links(args.anchors, args.distinct)
+    print(f"{len(links)} links, {len(set(links))} distinct, {len(PLATFORMS)} platforms")
+    before = measure("substring", run_substring, links)
+    after = measure("classifier", run_classifier, links)
+    print(f"  speedup: x{after / before:.1f}")
+
+
+if __name__ == '__main__':
+    main()
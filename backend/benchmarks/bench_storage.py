@@ -0,0 +1,132 @@
+"""Storage throughput benchmark: per-call connections vs the pooled layer.
+
+Run from the backend directory:
+
+    python benchmarks/bench_storage.py [--ops 2000]
+
+The "before" numbers replay the original storage code path (a fresh
+sqlite3.connect with the default rollback journal for every call); the
+"after" numbers go through storage.py and its pooled WAL connections.
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import storage
+
+RESULTS = {
+    "subdomains": [f"host{i}.example.com" for i in range(20)],
+    "emails": ["admin@example.com", "info@example.com"],
+    "ips": ["192.0.2.1", "192.0.2.2"],
+    "social_profiles": [],
+    "errors": []
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id TEXT PRIMARY KEY,
+    domain TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT,
+    results TEXT,
+    status TEXT NOT NULL
+)
+'''
+
+
+def baseline_ops(db_file, n):
+    """The original connect-per-call implementation."""
+    def connect():
+        return sqlite3.connect(db_file)
+
+    conn = connect()
+    conn.execute(SCHEMA)
+    conn.commit()
+    conn.close()
+
+    def store(scan_id):
+        conn = connect()
+        conn.execute(
+            'INSERT INTO scans (scan_id, domain, start_time, status) VALUES (?, ?, ?, ?)',
+            (scan_id, 'example.com', datetime.utcnow().isoformat(), 'running')
+        )
+        conn.commit()
+        conn.close()
+
+    def update(scan_id):
+        conn = connect()
+        conn.execute(
+            'UPDATE scans SET results = ?, end_time = ?, status = ? WHERE scan_id = ?',
+            (json.dumps(RESULTS), datetime.utcnow().isoformat(), 'completed', scan_id)
+        )
+        conn.commit()
+        conn.close()
+
+    def get(scan_id):
+        conn = connect()
+        row = conn.execute(
+            'SELECT scan_id, domain, start_time, end_time, results, status FROM scans WHERE scan_id = ?',
+            (scan_id,)
+        ).fetchone()
+        json.loads(row[4])
+        conn.close()
+
+    return store, update, get
+
+
+def pooled_ops(db_file, n):
+    storage.DB_FILE = db_file
+    storage.init_db()
+
+    def store(scan_id):
+        storage.store_scan(scan_id, 'example.com', datetime.utcnow())
+
+    def update(scan_id):
+        storage.update_scan_results(scan_id, RESULTS, datetime.utcnow())
+
+    def get(scan_id):
+        storage.get_scan_by_id(scan_id)
+
+    return store, update, get
+
+
+def run(label, factory, n):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        store, update, get = factory(os.path.join(temp_dir, 'bench.db'), n)
+        ids = [f"bench-{i}" for i in range(n)]
+        timings = {}
+        for name, op in (("store_scan", store), ("update_scan_results", update), ("get_scan_by_id", get)):
+            started = time.perf_counter()
+            for scan_id in ids:
+                op(scan_id)
+            elapsed = time.perf_counter() - started
+            timings[name] = n / elapsed
+        print(f"{label:>8}: " + "  ".join(f"{name} {rate:,.0f} ops/s" for name, rate in timings.items()))
+        return timings
+    finally:
+        db.close_all()
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=2000)
+    args = parser.parse_args()
+
+    before = run("before", baseline_ops, args.ops)
+    after = run("after", pooled_ops, args.ops)
+    print("speedup:  " + "  ".join(f"{name} x{after[name] / before[name]:.1f}" for name in before))
+
+
+if __name__ == '__main__':
+    main()
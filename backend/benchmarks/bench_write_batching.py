@@ -0,0 +1,117 @@
+"""Concurrent scan completions: per-call commits vs group commit.
+
+Run from the backend directory:
+
+    python benchmarks/bench_write_batching.py [--scans 2000] [--threads 32] [--synchronous FULL]
+
+Every thread stores scans and then completes them with results, the way
+many scans finishing together do. "per-call" commits each write in its own
+transaction on the calling thread's pooled connection (the behaviour
+before group commit); "batched" goes through storage.py and its
+WriteBatcher.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import storage
+
+RESULTS = {
+    "subdomains": [f"host{i}.example.com" for i in range(20)],
+    "emails": ["admin@example.com"],
+    "ips": ["192.0.2.1"],
+    "social_profiles": [],
+    "errors": []
+}
+
+
+def per_call_store(scan_id):
+    with storage._connection() as conn:
+        conn.execute(
+            'INSERT INTO scans (scan_id, domain, start_time, status) VALUES (?, ?, ?, ?)',
+            (scan_id, 'example.com', datetime.utcnow().isoformat(), 'running')
+        )
+
+
+def per_call_update(scan_id):
+    residual, rows = storage._split_findings(scan_id, RESULTS)
+    with storage._connection() as conn:
+        conn.execute('DELETE FROM findings WHERE scan_id = ?', (scan_id,))
+        conn.executemany(
+            'INSERT OR IGNORE INTO findings (scan_id, kind, value, source) VALUES (?, ?, ?, ?)',
+            rows
+        )
+        conn.execute(
+            'UPDATE scans SET results = ?, end_time = ?, status = ? WHERE scan_id = ?',
+            (storage._encode_results(residual), datetime.utcnow().isoformat(), 'completed', scan_id)
+        )
+
+
+def batched_store(scan_id):
+    storage.store_scan(scan_id, 'example.com', datetime.utcnow())
+
+
+def batched_update(scan_id):
+    storage.update_scan_results(scan_id, RESULTS, datetime.utcnow())
+
+
+def run(label, store, update, scans, threads, synchronous):
+    temp_dir = tempfile.mkdtemp()
+    pragmas = db.CONNECTION_PRAGMAS
+    db.CONNECTION_PRAGMAS = tuple(
+        f"PRAGMA synchronous={synchronous}" if p.startswith("PRAGMA synchronous") else p
+        for p in pragmas
+    )
+    try:
+        storage.DB_FILE = os.path.join(temp_dir, 'bench.db')
+        storage.init_db()
+
+        def worker(index):
+            for i in range(index, scans, threads):
+                scan_id = f"bench-{i}"
+                store(scan_id)
+                update(scan_id)
+
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        rate = 2 * scans / elapsed
+        batcher = db._batchers.get(storage.DB_FILE)
+        extra = ""
+        if batcher is not None and batcher.batches_committed:
+            extra = f"  ({batcher.writes_committed / batcher.batches_committed:.1f} writes/commit)"
+        print(f"{label:>9}: {rate:,.0f} writes/s{extra}")
+        return rate
+    finally:
+        db.close_all()
+        db.CONNECTION_PRAGMAS = pragmas
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scans', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--synchronous', default='NORMAL', choices=['OFF', 'NORMAL', 'FULL'])
+    args = parser.parse_args()
+
+    before = run("per-call", per_call_store, per_call_update, args.scans, args.threads, args.synchronous)
+    after = run("batched", batched_store, batched_update, args.scans, args.threads, args.synchronous)
+    print(f"  speedup: x{after / before:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+# bruteforce.py
+import asyncio
+import mmap
+import re
+import struct
+import time
+from collections import deque
+from uuid import uuid4
+
+import dns.message
+import dns.rdatatype
+
+from dns_cache import get_cache
+
+# Queries in flight at once across all sockets
+DEFAULT_CONCURRENCY = 500
+
+# UDP sockets opened per run; they are spread over the configured resolvers
+# and each carries many outstanding queries, matched up by message id
+DEFAULT_SOCKETS = 4
+
+# Seconds to wait for an answer before retrying on the next socket/resolver
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_RETRIES = 2
+
+# Random names resolved up front to detect a wildcard record
+WILDCARD_PROBES = 3
+
+# Seconds between progress reports
+PROGRESS_INTERVAL = 1.0
+
+# Longest hostname DNS can carry
+MAX_NAME_LENGTH = 253
+
+# A DNS label: letters, digits, hyphens and underscores, at most 63 long
+_LABEL = re.compile(rb'^[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?$')
+
+_RCODE_NOERROR = 0
+_RCODE_NXDOMAIN = 3
+_QTYPE_A = 1
+_QCLASS_IN = 1
+_FLAGS_RD = 0x0100
+
+# Outcomes of one query
+FOUND = 'found'
+NOT_FOUND = 'not_found'
+FAILED = 'failed'
+
+
+def iter_wordlist(path):
+    """Yield (word, bytes read so far) for each usable word in a wordlist file.
+
+    The file is memory-mapped and scanned in place, so wordlists of any size
+    are never loaded into memory. Words are lowercased; blank lines, "#"
+    comments and words that are not valid DNS labels (dots allowed) are
+    skipped.
+    """
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return
+        with mapped:
+            size = len(mapped)
+            start = 0
+            while start < size:
+                end = mapped.find(b'\n', start)
+                if end == -1:
+                    end = size
+                word = mapped[start:end].strip().lower()
+                start = end + 1
+                if not word or word.startswith(b'#'):
+                    continue
+                if all(_LABEL.match(label) for label in word.split(b'.')):
+                    yield word.decode('ascii'), min(start, size)
+
+
+def encode_name(name):
+    """Encode a hostname in DNS wire format."""
+    wire = bytearray()
+    for label in name.encode('ascii').split(b'.'):
+        wire.append(len(label))
+        wire += label
+    wire.append(0)
+    return bytes(wire)
+
+
+class _Channel(asyncio.DatagramProtocol):
+    """One UDP socket to one resolver, with its queries keyed by message id."""
+
+    def __init__(self, engine, nameserver):
+        self.engine = engine
+        self.nameserver = nameserver
+        self.transport = None
+        self.pending = {}
+        self._next_id = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def next_id(self):
+        for _ in range(0x10000):
+            self._next_id = (self._next_id + 1) & 0xFFFF
+            if self._next_id not in self.pending:
+                return self._next_id
+        raise RuntimeError("No free DNS message id on this socket")
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        query = self.pending.pop(struct.unpack_from('>H', data)[0], None)
+        if query is None:
+            return  # Late answer to a query we already retried
+        # The question section must echo ours, or this is not our answer
+        if data[12:12 + len(query.qname_wire)] != query.qname_wire:
+            self.pending[query.qid] = query
+            return
+        self.engine._on_answer(query, data)
+
+    def error_received(self, exc):
+        # e.g. ICMP port unreachable; the affected queries time out and retry
+        pass
+
+
+class _Query:
+    __slots__ = ('name', 'qname_wire', 'future', 'attempt', 'channel', 'qid', 'deadline')
+
+    def __init__(self, name, future):
+        self.name = name
+        self.qname_wire = encode_name(name)
+        self.future = future
+        self.attempt = 0
+        self.channel = None
+        self.qid = None
+        self.deadline = 0.0
+
+
+class BruteForcer:
+    """Wordlist subdomain discovery with pipelined UDP queries.
+
+    Every candidate "<word>.<domain>" is sent as an A query over a few UDP
+    sockets that each keep many queries outstanding, instead of one socket
+    (and one coroutine) per query. Queries that get no answer within
+    timeout are retried on the next socket, and so the next resolver.
+
+    If random names under the domain resolve, the domain has a wildcard
+    record; answers that point where the wildcard points are then dropped
+    as false positives.
+    """
+
+    def __init__(self, nameservers, port=53, concurrency=DEFAULT_CONCURRENCY, sockets=DEFAULT_SOCKETS,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, progress_callback=None,
+                 progress_interval=PROGRESS_INTERVAL, cache=None):
+        if not nameservers:
+            raise ValueError("At least one nameserver is required")
+        self.nameservers = list(nameservers)
+        self.port = port
+        self.concurrency = concurrency
+        self.sockets = max(sockets, len(self.nameservers))
+        self.timeout = timeout
+        self.retries = retries
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.cache = cache if cache is not None else get_cache()
+        self.queries_sent = 0
+        self.timeouts = 0
+        self._channels = []
+        self._in_flight = deque()
+        self._next_channel = 0
+
+    async def run(self, domain, wordlist_path):
+        """Brute-force subdomains of domain from a wordlist file.
+
+        Returns {'subdomains': {name: [addresses]}, 'wildcard': bool,
+        'tried': n, 'failed': n}.
+        """
+        domain = domain.lower().rstrip('.')
+        loop = asyncio.get_running_loop()
+        await self._open(loop)
+        sweeper = asyncio.create_task(self._sweep())
+        try:
+            wildcard = await self._detect_wildcard(domain)
+            found = {}
+            stats = {'tried': 0, 'failed': 0, 'bytes_done': 0}
+            slots = asyncio.Semaphore(self.concurrency)
+            total_bytes = _file_size(wordlist_path)
+            started = last_report = time.monotonic()
+
+            def collect(future):
+                slots.release()
+                if future.cancelled():
+                    return
+                name, outcome, addresses = future.result()
+                stats['tried'] += 1
+                if outcome == FAILED:
+                    stats['failed'] += 1
+                elif outcome == FOUND and not _matches_wildcard(addresses, wildcard):
+                    found[name] = addresses
+
+            for word, offset in iter_wordlist(wordlist_path):
+                stats['bytes_done'] = offset
+                name = f"{word}.{domain}"
+                if len(name) > MAX_NAME_LENGTH:
+                    continue
+                await slots.acquire()
+                self._query(name).add_done_callback(collect)
+                now = time.monotonic()
+                if self.progress_callback and now - last_report >= self.progress_interval:
+                    last_report = now
+                    self._report(stats, total_bytes, found, started)
+
+            # Wait for the tail of the wordlist
+            for _ in range(self.concurrency):
+                await slots.acquire()
+            stats['bytes_done'] = total_bytes
+            if self.progress_callback:
+                self._report(stats, total_bytes, found, started)
+
+            return {
+                'subdomains': found,
+                'wildcard': bool(wildcard),
+                'tried': stats['tried'],
+                'failed': stats['failed']
+            }
+        finally:
+            sweeper.cancel()
+            self._close()
+
+    async def _open(self, loop):
+        for i in range(self.sockets):
+            nameserver = self.nameservers[i % len(self.nameservers)]
+            _, channel = await loop.create_datagram_endpoint(
+                lambda: _Channel(self, nameserver),
+                remote_addr=(nameserver, self.port)
+            )
+            self._channels.append(channel)
+
+    def _close(self):
+        for channel in self._channels:
+            channel.transport.close()
+            for query in channel.pending.values():
+                if not query.future.done():
+                    query.future.cancel()
+        self._channels = []
+        self._in_flight.clear()
+
+    async def _detect_wildcard(self, domain):
+        """Return the addresses random names under domain resolve to (empty if none)."""
+        probes = [self._query(f"{uuid4().hex[:16]}.{domain}") for _ in range(WILDCARD_PROBES)]
+        addresses = set()
+        for _, outcome, answer in await asyncio.gather(*probes):
+            if outcome == FOUND:
+                addresses.update(answer)
+        return addresses
+
+    def _query(self, name):
+        """Send an A query for name; the future resolves to (name, outcome, addresses)."""
+        query = _Query(name, asyncio.get_running_loop().create_future())
+        self._send(query)
+        return query.future
+
+    def _send(self, query):
+        channel = self._channels[self._next_channel]
+        self._next_channel = (self._next_channel + 1) % len(self._channels)
+        query.channel = channel
+        query.qid = channel.next_id()
+        query.deadline = time.monotonic() + self.timeout
+        channel.pending[query.qid] = query
+        channel.transport.sendto(
+            struct.pack('>HHHHHH', query.qid, _FLAGS_RD, 1, 0, 0, 0) +
+            query.qname_wire +
+            struct.pack('>HH', _QTYPE_A, _QCLASS_IN)
+        )
+        self._in_flight.append((query.deadline, query))
+        self.queries_sent += 1
+
+    def _on_answer(self, query, data):
+        rcode = data[3] & 0x0F
+        if rcode == _RCODE_NXDOMAIN:
+            self._finish(query, NOT_FOUND, [])
+        elif rcode != _RCODE_NOERROR:
+            # SERVFAIL, REFUSED, ...: another resolver may do better
+            self._retry(query)
+        elif struct.unpack_from('>H', data, 6)[0] == 0:
+            # NOERROR without answers: the name exists, just not with an A record
+            self._finish(query, FOUND, [])
+        else:
+            try:
+                response = dns.message.from_wire(data)
+            except Exception:
+                self._retry(query)
+                return
+            addresses = []
+            ttl = None
+            for rrset in response.answer:
+                ttl = rrset.ttl if ttl is None else min(ttl, rrset.ttl)
+                if rrset.rdtype == dns.rdatatype.A:
+                    addresses.extend(record.to_text() for record in rrset)
+            if addresses:
+                self.cache.put(query.name, 'A', addresses, ttl)
+            self._finish(query, FOUND, addresses)
+
+    def _retry(self, query):
+        query.channel.pending.pop(query.qid, None)
+        if query.attempt >= self.retries:
+            self._finish(query, FAILED, [])
+            return
+        query.attempt += 1
+        self._send(query)
+
+    def _finish(self, query, outcome, addresses):
+        if not query.future.done():
+            query.future.set_result((query.name, outcome, addresses))
+
+    async def _sweep(self):
+        """Retry queries whose deadline passed without an answer."""
+        while True:
+            await asyncio.sleep(min(self.timeout / 4, 0.25))
+            now = time.monotonic()
+            # Queries are appended in send order and share one timeout, so
+            # the oldest deadlines are always on the left
+            while self._in_flight and self._in_flight[0][0] <= now:
+                deadline, query = self._in_flight.popleft()
+                # Skip answered queries and the stale entries of resent ones
+                if query.future.done() or query.deadline != deadline:
+                    continue
+                self.timeouts += 1
+                self._retry(query)
+            # Drop answered queries so the deque does not grow with the wordlist
+            while self._in_flight and self._in_flight[0][1].future.done():
+                self._in_flight.popleft()
+
+    def _report(self, stats, total_bytes, found, started):
+        elapsed = time.monotonic() - started
+        self.progress_callback({
+            'tried': stats['tried'],
+            'found': len(found),
+            'failed': stats['failed'],
+            'fraction': stats['bytes_done'] / total_bytes if total_bytes else 1.0,
+            'names_per_second': stats['tried'] / elapsed if elapsed else 0.0
+        })
+
+
+def _file_size(path):
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        return f.tell()
+
+
+def _matches_wildcard(addresses, wildcard):
+    """Whether an answer is just the wildcard record answering for the name."""
+    return bool(wildcard) and bool(addresses) and set(addresses) <= wildcard
@@ -0,0 +1,193 @@
+# crawler.py
+import asyncio
+import html
+import os
+import re
+import threading
+from urllib.parse import urljoin, urldefrag
+
+import aiohttp
+
+# Pages fetched from a site: the homepage and the pages that usually link
+# to a company's profiles
+DEFAULT_PATHS = ('/', '/about', '/contact')
+
+# Connections open at once, in all and per host
+DEFAULT_CONCURRENCY = 100
+DEFAULT_PER_HOST = 4
+
+# Bytes read from one page; the rest of a bigger page is not downloaded
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+
+# Seconds allowed for one page, redirects included
+DEFAULT_TIMEOUT = 15.0
+
+# Seconds an unused connection pool is kept open
+IDLE_TIMEOUT = 60.0
+
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 64 * 1024
+
+# An unfinished tag longer than this at the end of a chunk is not an anchor
+MAX_TAG_BYTES = 8 * 1024
+
+USER_AGENT = 'Mozilla/5.0 (compatible; osint-scanner)'
+
+_ANCHOR = re.compile(rb'<a\s[^>]*?\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))', re.IGNORECASE)
+
+
+class LinkExtractor:
+    """Incremental extraction of the links of an HTML page.
+
+    feed() takes the page's bytes in chunks split anywhere and returns the
+    absolute http(s) URLs of the <a href> anchors in it, resolved against
+    base_url, in page order. Only a tag left unfinished at the end of a
+    chunk is held back for the next one; call close() at the end. No
+    document tree is built.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self._tail = b''
+
+    def feed(self, chunk):
+        data = self._tail + bytes(chunk)
+        cut = data.rfind(b'<')
+        if cut == -1 or data.find(b'>', cut) != -1 or len(data) - cut > MAX_TAG_BYTES:
+            cut = len(data)
+        self._tail = data[cut:]
+        return self._links(data[:cut])
+
+    def close(self):
+        data, self._tail = self._tail, b''
+        return self._links(data)
+
+    def _links(self, data):
+        links = []
+        for match in _ANCHOR.finditer(data):
+            href = match.group(1) or match.group(2) or match.group(3) or b''
+            href = html.unescape(href.decode('utf-8', errors='replace')).strip()
+            if not href or href.startswith('#'):
+                continue
+            url = urldefrag(urljoin(self.base_url, href))[0]
+            if url.startswith(('http://', 'https://')):
+                links.append(url)
+        return links
+
+
+class Crawler:
+    """Fetches a few pages of sites and extracts their links, over one connection pool.
+
+    Pages are streamed and their links extracted as they arrive; at most
+    max_bytes of a page are read, and only HTML is looked at. The pool
+    allows `concurrency` connections in all and `per_host` to any one host,
+    and keeps connections alive between pages and sites. It belongs to the
+    event loop it was first used on, and is closed after idle_timeout
+    seconds without use or when that loop shuts down.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, max_bytes=MAX_PAGE_BYTES,
+                 timeout=DEFAULT_TIMEOUT, idle_timeout=IDLE_TIMEOUT):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._session = None
+        self._loop = None
+        self._active = 0
+        self._last_used = 0.0
+
+    def _get_session(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': USER_AGENT}
+            )
+            self._loop = loop
+            loop.create_task(self._close_when_idle(self._session))
+        return self._session
+
+    async def _close_when_idle(self, session):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._session is session:
+                await asyncio.sleep(self.idle_timeout)
+                if not self._active and loop.time() - self._last_used >= self.idle_timeout:
+                    break
+        finally:
+            # Also runs when the loop shuts down and cancels this task
+            if self._session is session:
+                self._session = None
+            await session.close()
+
+    async def fetch_links(self, url):
+        """Fetch one page and return {'url', 'status', 'links', 'truncated', 'error'}.
+
+        url is where the page ended up after redirects. Errors are returned
+        rather than raised.
+        """
+        session = self._get_session()
+        page = {'url': url, 'status': None, 'links': [], 'truncated': False, 'error': None}
+        self._active += 1
+        try:
+            async with session.get(url, max_redirects=MAX_REDIRECTS) as response:
+                page['url'] = str(response.url)
+                page['status'] = response.status
+                if response.status != 200 or 'html' not in response.headers.get('Content-Type', 'text/html'):
+                    return page
+                extractor = LinkExtractor(page['url'])
+                remaining = self.max_bytes
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    if len(chunk) >= remaining:
+                        page['links'].extend(extractor.feed(chunk[:remaining]))
+                        page['truncated'] = len(chunk) > remaining or not response.content.at_eof()
+                        break
+                    remaining -= len(chunk)
+                    page['links'].extend(extractor.feed(chunk))
+                page['links'].extend(extractor.close())
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            page['error'] = str(e) or type(e).__name__
+        finally:
+            self._active -= 1
+            self._last_used = asyncio.get_running_loop().time()
+        return page
+
+    async def crawl(self, base_url, paths=DEFAULT_PATHS):
+        """Fetch paths of the site at base_url concurrently.
+
+        Returns {'pages': [fetch_links results], 'links': [...]}, the links
+        of all pages without repeats, in order.
+        """
+        pages = await asyncio.gather(*(self.fetch_links(urljoin(base_url, path)) for path in paths))
+        links = {}
+        for page in pages:
+            links.update(dict.fromkeys(page['links']))
+        return {'pages': pages, 'links': list(links)}
+
+    async def crawl_site(self, domain, paths=DEFAULT_PATHS):
+        """Crawl https://domain (see crawl)."""
+        return await self.crawl(f"https://{domain}/", paths)
+
+
+_crawler = None
+_crawler_lock = threading.Lock()
+
+
+def get_crawler():
+    """Return the process-wide crawler, created on first use.
+
+    CRAWLER_CONCURRENCY, CRAWLER_PER_HOST and CRAWLER_MAX_PAGE_BYTES
+    override its limits.
+    """
+    global _crawler
+    with _crawler_lock:
+        if _crawler is None:
+            _crawler = Crawler(
+                concurrency=int(os.getenv('CRAWLER_CONCURRENCY', DEFAULT_CONCURRENCY)),
+                per_host=int(os.getenv('CRAWLER_PER_HOST', DEFAULT_PER_HOST)),
+                max_bytes=int(os.getenv('CRAWLER_MAX_PAGE_BYTES', MAX_PAGE_BYTES))
+            )
+        return _crawler
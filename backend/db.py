@@ -0,0 +1,246 @@
+# db.py
+import sqlite3
+import threading
+import os
+import queue
+import time
+from concurrent.futures import Future
+
+# Pragmas applied to every connection we hand out.  WAL lets the background
+# scan writers proceed while API requests read, and NORMAL synchronous is
+# durable across application crashes (only an OS crash can lose the last
+# committed transactions).
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",  # 16 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Number of compiled statements sqlite3 keeps per connection. Storage
+# functions use a small fixed set of SQL strings, so they are all reused.
+STATEMENT_CACHE_SIZE = 128
+
+_local = threading.local()
+_lock = threading.Lock()
+_connections = []
+_initialized = set()
+_generation = 0
+_batchers = {}
+
+# Group commit defaults. Writes that queue up while a batch is committing
+# share the next transaction; FLUSH_INTERVAL additionally bounds how long the
+# writer lingers for more company before committing (0 = never wait, so a
+# lone write is not delayed). A batch holds at most MAX_BATCH_SIZE writes.
+FLUSH_INTERVAL = 0
+MAX_BATCH_SIZE = 256
+
+
+def _open(db_file):
+    conn = sqlite3.connect(
+        db_file,
+        timeout=5.0,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(db_file, initializer=None):
+    """Return the calling thread's long-lived connection to db_file.
+
+    Connections are created lazily, one per (thread, database file), and are
+    kept open for the lifetime of the thread.  The optional initializer runs
+    once per database file per process, on the first connection opened to it.
+    """
+    conns = getattr(_local, 'connections', None)
+    if conns is None or _local.generation != _generation:
+        conns = _local.connections = {}
+        _local.generation = _generation
+
+    conn = conns.get(db_file)
+    if conn is None:
+        conn = _open(db_file)
+        with _lock:
+            _connections.append(conn)
+            if initializer is not None and db_file not in _initialized:
+                initializer(conn)
+                _initialized.add(db_file)
+        conns[db_file] = conn
+    return conn
+
+
+class WriteBatcher:
+    """Write-behind queue that group-commits writes to one database file.
+
+    Writes are callables taking a connection. They are executed in order on
+    a single writer thread, and every write queued by the time a batch
+    starts (or within flush_interval of it) shares one transaction, and so
+    one commit/fsync. Each write
+    runs inside its own savepoint, so a failing write is rolled back alone
+    and only its future receives the exception. Futures resolve after the
+    batch has been committed. Writes submitted with transaction=False (such
+    as a VACUUM, which cannot run inside a transaction) run on their own,
+    between the batches before and after them.
+    """
+
+    def __init__(self, db_file, initializer=None, flush_interval=FLUSH_INTERVAL, max_batch_size=MAX_BATCH_SIZE):
+        self.db_file = db_file
+        self.initializer = initializer
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.batches_committed = 0
+        self.writes_committed = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='db-batch-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, operation, transaction=True):
+        """Queue operation(conn) and return a Future for its result.
+
+        With transaction=False the operation runs outside any transaction
+        and commits whatever it changes itself.
+        """
+        future = Future()
+        self._queue.put((operation, future, transaction))
+        return future
+
+    def stop(self):
+        """Flush everything queued so far and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Commit what we have, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        conn = get_connection(self.db_file, self.initializer)
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # Writes that run outside a transaction split the batch, in order
+            start = 0
+            for index, (operation, future, transaction) in enumerate(batch):
+                if not transaction:
+                    if start < index:
+                        self._commit(conn, batch[start:index])
+                    self._run_alone(conn, operation, future)
+                    start = index + 1
+            if start < len(batch):
+                self._commit(conn, batch[start:])
+
+    def _run_alone(self, conn, operation, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = operation(conn)
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            future.set_exception(e)
+            return
+        self.batches_committed += 1
+        self.writes_committed += 1
+        future.set_result(result)
+
+    def _commit(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for operation, future, _ in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT batched_write')
+                try:
+                    outcomes.append((future, True, operation(conn)))
+                    conn.execute('RELEASE batched_write')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO batched_write')
+                    conn.execute('RELEASE batched_write')
+                    outcomes.append((future, False, e))
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            # Including writes not started yet (BEGIN itself can fail when
+            # another process holds the write lock); none of them ran
+            for operation, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_committed += 1
+        self.writes_committed += len(outcomes)
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+def get_batcher(db_file, initializer=None):
+    """Return the process-wide WriteBatcher for db_file, starting it if needed."""
+    with _lock:
+        batcher = _batchers.get(db_file)
+        if batcher is None:
+            batcher = _batchers[db_file] = WriteBatcher(db_file, initializer)
+        return batcher
+
+
+def close_all():
+    """Close every pooled connection (used at shutdown and between tests).
+
+    Pending batched writes are committed first. Threads that still hold a
+    cached handle notice the generation change and open a fresh connection
+    on their next call.
+    """
+    global _generation
+    with _lock:
+        batchers = list(_batchers.values())
+        _batchers.clear()
+    for batcher in batchers:
+        batcher.stop()
+    with _lock:
+        _generation += 1
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+        _initialized.clear()
+
+
+def _reset_after_fork():
+    # A forked child must never reuse its parent's sqlite handles.
+    global _local, _lock, _generation
+    _local = threading.local()
+    _generation += 1
+    _lock = threading.Lock()
+    _connections.clear()
+    _initialized.clear()
+    _batchers.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
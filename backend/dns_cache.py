@@ -0,0 +1,209 @@
+# dns_cache.py
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import db
+
+# Memory budget for cached answers, in (estimated) bytes
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+# How long a "does not exist" answer is kept when the response carries no
+# SOA record to take the negative TTL from (RFC 2308)
+DEFAULT_NEGATIVE_TTL = 300
+
+# Upper bound on any cached TTL, so a misconfigured zone cannot pin an
+# answer for days
+MAX_TTL = 24 * 3600
+
+# Rough per-entry overhead of the key tuple, the entry and the OrderedDict
+# slot, added to the length of the strings it holds
+ENTRY_OVERHEAD = 200
+
+# rdtype under which an NXDOMAIN answer is stored: it covers every type
+NXDOMAIN = '*'
+
+# Cache entries are written to the persistence file in batches, at most
+# this often (seconds)
+PERSIST_INTERVAL = 30
+
+
+def _create_schema(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS dns_cache (
+        name TEXT NOT NULL,
+        rdtype TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (name, rdtype)
+    ) WITHOUT ROWID
+    ''')
+    conn.commit()
+
+
+class DNSCache:
+    """TTL-aware LRU cache of DNS answers, shared by every resolver in the process.
+
+    Answers are lists of record values keyed by (name, rdtype); an empty
+    list is a cached negative answer. Entries expire after their record TTL
+    and the least recently used ones are evicted once the estimated size
+    exceeds max_bytes. With a path, entries are also persisted to a SQLite
+    file in the background and loaded back on start.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, negative_ttl=DEFAULT_NEGATIVE_TTL, path=None, clock=time.time):
+        self.max_bytes = max_bytes
+        self.negative_ttl = negative_ttl
+        self.path = path
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._dirty = {}
+        self._last_persist = clock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path is not None:
+            self._load()
+
+    def get(self, name, rdtype):
+        """Return the cached answer for (name, rdtype), or None on a miss."""
+        name = name.lower().rstrip('.')
+        now = self._clock()
+        with self._lock:
+            for key in ((name, rdtype), (name, NXDOMAIN)):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                answer, expires_at, _ = entry
+                if expires_at <= now:
+                    self._remove(key)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(answer)
+            self.misses += 1
+            return None
+
+    def put(self, name, rdtype, answer, ttl):
+        """Cache answer (a list of values, [] for "no records") for ttl seconds."""
+        ttl = min(ttl, MAX_TTL)
+        if ttl <= 0:
+            return
+        name = name.lower().rstrip('.')
+        key = (name, rdtype)
+        answer = tuple(answer)
+        expires_at = self._clock() + ttl
+        size = ENTRY_OVERHEAD + len(name) + sum(len(value) for value in answer)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (answer, expires_at, size)
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            if self.path is not None:
+                self._dirty[key] = (answer, expires_at)
+        if self.path is not None:
+            self._maybe_persist()
+
+    def put_nxdomain(self, name, ttl=None):
+        """Cache that name does not exist, for every record type."""
+        self.put(name, NXDOMAIN, [], self.negative_ttl if ttl is None else ttl)
+
+    def stats(self):
+        """Return counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._dirty.clear()
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+    def _load(self):
+        conn = db.get_connection(self.path, _create_schema)
+        now = self._clock()
+        rows = conn.execute(
+            'SELECT name, rdtype, answer, expires_at FROM dns_cache WHERE expires_at > ? ORDER BY expires_at',
+            (now,)
+        ).fetchall()
+        for name, rdtype, answer, expires_at in rows:
+            self.put(name, rdtype, json.loads(answer), expires_at - now)
+        with self._lock:
+            self._dirty.clear()
+
+    def _maybe_persist(self):
+        if self._clock() - self._last_persist >= PERSIST_INTERVAL:
+            self.persist()
+
+    def persist(self):
+        """Queue the entries changed since the last call for writing to path."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._last_persist = self._clock()
+        if not dirty:
+            return None
+        now = self._clock()
+        rows = [
+            (name, rdtype, json.dumps(list(answer)), expires_at)
+            for (name, rdtype), (answer, expires_at) in dirty.items()
+        ]
+
+        def operation(conn):
+            conn.executemany(
+                'INSERT OR REPLACE INTO dns_cache (name, rdtype, answer, expires_at) VALUES (?, ?, ?, ?)',
+                rows
+            )
+            conn.execute('DELETE FROM dns_cache WHERE expires_at <= ?', (now,))
+
+        return db.get_batcher(self.path, _create_schema).submit(operation)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache, created on first use.
+
+    DNS_CACHE_MAX_BYTES sets its memory budget and DNS_CACHE_FILE turns on
+    persistence to that SQLite file.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DNSCache(
+                max_bytes=int(os.getenv('DNS_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+                path=os.getenv('DNS_CACHE_FILE') or None
+            )
+            if _cache.path is not None:
+                atexit.register(_persist_at_exit, _cache)
+        return _cache
+
+
+def _persist_at_exit(cache):
+    future = cache.persist()
+    if future is not None:
+        future.result()
@@ -0,0 +1,111 @@
+# events.py
+import asyncio
+
+import async_storage
+from storage import FINAL_STATUSES
+
+# Seconds between looks for new scan events while anyone is subscribed
+POLL_INTERVAL = 0.5
+
+# Most events read per look; a subscriber far behind catches up over several
+BATCH_SIZE = 1000
+
+# Events buffered per subscriber. A subscriber that falls this far behind is
+# dropped, and catches up from the database when it reconnects.
+QUEUE_SIZE = 1000
+
+
+class ScanEventHub:
+    """Fan-out of scan events (see storage.submit_scan_events) to live subscribers.
+
+    Workers run in other processes and record scan events in the database.
+    While anyone is subscribed, a single poller task reads the new events of
+    every watched scan in one query per interval and hands them to each
+    subscriber of their scan, so the database load does not grow with the
+    number of subscribers.
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL, queue_size=QUEUE_SIZE):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._loop = None
+        self._subscribers = {}
+        self._cursor = None
+        self._poller = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Subscribers of a loop that has gone away are gone with it
+            self._loop = loop
+            self._subscribers = {}
+            self._cursor = None
+            self._poller = None
+        return loop
+
+    async def events(self, scan_id, after_id, keepalive=None):
+        """Yield the events of scan_id after event id after_id as they happen.
+
+        Yields None when keepalive seconds pass without an event. Stops after
+        the event that finishes the scan, or when this subscriber falls too
+        far behind.
+        """
+        loop = self._bind_loop()
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(scan_id, set()).add(queue)
+        # Events up to after_id were seen; the poller (re)reads from there
+        self._cursor = after_id if self._cursor is None else min(self._cursor, after_id)
+        if self._poller is None:
+            self._poller = loop.create_task(self._poll())
+
+        last = after_id
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                if event['id'] <= last:
+                    continue
+                last = event['id']
+                yield event
+                if event['type'] == 'status' and event['data']['status'] in FINAL_STATUSES:
+                    return
+        finally:
+            subscribers = self._subscribers.get(scan_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[scan_id]
+
+    async def _poll(self):
+        try:
+            while self._subscribers:
+                start = self._cursor
+                events = await async_storage.get_scan_events(list(self._subscribers), start, BATCH_SIZE)
+                if self._cursor != start:
+                    # Someone subscribed from further back meanwhile; read again
+                    # from there so their events arrive in order
+                    continue
+                for event in events:
+                    for queue in list(self._subscribers.get(event['scan_id'], ())):
+                        self._deliver(queue, event)
+                if events:
+                    self._cursor = events[-1]['id']
+                if len(events) < BATCH_SIZE:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            self._poller = None
+            self._cursor = None
+
+    def _deliver(self, queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind: replace the backlog with the end-of-stream marker
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
@@ -0,0 +1,131 @@
+# extract.py
+import codecs
+import ipaddress
+import re
+
+# Longest run of text without whitespace that is held back waiting for the
+# next chunk; a longer one cannot be a finding and is scanned as it is
+MAX_TOKEN_CHARS = 64 * 1024
+
+_LABEL = r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?'
+_HOST = rf'(?:{_LABEL}\.)+[a-z][a-z0-9-]{{0,61}}[a-z0-9]'
+_OCTET = r'(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])'
+
+# Every kind of finding in one pattern, so text is scanned once. Each
+# alternative is anchored at a token boundary so no finding is cut out of a
+# longer token (e.g. a hostname out of an email, or an address out of a
+# version number). IPv6 candidates are checked with the ipaddress module.
+# The pattern only runs over the words of the text that hold a '.' or a ':'
+# (every finding does), which skips most of a tool's output at C speed.
+_FINDINGS = re.compile(
+    r'(?<![\w.%+@-])(?:'
+    r'(?P<url>https?://[^\s"\'<>\\^`{|}]+)'
+    rf'|(?P<email>[a-z0-9._%+-]+@{_HOST})(?![\w-]|\.[a-z0-9])'
+    r'|(?<!:)(?P<ipv6>(?:[0-9a-f]{1,4}|:)?(?::[0-9a-f]{0,4}){2,7}'
+    rf'(?:(?<=:){_OCTET}(?:\.{_OCTET}){{3}})?)(?![\w:.])'
+    rf'|(?P<ipv4>{_OCTET}(?:\.{_OCTET}){{3}})(?![\w-]|\.[0-9])'
+    rf'|(?P<host>{_HOST})(?![\w@-]|\.[a-z0-9])'
+    r')',
+    re.IGNORECASE
+)
+
+def _in_scope(hostname, domain):
+    return domain is None or hostname == domain or hostname.endswith('.' + domain)
+
+
+class Extractor:
+    """Incremental, single-pass extraction of findings from tool output.
+
+    feed() takes chunks of text or bytes (UTF-8) of any size, split
+    anywhere, and returns the (kind, value) findings not seen before:
+    'subdomains', 'emails', 'ips' and 'urls'. Text is scanned once with a
+    single precompiled pattern; only an unfinished token at the end of a
+    chunk is held back until the next one. Call close() for the findings in
+    the last of it.
+
+    With a domain, hostnames and emails are limited to that domain and its
+    subdomains (the hosts of URLs count as hostnames too); without one,
+    every hostname and email is reported.
+    """
+
+    def __init__(self, domain=None):
+        self.domain = domain.lower().rstrip('.') if domain else None
+        self.seen = set()
+        self._tail = ''
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def feed(self, chunk):
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            chunk = self._decoder.decode(chunk)
+        text = self._tail + chunk
+        # Hold back the unfinished token at the end
+        cut = len(text)
+        while cut > 0 and not text[cut - 1].isspace():
+            cut -= 1
+            if len(text) - cut > MAX_TOKEN_CHARS:
+                cut = len(text)
+                break
+        self._tail = text[cut:]
+        return self._scan(text[:cut])
+
+    def close(self):
+        text = self._tail + self._decoder.decode(b'', final=True)
+        self._tail = ''
+        return self._scan(text)
+
+    def _scan(self, text):
+        findings = []
+        seen = self.seen
+        candidates = '\n'.join([word for word in text.split() if '.' in word or ':' in word])
+        for match in _FINDINGS.finditer(candidates):
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'host':
+                finding = self._host(value.lower())
+            elif kind == 'email':
+                value = value.lower()
+                finding = ('emails', value) if _in_scope(value.rpartition('@')[2], self.domain) else None
+            elif kind == 'ipv4':
+                finding = ('ips', value)
+            elif kind == 'ipv6':
+                finding = self._ipv6(value)
+            else:
+                finding = self._url(value, findings)
+            if finding is not None and finding not in seen:
+                seen.add(finding)
+                findings.append(finding)
+        return findings
+
+    def _host(self, hostname):
+        return ('subdomains', hostname) if _in_scope(hostname, self.domain) else None
+
+    def _ipv6(self, value):
+        try:
+            return ('ips', str(ipaddress.IPv6Address(value)))
+        except ValueError:
+            return None
+
+    def _url(self, url, findings):
+        # Punctuation that ends a sentence is not part of the URL
+        url = url.rstrip('.,;:!?)]\'"')
+        host = url.split('://', 1)[1].split('/', 1)[0].split('?', 1)[0].split('#', 1)[0]
+        host = host.rpartition('@')[2].rsplit(':', 1)[0].lower().rstrip('.')
+        if host and not host.startswith('['):
+            finding = self._host(host)
+            if finding is not None and finding not in self.seen:
+                self.seen.add(finding)
+                findings.append(finding)
+        return ('urls', url)
+
+
+def extract(text, domain=None):
+    """Extract findings from a whole text (or bytes) at once.
+
+    Returns {'subdomains', 'emails', 'ips', 'urls'} lists, each in order of
+    first appearance. See Extractor for the streaming version.
+    """
+    extractor = Extractor(domain)
+    found = {'subdomains': [], 'emails': [], 'ips': [], 'urls': []}
+    for kind, value in extractor.feed(text) + extractor.close():
+        found[kind].append(value)
+    return found
@@ -0,0 +1,271 @@
+# job_queue.py
+import json
+import time
+
+from db import get_connection, get_batcher
+from scheduler import INTERACTIVE, PRIORITY_NAMES, priority_rank
+
+# Seconds a claimed job stays leased to its worker. Workers renew the lease
+# while the job runs; a job whose lease runs out (the worker died or hung)
+# goes back to the queue.
+LEASE_SECONDS = 60
+
+# Claims a job may use up through expired leases before it is given up on
+MAX_ATTEMPTS = 3
+
+# Job states. Finished jobs are deleted, so the table only holds pending work
+# (and the jobs that were given up on).
+QUEUED = 'queued'
+LEASED = 'leased'
+FAILED = 'failed'
+
+
+def create_schema(conn):
+    """Create the jobs table (called from the storage schema initializer)."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        scan_id TEXT NOT NULL UNIQUE,
+        payload TEXT NOT NULL,
+        state TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        enqueued_at REAL NOT NULL,
+        lease_owner TEXT,
+        lease_expires REAL,
+        last_error TEXT
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, job_id)')
+
+    # Claim order: priority class, then fair share between submitters
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(jobs)')]
+    if 'priority' not in columns:
+        conn.execute('ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0')
+    if 'submitter' not in columns:
+        conn.execute("ALTER TABLE jobs ADD COLUMN submitter TEXT NOT NULL DEFAULT ''")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (state, priority, submitter, job_id)')
+    # Set on a leased job to ask its worker to stop it
+    if 'cancel_requested' not in columns:
+        conn.execute('ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0')
+
+
+_JOB_COLUMNS = 'job_id, scan_id, payload, attempts, lease_owner, priority, submitter, enqueued_at'
+
+
+def _job(row):
+    job_id, scan_id, payload, attempts, lease_owner, priority, submitter, enqueued_at = row
+    return {
+        'job_id': job_id,
+        'scan_id': scan_id,
+        'payload': json.loads(payload),
+        'attempts': attempts,
+        'lease_owner': lease_owner,
+        'priority': PRIORITY_NAMES.get(priority, priority),
+        'submitter': submitter,
+        'enqueued_at': enqueued_at
+    }
+
+
+class JobQueue:
+    """Durable queue of scan jobs in a SQLite database, claimed under leases.
+
+    Jobs are claimed best priority class first (see scheduler.PRIORITIES).
+    Within a class, the next job goes to the submitter with the fewest jobs
+    running, oldest job first, so a big batch from one submitter does not
+    hold back everyone else's scans.
+
+    Every state change is a single write through the database's group-commit
+    writer, whose BEGIN IMMEDIATE transactions serialize claims across
+    threads and processes, so a job is only ever leased to one worker.
+    Methods named submit_* return a Future resolved on commit.
+
+    on_claim(conn, job), on_dead(conn, job) and on_cancel(conn, job), if
+    given, run inside the transaction that leases a job, the one that gives
+    up on it and the one that drops it on cancellation, so the owner of the
+    jobs can keep its own records in step.
+    """
+
+    def __init__(self, db_file, initializer=None, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 on_claim=None, on_dead=None, on_cancel=None, clock=time.time):
+        self.db_file = db_file
+        self.initializer = initializer
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.on_claim = on_claim
+        self.on_dead = on_dead
+        self.on_cancel = on_cancel
+        self.clock = clock
+
+    def _writer(self):
+        return get_batcher(self.db_file, self.initializer)
+
+    def insert(self, conn, scan_id, payload, priority=INTERACTIVE, submitter=''):
+        """Add a job within the caller's transaction; returns its job id."""
+        cursor = conn.execute(
+            'INSERT INTO jobs (scan_id, payload, state, enqueued_at, priority, submitter) VALUES (?, ?, ?, ?, ?, ?)',
+            (scan_id, json.dumps(payload), QUEUED, self.clock(), priority_rank(priority), submitter or '')
+        )
+        return cursor.lastrowid
+
+    def submit_enqueue(self, scan_id, payload, priority=INTERACTIVE, submitter=''):
+        """Queue a job for scan_id with a JSON-serializable payload."""
+        return self._writer().submit(lambda conn: self.insert(conn, scan_id, payload, priority, submitter))
+
+    def enqueue(self, scan_id, payload, priority=INTERACTIVE, submitter=''):
+        return self.submit_enqueue(scan_id, payload, priority, submitter).result()
+
+    def submit_claim(self, owner):
+        """Lease the next job to owner; the Future gives the job dict or None."""
+        def operation(conn):
+            now = self.clock()
+            self._requeue_expired(conn, now)
+            job_id = self._next_job_id(conn)
+            if job_id is None:
+                return None
+            row = conn.execute(f'SELECT {_JOB_COLUMNS} FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            conn.execute(
+                'UPDATE jobs SET state = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1 '
+                'WHERE job_id = ?',
+                (LEASED, owner, now + self.lease_seconds, job_id)
+            )
+            job = _job(row)
+            job.update(attempts=job['attempts'] + 1, lease_owner=owner, claimed_at=now)
+            if self.on_claim is not None:
+                self.on_claim(conn, job)
+            return job
+
+        return self._writer().submit(operation)
+
+    def claim(self, owner):
+        return self.submit_claim(owner).result()
+
+    def _next_job_id(self, conn):
+        row = conn.execute('SELECT MIN(priority) FROM jobs WHERE state = ?', (QUEUED,)).fetchone()
+        if row[0] is None:
+            return None
+        # Oldest queued job of each submitter in the best class waiting
+        candidates = conn.execute(
+            'SELECT submitter, MIN(job_id) FROM jobs WHERE state = ? AND priority = ? GROUP BY submitter',
+            (QUEUED, row[0])
+        ).fetchall()
+        running = dict(conn.execute(
+            'SELECT submitter, COUNT(*) FROM jobs WHERE state = ? GROUP BY submitter', (LEASED,)
+        ).fetchall())
+        _, job_id = min((running.get(submitter, 0), job_id) for submitter, job_id in candidates)
+        return job_id
+
+    def _requeue_expired(self, conn, now):
+        """Put jobs whose lease ran out back in the queue, or give up on them."""
+        expired = conn.execute(
+            f'SELECT {_JOB_COLUMNS}, cancel_requested FROM jobs WHERE state = ? AND lease_expires < ?',
+            (LEASED, now)
+        ).fetchall()
+        for row in expired:
+            job = _job(row[:-1])
+            if row[-1]:
+                # Its worker died before it could stop the job
+                self._drop_cancelled(conn, job)
+            elif job['attempts'] >= self.max_attempts:
+                error = f"Gave up after {job['attempts']} attempts; the last worker ({job['lease_owner']}) stopped responding"
+                conn.execute(
+                    'UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, last_error = ? '
+                    'WHERE job_id = ?',
+                    (FAILED, error, job['job_id'])
+                )
+                if self.on_dead is not None:
+                    self.on_dead(conn, dict(job, error=error))
+            else:
+                conn.execute(
+                    'UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL WHERE job_id = ?',
+                    (QUEUED, job['job_id'])
+                )
+
+    def cancel(self, conn, scan_id):
+        """Cancel the job of scan_id within the caller's transaction.
+
+        A queued job is dropped at once and gives 'cancelled'. A leased job
+        is flagged for its worker to stop (see cancelled_jobs) and gives
+        'cancelling'. Gives None if the scan has no pending job.
+        """
+        row = conn.execute(
+            f'SELECT {_JOB_COLUMNS}, state FROM jobs WHERE scan_id = ? AND state != ?', (scan_id, FAILED)
+        ).fetchone()
+        if row is None:
+            return None
+        job, state = _job(row[:-1]), row[-1]
+        if state == QUEUED:
+            self._drop_cancelled(conn, job)
+            return 'cancelled'
+        conn.execute('UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?', (job['job_id'],))
+        return 'cancelling'
+
+    def _drop_cancelled(self, conn, job):
+        conn.execute('DELETE FROM jobs WHERE job_id = ?', (job['job_id'],))
+        if self.on_cancel is not None:
+            self.on_cancel(conn, job)
+
+    def cancelled_jobs(self, job_ids):
+        """Return which of the given jobs have been asked to stop."""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return set()
+        placeholders = ','.join('?' * len(job_ids))
+        return {row[0] for row in get_connection(self.db_file, self.initializer).execute(
+            f'SELECT job_id FROM jobs WHERE cancel_requested = 1 AND job_id IN ({placeholders})', job_ids
+        )}
+
+    def _leased_update(self, job_id, owner, sql, params=()):
+        """Run sql on job_id only while owner still holds its lease; Future gives whether it did."""
+        def operation(conn):
+            cursor = conn.execute(
+                f'{sql} WHERE job_id = ? AND state = ? AND lease_owner = ?',
+                (*params, job_id, LEASED, owner)
+            )
+            return cursor.rowcount == 1
+
+        return self._writer().submit(operation)
+
+    def submit_renew(self, job_id, owner):
+        """Extend owner's lease on a job; False means the lease was lost."""
+        return self._leased_update(
+            job_id, owner, 'UPDATE jobs SET lease_expires = ?', (self.clock() + self.lease_seconds,)
+        )
+
+    def submit_complete(self, job_id, owner):
+        """Remove a finished job."""
+        return self._leased_update(job_id, owner, 'DELETE FROM jobs')
+
+    def submit_release(self, job_id, owner):
+        """Hand an unfinished job back to the queue without counting the attempt."""
+        return self._leased_update(
+            job_id, owner,
+            'UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, attempts = attempts - 1',
+            (QUEUED,)
+        )
+
+    def get_job(self, scan_id):
+        """Get the job of a scan (None once it has finished)."""
+        row = get_connection(self.db_file, self.initializer).execute(
+            f'SELECT {_JOB_COLUMNS}, state, last_error FROM jobs WHERE scan_id = ?',
+            (scan_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(_job(row[:-2]), state=row[-2], last_error=row[-1])
+
+    def stats(self):
+        """Get queue depth per priority class, jobs running and failed, and the oldest wait."""
+        conn = get_connection(self.db_file, self.initializer)
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, count in conn.execute(
+            'SELECT priority, COUNT(*) FROM jobs WHERE state = ? GROUP BY priority', (QUEUED,)
+        ):
+            queued[PRIORITY_NAMES.get(priority, str(priority))] = count
+        counts = dict(conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+        oldest = conn.execute('SELECT MIN(enqueued_at) FROM jobs WHERE state = ?', (QUEUED,)).fetchone()[0]
+        return {
+            'queued': queued,
+            'running': counts.get(LEASED, 0),
+            'failed': counts.get(FAILED, 0),
+            'oldest_wait_seconds': self.clock() - oldest if oldest is not None else 0.0
+        }
@@ -1,17 +1,22 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel, validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import logging
 import json
 import os
+import threading
 import traceback
 from uuid import uuid4
 import pandas as pd
-from storage import store_scan, get_all_scans, get_scan_by_id
-from workers import run_osint_scan
+from storage import get_scan_by_id, migrate_inline_findings, recompress_legacy_results, FINDING_KINDS, FINAL_STATUSES
+import async_storage
+from events import ScanEventHub
+from batches import parse_domains, MAX_BATCH_DOMAINS, MAX_UPLOAD_BYTES
+import retention
+from scheduler import INTERACTIVE, BULK, PRIORITIES
 
 # Configure logging
 logging.basicConfig(
@@ -38,9 +43,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-class DomainRequest(BaseModel):
+# Seconds between keep-alive comments on an idle event stream
+EVENTS_KEEPALIVE = 15
+
+# Live scan events for every /scans/{scan_id}/events subscriber
+event_hub = ScanEventHub()
+
+class ScanOptions(BaseModel):
+    # Scheduler priority class: "interactive" or "bulk"
+    priority: str = INTERACTIVE
+    # Who the scan is for, for fair sharing; defaults to the client address
+    submitter: Optional[str] = None
+    # Run the tools even if a scan of the domain is in flight or fresh
+    force: bool = False
+    # Oldest completed scan (seconds) that may be served instead of a new one;
+    # defaults to SCAN_FRESHNESS_SECONDS
+    max_age: Optional[int] = None
+
+    @validator('max_age')
+    def validate_max_age(cls, v):
+        if v is not None and v < 0:
+            raise ValueError('max_age must not be negative')
+        return v
+
+    @validator('priority')
+    def validate_priority(cls, v):
+        if v not in PRIORITIES:
+            raise ValueError(f"priority must be one of: {', '.join(PRIORITIES)}")
+        return v
+
+class DomainRequest(ScanOptions):
     domain: str
     
     @validator('domain')
@@ -50,6 +85,46 @@ class DomainRequest(BaseModel):
             raise ValueError('Invalid domain format')
         return v
 
+class BatchRequest(ScanOptions):
+    # Validated and deduplicated by batches.parse_domains
+    domains: List[str]
+    priority: str = BULK
+
+def run_results_migration():
+    """Move inline findings out of, and re-encode, uncompressed results rows left by older versions"""
+    try:
+        findings_migrated = migrate_inline_findings()
+        migrated = recompress_legacy_results()
+        logger.info(json.dumps({
+            "event": "results_migration_completed",
+            "findings_rows_migrated": findings_migrated,
+            "rows_migrated": migrated
+        }))
+    except Exception as e:
+        logger.error(json.dumps({
+            "event": "results_migration_failed",
+            "error": str(e)
+        }))
+
+@app.on_event("startup")
+def start_results_migration():
+    """Run the results migration in the background so startup is not delayed"""
+    threading.Thread(target=run_results_migration, name="results-migration", daemon=True).start()
+
+@app.on_event("startup")
+def start_retention():
+    """Archive expired scans in the background every RETENTION_INTERVAL_HOURS hours"""
+    interval_hours = float(os.getenv("RETENTION_INTERVAL_HOURS", "24"))
+    if interval_hours <= 0:
+        return
+    ttls = retention.parse_ttls(os.environ["RETENTION_TTLS"]) if os.getenv("RETENTION_TTLS") else None
+    threading.Thread(
+        target=retention.run_periodically,
+        args=(interval_hours, ttls),
+        name="retention",
+        daemon=True
+    ).start()
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler for logging errors"""
@@ -71,25 +146,42 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 @app.post("/scan")
-async def scan_domain(request: DomainRequest, background_tasks: BackgroundTasks):
-    """Start an OSINT scan for a domain"""
+async def scan_domain(request: DomainRequest, http_request: Request):
+    """Queue an OSINT scan of a domain for the worker pool (worker_pool.py)
+
+    Returns the scan to follow, which is an existing one when coalesced is
+    "in_flight" (a scan of the domain was already queued or running) or
+    "fresh" (one completed within max_age seconds). Set force to always
+    start a new scan.
+    """
     try:
         scan_id = str(uuid4())
         start_time = datetime.utcnow()
+        submitter = request.submitter or (http_request.client.host if http_request.client else "")
         
         logger.info(json.dumps({
             "scan_id": scan_id,
             "domain": request.domain,
+            "priority": request.priority,
+            "submitter": submitter,
             "event": "scan_initiated"
         }))
         
-        # Store initial scan with running status
-        store_scan(scan_id, request.domain, start_time)
-        
-        # Run scan in background
-        background_tasks.add_task(run_osint_scan, scan_id, request.domain, start_time)
+        # Store the scan and its job in one transaction (a worker picks it
+        # up), unless a scan in flight or a fresh one can be shared
+        scan = await async_storage.request_scan(
+            scan_id, request.domain, start_time, request.priority, submitter,
+            max_age=request.max_age, force=request.force
+        )
+        if scan["coalesced"]:
+            logger.info(json.dumps({
+                "scan_id": scan["scan_id"],
+                "domain": request.domain,
+                "coalesced": scan["coalesced"],
+                "event": "scan_coalesced"
+            }))
         
-        return {"scan_id": scan_id, "status": "started"}
+        return scan
     except Exception as e:
         logger.error(json.dumps({
             "domain": request.domain,
@@ -98,11 +190,116 @@ async def scan_domain(request: DomainRequest, background_tasks: BackgroundTasks)
         }))
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _submit_batch(entries, options: ScanOptions, http_request: Request):
+    """Queue a batch of domains and stream its summary as NDJSON"""
+    domains, duplicates, invalid = parse_domains(entries)
+    if not domains:
+        raise HTTPException(status_code=422, detail={"message": "No valid domains", "invalid": invalid[:100]})
+    if len(domains) > MAX_BATCH_DOMAINS:
+        raise HTTPException(status_code=422, detail=f"A batch holds at most {MAX_BATCH_DOMAINS} domains")
+
+    batch_id = str(uuid4())
+    submitter = options.submitter or (http_request.client.host if http_request.client else "")
+    # All scans and their jobs go in in one transaction
+    outcomes = await async_storage.enqueue_batch(
+        batch_id, [(str(uuid4()), domain) for domain in domains], datetime.utcnow(),
+        options.priority, submitter, max_age=options.max_age, force=options.force
+    )
+    coalesced = {"in_flight": 0, "fresh": 0}
+    for outcome in outcomes:
+        if outcome["coalesced"]:
+            coalesced[outcome["coalesced"]] += 1
+    summary = {
+        "batch_id": batch_id,
+        "accepted": len(domains),
+        "duplicates": duplicates,
+        "invalid": len(invalid),
+        "coalesced": coalesced
+    }
+    logger.info(json.dumps({**summary, "priority": options.priority, "submitter": submitter, "event": "batch_queued"}))
+
+    def lines():
+        # The summary first, then one line per domain and per invalid entry
+        yield json.dumps(summary) + "\n"
+        for outcome in outcomes:
+            yield json.dumps(outcome) + "\n"
+        for entry in invalid:
+            yield json.dumps({**entry, "error": "Invalid domain"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/batches")
+async def submit_batch(request: BatchRequest, http_request: Request):
+    """Queue scans of a list of domains as one batch
+
+    Domains are validated and deduplicated, and domains with a scan in
+    flight or a fresh one share it (see POST /scan). Batches default to the
+    bulk priority class. The response is NDJSON: the batch summary (with
+    batch_id), then {"domain", "scan_id", "status", "coalesced"} per domain
+    and {"line", "value", "error"} per invalid entry.
+    """
+    return await _submit_batch(request.domains, request, http_request)
+
+@app.post("/batches/upload")
+async def upload_batch(
+    http_request: Request,
+    priority: str = BULK,
+    submitter: Optional[str] = None,
+    force: bool = False,
+    max_age: Optional[int] = Query(None, ge=0)
+):
+    """Queue scans of the domains in an uploaded file, one per line (or CSV, first column)
+
+    Send the file as the request body, e.g.
+    curl --data-binary @domains.txt -H 'Content-Type: text/plain' .../batches/upload
+    Takes the same options as POST /batches as query parameters and
+    responds the same way.
+    """
+    try:
+        options = ScanOptions(priority=priority, submitter=submitter, force=force, max_age=max_age)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    too_large = HTTPException(status_code=413, detail=f"Upload is larger than {MAX_UPLOAD_BYTES} bytes")
+    # Rejected before reading when the client says how big it is, else as
+    # soon as the chunks read so far pass the limit
+    length = http_request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_UPLOAD_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in http_request.stream():
+        body += chunk
+        if len(body) > MAX_UPLOAD_BYTES:
+            raise too_large
+    return await _submit_batch(body.decode(errors="replace").splitlines(), options, http_request)
+
+@app.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """Get a batch's progress: its domains counted by the status of their scan"""
+    batch = await async_storage.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
 @app.get("/scans")
-def get_scans():
-    """Get all scan records"""
+async def get_scans(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    domain: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """Get one page of scan summaries, newest first.
+    
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    Full results come from GET /scans/{scan_id}.
+    """
     try:
-        return get_all_scans()
+        scans, next_cursor = await async_storage.list_scans(limit=limit, cursor=cursor, domain=domain, status=status)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return scans
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(json.dumps({
             "error": str(e),
@@ -110,14 +307,93 @@ def get_scans():
         }))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/scheduler")
+async def get_scheduler_stats():
+    """Get queue depth, running work and recent wait times for scans and each tool"""
+    return await async_storage.scheduler_stats()
+
 @app.get("/scans/{scan_id}")
-def get_scan(scan_id: str):
+async def get_scan(scan_id: str):
     """Get a specific scan by ID"""
-    scan = get_scan_by_id(scan_id)
+    scan = await async_storage.get_scan_by_id(scan_id)
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
     return scan
 
+def _sse(event_type, data, event_id=None):
+    """Format one Server-Sent Event"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event_type}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+@app.get("/scans/{scan_id}/events")
+async def stream_scan_events(scan_id: str, request: Request):
+    """Stream a scan's progress as Server-Sent Events
+
+    A "snapshot" event carries the scan as GET /scans/{scan_id} returns it.
+    Then "status", "tool" and "findings" events follow as they happen,
+    until the scan finishes. A client that reconnects with Last-Event-ID
+    gets a new snapshot and the events it missed.
+    """
+    last_seen = request.headers.get("last-event-id", "")
+    # Taken before the snapshot, so nothing can happen in between unseen
+    after = int(last_seen) if last_seen.isdigit() else await async_storage.last_event_id()
+    scan = await async_storage.get_scan_by_id(scan_id)
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+    async def stream():
+        yield _sse("snapshot", scan, after)
+        if scan["status"] in FINAL_STATUSES:
+            return
+        async for event in event_hub.events(scan_id, after, keepalive=EVENTS_KEEPALIVE):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield _sse(event["type"], event["data"], event["id"])
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # Proxies (nginx) must pass events on as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.delete("/scans/{scan_id}")
+async def cancel_scan(scan_id: str):
+    """Cancel a queued or running scan
+
+    A running scan stops its tools (killing their processes) and keeps what
+    they found so far; its status goes from "cancelling" to "cancelled".
+    """
+    status = await async_storage.cancel_scan(scan_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    if status not in ("cancelled", "cancelling"):
+        raise HTTPException(status_code=409, detail=f"Scan is already {status}")
+    logger.info(json.dumps({"scan_id": scan_id, "status": status, "event": "scan_cancel_requested"}))
+    return {"scan_id": scan_id, "status": status}
+
+@app.get("/scans/{scan_id}/diff")
+async def get_scan_diff(scan_id: str):
+    """Get the findings added and removed since the previous scan of the same domain"""
+    diff = await async_storage.get_scan_diff(scan_id)
+    if not diff:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return diff
+
+@app.get("/assets/{kind}/{value:path}")
+async def get_asset_sightings(kind: str, value: str):
+    """Get every scan and domain in which an asset (e.g. an IP) was seen"""
+    if kind not in FINDING_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown asset kind, expected one of: {', '.join(FINDING_KINDS)}")
+    return await async_storage.find_asset_sightings(kind, value)
+
+@app.get("/domains/{domain}/related")
+async def get_related_domains(domain: str):
+    """Get other scanned domains that share IPs, emails or subdomains with a domain"""
+    return await async_storage.find_related_domains(domain)
+
 @app.get("/export/{scan_id}")
 def export_to_excel(scan_id: str):
     """Export scan results to Excel"""
@@ -204,8 +480,17 @@ def read_root():
         "api_version": "1.0.0",
         "endpoints": [
             {"path": "/scan", "method": "POST", "description": "Start a new domain scan"},
-            {"path": "/scans", "method": "GET", "description": "Get all scans"},
+            {"path": "/batches", "method": "POST", "description": "Queue scans of a list of domains as one batch"},
+            {"path": "/batches/upload", "method": "POST", "description": "Queue scans of the domains in an uploaded file"},
+            {"path": "/batches/{batch_id}", "method": "GET", "description": "Get the progress of a batch"},
+            {"path": "/scans", "method": "GET", "description": "List scan summaries (paginated)"},
+            {"path": "/scheduler", "method": "GET", "description": "Scan queue and tool scheduler stats"},
             {"path": "/scans/{scan_id}", "method": "GET", "description": "Get a specific scan"},
+            {"path": "/scans/{scan_id}", "method": "DELETE", "description": "Cancel a queued or running scan"},
+            {"path": "/scans/{scan_id}/events", "method": "GET", "description": "Stream a scan's progress (Server-Sent Events)"},
+            {"path": "/scans/{scan_id}/diff", "method": "GET", "description": "Compare a scan with the previous scan of its domain"},
+            {"path": "/assets/{kind}/{value}", "method": "GET", "description": "Find the scans and domains where an asset was seen"},
+            {"path": "/domains/{domain}/related", "method": "GET", "description": "Find domains sharing assets with a domain"},
             {"path": "/export/{scan_id}", "method": "GET", "description": "Export scan results to Excel"}
         ]
     }
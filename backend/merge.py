@@ -0,0 +1,175 @@
+# merge.py
+import ipaddress
+import re
+import socket
+from collections import Counter
+
+from social import classify
+
+# Finding kinds merged, in result order
+KINDS = ('subdomains', 'emails', 'ips', 'social_profiles')
+
+# Dotted quads already in canonical form (no leading zeros), which need no parse
+_IPV4 = re.compile(r'(?:(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.){3}(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)')
+
+
+def _hostname(value):
+    value = value.strip().rstrip('.').lower()
+    if not value.isascii():
+        try:
+            value = value.encode('idna').decode('ascii')
+        except UnicodeError:
+            # Not a valid IDN; kept as it is rather than dropped
+            pass
+    return value
+
+
+def _email(value):
+    local, at, domain = value.strip().rpartition('@')
+    if not at:
+        return value.strip()
+    return f"{local}@{_hostname(domain)}"
+
+
+def _ip(value):
+    value = value.strip()
+    if _IPV4.fullmatch(value):
+        return value
+    address = value.strip('[]')
+    try:
+        # Done in C; ipaddress takes ten times as long
+        return socket.inet_ntop(socket.AF_INET6, socket.inet_pton(socket.AF_INET6, address))
+    except (OSError, ValueError):
+        pass
+    try:
+        # Scoped addresses (fe80::1%eth0), which inet_pton does not take
+        return str(ipaddress.ip_address(address))
+    except ValueError:
+        return value
+
+
+def _social_profile(value):
+    found = classify(value)
+    return found[1] if found is not None else value.strip()
+
+
+_NORMALIZERS = {
+    'subdomains': _hostname,
+    'emails': _email,
+    'ips': _ip,
+    'social_profiles': _social_profile,
+}
+
+
+def normalize(kind, value):
+    """Return the canonical form of a finding, under which tools' values are compared.
+
+    Hostnames are lowercased, without the trailing dot, with international
+    names in their ASCII (punycode) form; emails get that done to their
+    domain part (the local part is left alone, servers may tell cases
+    apart); IPv6 addresses are compressed and lowercased (RFC 5952);
+    social profiles are canonical profile URLs (see social.classify).
+    Values that do not parse are only stripped of whitespace. Normalizing
+    twice gives the same value.
+    """
+    return _NORMALIZERS[kind](value)
+
+
+class FindingsMerger:
+    """Merges the results of several tools, recording which tools found each finding.
+
+    Values are merged under their normalized form (see normalize), in the
+    order they were first found. Each tool is given one bit, and each
+    finding the bitmask of the tools that found it, which is all the
+    provenance kept per value however many tools there are. Tools can be
+    declared up front, which fixes their bits in that order, or are added
+    as their results come in.
+    """
+
+    def __init__(self, tools=()):
+        self.tools = []
+        self._bits = {}
+        self.findings = {kind: {} for kind in KINDS}
+        self.errors = []
+        # Raw value -> normalized value, per kind; tools report the same raw values
+        self._normalized = {kind: {} for kind in KINDS}
+        for tool in tools:
+            self._bit(tool)
+
+    def _bit(self, tool):
+        bit = self._bits.get(tool)
+        if bit is None:
+            bit = self._bits[tool] = 1 << len(self.tools)
+            self.tools.append(tool)
+        return bit
+
+    def add(self, tool, result):
+        """Merge one tool's result dict; an "error" in it is kept with the others."""
+        bit = self._bit(tool)
+        if "error" in result:
+            self.errors.append(result["error"])
+        for kind in KINDS:
+            values = result.get(kind)
+            if not values:
+                continue
+            findings = self.findings[kind]
+            normalized = self._normalized[kind]
+            normalizer = _NORMALIZERS[kind]
+            for raw in values:
+                value = normalized.get(raw)
+                if value is None:
+                    value = normalized[raw] = normalizer(raw)
+                if value:
+                    findings[value] = findings.get(value, 0) | bit
+
+    def result(self):
+        """Return {kind: [values]} plus "errors", the shape merge_results returns."""
+        merged = {kind: list(findings) for kind, findings in self.findings.items()}
+        merged["errors"] = list(self.errors)
+        return merged
+
+    def tools_of(self, mask):
+        """Return the names of the tools in a bitmask, in tool order."""
+        return [tool for index, tool in enumerate(self.tools) if mask >> index & 1]
+
+    def provenance(self, kind):
+        """Return {value: [tools]} for one kind."""
+        names = {}
+        provenance = {}
+        for value, mask in self.findings[kind].items():
+            tools = names.get(mask)
+            if tools is None:
+                tools = names[mask] = self.tools_of(mask)
+            provenance[value] = tools
+        return provenance
+
+    def overlap(self):
+        """Return per-kind statistics of how much the tools agree.
+
+        For each kind: "total" distinct values, "shared" values found by
+        more than one tool, and per tool the values it "found", those it
+        found "unique"ly (no other tool did) and "with" each other tool
+        the count found by both. Counted over the distinct bitmasks, not
+        the values, so this is cheap however many values there are.
+        """
+        stats = {}
+        for kind, findings in self.findings.items():
+            masks = Counter(findings.values())
+            tools = {
+                tool: {"found": 0, "unique": 0, "with": {other: 0 for other in self.tools if other != tool}}
+                for tool in self.tools
+            }
+            shared = 0
+            for mask, count in masks.items():
+                names = self.tools_of(mask)
+                if len(names) > 1:
+                    shared += count
+                for tool in names:
+                    tools[tool]["found"] += count
+                    if len(names) == 1:
+                        tools[tool]["unique"] += count
+                    for other in names:
+                        if other != tool:
+                            tools[tool]["with"][other] += count
+            stats[kind] = {"total": len(findings), "shared": shared, "tools": tools}
+        return stats
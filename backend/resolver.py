@@ -0,0 +1,129 @@
+# resolver.py
+import asyncio
+import time
+
+import dns.asyncresolver
+import dns.exception
+import dns.rdatatype
+import dns.resolver
+
+from dns_cache import get_cache
+
+# Record types looked up for every name by default. CNAME is queried on its
+# own so that dangling aliases (whose target does not resolve) still show up.
+RECORD_TYPES = ('A', 'AAAA', 'CNAME')
+
+# Subdomain prefixes probed for every scanned domain
+COMMON_PREFIXES = ['www', 'mail', 'ftp', 'smtp', 'pop', 'api', 'dev', 'staging', 'test']
+
+# Queries in flight at once per resolver
+DEFAULT_CONCURRENCY = 50
+
+# Per-try timeout and total time allowed for one query, in seconds
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_LIFETIME = 5.0
+
+
+class AsyncResolver:
+    """Concurrent DNS lookups on top of dns.asyncresolver.
+
+    At most `concurrency` queries are in flight at any time. Names that do
+    not exist, have no records of a type, or fail to answer in time simply
+    come back with empty lists.
+
+    Answers, including "does not exist", are served from and stored in
+    cache (by default the process-wide dns_cache.get_cache()) for their TTL.
+    Failures to get an answer are not cached.
+    """
+
+    def __init__(self, nameservers=None, port=53, concurrency=DEFAULT_CONCURRENCY,
+                 timeout=DEFAULT_TIMEOUT, lifetime=DEFAULT_LIFETIME, cache=None):
+        # Without explicit nameservers, use the system's (/etc/resolv.conf)
+        self._resolver = dns.asyncresolver.Resolver(configure=nameservers is None)
+        if nameservers is not None:
+            self._resolver.nameservers = list(nameservers)
+            self._resolver.port = port
+        self._resolver.timeout = timeout
+        self._resolver.lifetime = lifetime
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._cache = cache if cache is not None else get_cache()
+
+    async def query(self, name, rdtype):
+        """Return the values of name's rdtype records as strings."""
+        cached = self._cache.get(name, rdtype)
+        if cached is not None:
+            return cached
+
+        async with self._semaphore:
+            try:
+                answer = await self._resolver.resolve(name, rdtype, search=False, raise_on_no_answer=False)
+            except dns.resolver.NXDOMAIN as e:
+                responses = list(e.responses().values())
+                ttl = _negative_ttl(responses[-1]) if responses else None
+                target = e.canonical_name.to_text(omit_final_dot=True)
+                self._cache.put_nxdomain(target, ttl)
+                if target.lower() != name.lower().rstrip('.'):
+                    # Only the end of a CNAME chain is missing; name itself exists
+                    self._cache.put(name, rdtype, [], self._cache.negative_ttl if ttl is None else ttl)
+                return []
+            except (dns.resolver.NoNameservers, dns.exception.Timeout):
+                return []
+
+        if answer.rrset is None:
+            ttl = _negative_ttl(answer.response)
+            self._cache.put(name, rdtype, [], self._cache.negative_ttl if ttl is None else ttl)
+            return []
+        if rdtype == 'CNAME':
+            values = [record.target.to_text(omit_final_dot=True) for record in answer.rrset]
+        else:
+            values = [record.to_text() for record in answer.rrset]
+        # expiration already accounts for every record in a CNAME chain
+        self._cache.put(name, rdtype, values, answer.expiration - time.time())
+        return values
+
+    async def resolve(self, name, rdtypes=RECORD_TYPES):
+        """Return {rdtype: [values]} for one name, querying all types concurrently."""
+        values = await asyncio.gather(*(self.query(name, rdtype) for rdtype in rdtypes))
+        return dict(zip(rdtypes, values))
+
+    async def resolve_many(self, names, rdtypes=RECORD_TYPES):
+        """Return {name: {rdtype: [values]}} for many names in one concurrent pass."""
+        names = list(dict.fromkeys(names))
+        records = await asyncio.gather(*(self.resolve(name, rdtypes) for name in names))
+        return dict(zip(names, records))
+
+
+def _negative_ttl(response):
+    """TTL for a negative answer from the SOA in its authority section (RFC 2308)."""
+    for rrset in response.authority:
+        if rrset.rdtype == dns.rdatatype.SOA:
+            return min(rrset.ttl, rrset[0].minimum)
+    return None
+
+
+def addresses(records):
+    """Return the IPv4 and IPv6 addresses in a resolve() result."""
+    return records.get('A', []) + records.get('AAAA', [])
+
+
+async def resolve_domain(domain, prefixes=COMMON_PREFIXES, resolver=None):
+    """Resolve a domain and its common subdomains in a single pass.
+
+    Returns {'subdomains': [...], 'ips': [...], 'records': {name: {rdtype: [values]}}}
+    where subdomains are the prefixed names that have any A, AAAA or CNAME
+    record and ips are the addresses of the domain and those subdomains.
+    """
+    resolver = resolver or AsyncResolver()
+    candidates = [f"{prefix}.{domain}" for prefix in prefixes]
+    records = await resolver.resolve_many([domain] + candidates)
+
+    subdomains = [name for name in candidates if any(records[name].values())]
+    ips = []
+    for name in [domain] + subdomains:
+        ips.extend(addresses(records[name]))
+
+    return {
+        'subdomains': subdomains,
+        'ips': list(dict.fromkeys(ips)),
+        'records': records
+    }
@@ -0,0 +1,196 @@
+"""Retention for the scans database.
+
+Scans older than the TTL for their status are copied to Parquet files under
+ARCHIVE_DIR and then removed from the live database, whose freed pages are
+handed back with an incremental vacuum. This keeps the hot database small
+while old results stay queryable offline with read_archive (or any Parquet
+reader: pandas, pyarrow, DuckDB, Spark).
+
+Run from the backend directory:
+
+    python retention.py [--ttl completed=90] [--ttl running=7] [--archive-dir data/archive] [--dry-run]
+
+The API also runs apply_retention in the background every
+RETENTION_INTERVAL_HOURS hours (0 turns that off); RETENTION_TTLS overrides
+the default TTLs with the same "status=days,..." format as --ttl.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import storage
+
+logger = logging.getLogger(__name__)
+
+# How long a scan stays in the live database, by status. Statuses without an
+# entry are kept forever. A scan still "running" after a week was abandoned
+# by a worker that died.
+DEFAULT_TTLS = {
+    'completed': timedelta(days=90),
+    'running': timedelta(days=7),
+    'failed': timedelta(days=90),
+    'cancelled': timedelta(days=90),
+}
+
+ARCHIVE_DIR = os.path.join('data', 'archive')
+
+# Scans archived and deleted per batch; each batch is one Parquet file per
+# table and one write transaction.
+BATCH_SIZE = 500
+
+# Upper bound on pages freed per incremental vacuum step, so a large purge
+# does not hold the write lock for long at a time.
+VACUUM_STEP_PAGES = 2048
+
+# Fixed schemas, so every part of a table reads back as one dataset even
+# when a batch has only nulls in some column
+ARCHIVE_SCHEMAS = {
+    'scans': pa.schema(
+        [
+            ('scan_id', pa.string()),
+            ('domain', pa.string()),
+            ('start_time', pa.string()),
+            ('end_time', pa.string()),
+            ('status', pa.string()),
+            ('results', pa.string()),
+        ] + [(kind, pa.int64()) for kind in storage.FINDING_KINDS]
+    ),
+    'findings': pa.schema([
+        ('scan_id', pa.string()),
+        ('domain', pa.string()),
+        ('kind', pa.string()),
+        ('value', pa.string()),
+        ('source', pa.string()),
+    ]),
+}
+ARCHIVE_TABLES = tuple(ARCHIVE_SCHEMAS)
+
+
+def parse_ttls(spec):
+    """Parse "status=days,status=days" into {status: timedelta}."""
+    ttls = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        status, sep, days = item.partition('=')
+        if not sep or not status.strip():
+            raise ValueError(f"Invalid TTL {item!r}, expected status=days")
+        ttls[status.strip()] = timedelta(days=float(days))
+    return ttls
+
+
+def _write_parts(archive_dir, scans, findings):
+    """Write one Parquet part per table for a batch of exported scans."""
+    part = f"part-{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid4().hex[:8]}.parquet"
+    for table, rows in (('scans', scans), ('findings', findings)):
+        if not rows:
+            continue
+        table_dir = os.path.join(archive_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+        path = os.path.join(table_dir, part)
+        # Write then rename, so readers never see a half-written part
+        table_data = pa.Table.from_pylist(rows, schema=ARCHIVE_SCHEMAS[table])
+        pq.write_table(table_data, path + '.tmp', compression='zstd')
+        os.replace(path + '.tmp', path)
+
+
+def archive_scans(scan_ids, archive_dir=None):
+    """Copy scans to the archive and delete them from the live database.
+
+    Returns the number of scans archived. Deletion only happens after the
+    archive files are written; if it fails, the next run archives the same
+    scans again and read_archive drops the duplicates.
+    """
+    scans, findings = storage.export_scans(scan_ids)
+    if not scans:
+        return 0
+    _write_parts(archive_dir or ARCHIVE_DIR, scans, findings)
+    storage.delete_scans([scan['scan_id'] for scan in scans])
+    return len(scans)
+
+
+def apply_retention(ttls=None, now=None, archive_dir=None, batch_size=BATCH_SIZE, dry_run=False):
+    """Archive every scan past its status TTL and compact the database.
+
+    Returns {'archived': {status: count}, 'pages_freed': n}. With dry_run,
+    only counts what would be archived.
+    """
+    ttls = DEFAULT_TTLS if ttls is None else ttls
+    # start_time is written in UTC
+    now = now or datetime.utcnow()
+    archived = {}
+
+    for status, ttl in ttls.items():
+        cutoff = now - ttl
+        if dry_run:
+            # A negative LIMIT means no limit in SQLite
+            archived[status] = len(storage.find_expired_scans(status, cutoff, limit=-1))
+            continue
+
+        archived[status] = 0
+        while True:
+            scan_ids = storage.find_expired_scans(status, cutoff, limit=batch_size)
+            if not scan_ids:
+                break
+            archived[status] += archive_scans(scan_ids, archive_dir)
+
+    pages_freed = 0
+    if not dry_run and any(archived.values()):
+        while True:
+            freed = storage.compact_database(max_pages=VACUUM_STEP_PAGES)
+            pages_freed += freed
+            if freed < VACUUM_STEP_PAGES:
+                break
+
+    return {'archived': archived, 'pages_freed': pages_freed}
+
+
+def read_archive(table='findings', archive_dir=None, filters=None, columns=None):
+    """Load archived rows into a DataFrame.
+
+    table is 'scans' or 'findings'; filters uses pyarrow's predicate format,
+    e.g. [('kind', '==', 'emails'), ('domain', '==', 'example.com')], and is
+    pushed down into the Parquet reader.
+    """
+    if table not in ARCHIVE_TABLES:
+        raise ValueError(f"Unknown archive table: {table}")
+    table_dir = os.path.join(archive_dir or ARCHIVE_DIR, table)
+    if not os.path.isdir(table_dir) or not any(name.endswith('.parquet') for name in os.listdir(table_dir)):
+        return pd.DataFrame(columns=columns)
+
+    frame = pd.read_parquet(table_dir, filters=filters, columns=columns)
+    return frame.drop_duplicates(ignore_index=True)
+
+
+def run_periodically(interval_hours, ttls=None, archive_dir=None):
+    """Apply retention every interval_hours, forever. Meant for a daemon thread."""
+    while True:
+        try:
+            summary = apply_retention(ttls=ttls, archive_dir=archive_dir)
+            logger.info(json.dumps({"event": "retention_completed", **summary}))
+        except Exception as e:
+            logger.error(json.dumps({"event": "retention_failed", "error": str(e)}))
+        time.sleep(interval_hours * 3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ttl', action='append', default=[],
+                        help='status=days; repeat per status (default: %s)' % ', '.join(
+                            f"{status}={ttl.days}" for status, ttl in DEFAULT_TTLS.items()))
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR)
+    parser.add_argument('--dry-run', action='store_true', help='only count the scans that would be archived')
+    args = parser.parse_args()
+
+    ttls = parse_ttls(','.join(args.ttl)) if args.ttl else None
+    print(json.dumps(apply_retention(ttls=ttls, archive_dir=args.archive_dir, dry_run=args.dry_run)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+# scheduler.py
+import asyncio
+import contextlib
+import os
+import socket
+import time
+from collections import Counter
+
+from db import get_connection, get_batcher
+
+# Priority classes, best first. Scans started by a person waiting on the UI
+# are interactive; sweeps submitted by scripts are bulk.
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+PRIORITIES = {INTERACTIVE: 0, BULK: 1}
+PRIORITY_NAMES = {rank: name for name, rank in PRIORITIES.items()}
+
+# Tool runs allowed at once across all worker processes
+DEFAULT_GLOBAL_LIMIT = 16
+
+# Seconds a tool slot (waiting or running) stays reserved without renewal;
+# slots of a worker process that died are freed after this
+SLOT_LEASE_SECONDS = 30
+
+# Seconds between looks at the shared slot table while requests are waiting
+DISPATCH_INTERVAL = 0.25
+
+# Seconds of wait times kept for stats
+STATS_WINDOW = 3600
+
+# scheduler_waits resource under which scan job waits are recorded
+SCAN_RESOURCE = 'scan'
+
+
+def create_schema(conn):
+    """Create the scheduler tables (called from the storage schema initializer)."""
+    # One row per tool run that is waiting for a slot (granted_at NULL) or holds one
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS tool_slots (
+        slot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tool TEXT NOT NULL,
+        scan_id TEXT NOT NULL,
+        submitter TEXT NOT NULL,
+        priority INTEGER NOT NULL,
+        owner TEXT NOT NULL,
+        requested_at REAL NOT NULL,
+        granted_at REAL,
+        lease_expires REAL NOT NULL
+    )
+    ''')
+    # How long recent scans and tool runs waited to start, by resource
+    # (SCAN_RESOURCE or a tool name)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS scheduler_waits (
+        resource TEXT NOT NULL,
+        waited REAL NOT NULL,
+        recorded_at REAL NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_scheduler_waits_time ON scheduler_waits (recorded_at)')
+
+
+def priority_rank(priority):
+    """Return the stored rank of a priority class name."""
+    try:
+        return PRIORITIES[priority]
+    except KeyError:
+        raise ValueError(f"Unknown priority {priority!r}, expected one of: {', '.join(PRIORITIES)}")
+
+
+def parse_limits(spec):
+    """Parse "tool=n,tool=n" into {tool: n}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        tool, _, limit = item.partition('=')
+        if not tool.strip() or not limit.strip().isdigit():
+            raise ValueError(f"Invalid tool limit {item!r}, expected tool=n")
+        limits[tool.strip()] = int(limit)
+    return limits
+
+
+def record_wait(conn, resource, waited, now):
+    """Log that something of resource waited `waited` seconds to start."""
+    conn.execute(
+        'INSERT INTO scheduler_waits (resource, waited, recorded_at) VALUES (?, ?, ?)',
+        (resource, max(waited, 0.0), now)
+    )
+
+
+def wait_stats(conn, now, window=STATS_WINDOW):
+    """Get {resource: {'count', 'p50', 'p95', 'max'}} of wait seconds over the last window."""
+    waits = {}
+    for resource, waited in conn.execute(
+        'SELECT resource, waited FROM scheduler_waits WHERE recorded_at >= ? ORDER BY waited',
+        (now - window,)
+    ):
+        waits.setdefault(resource, []).append(waited)
+    return {
+        resource: {
+            'count': len(values),
+            'p50': values[len(values) // 2],
+            'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+            'max': values[-1]
+        }
+        for resource, values in waits.items()
+    }
+
+
+def plan_grants(running, waiting, limits, global_limit):
+    """Choose which waiting tool runs may start now.
+
+    running is [(tool, submitter)] for the slots in use and waiting is
+    [(slot_id, tool, submitter, priority, requested_at)]. A better priority
+    class always goes first. Within a class, the submitter with the fewest
+    runs in progress goes next (oldest request first on a tie), so one
+    submitter's burst cannot shut everyone else out. Tools at their limit
+    are skipped over rather than blocking the rest. Returns slot ids.
+    """
+    by_tool = Counter(tool for tool, _ in running)
+    by_submitter = Counter(submitter for _, submitter in running)
+    total = len(running)
+    pending = sorted(waiting, key=lambda row: (row[3], row[4], row[0]))
+    grants = []
+
+    while total < global_limit and pending:
+        best = None
+        for row in pending:
+            _, tool, submitter, priority, _ = row
+            if best is not None and priority > best[3]:
+                break
+            if tool in limits and by_tool[tool] >= limits[tool]:
+                continue
+            if best is None or by_submitter[submitter] < by_submitter[best[2]]:
+                best = row
+        if best is None:
+            break
+        pending.remove(best)
+        grants.append(best[0])
+        by_tool[best[1]] += 1
+        by_submitter[best[2]] += 1
+        total += 1
+    return grants
+
+
+class ToolScheduler:
+    """Admission control for tool runs, shared by every worker process.
+
+    Tool runs wait in the tool_slots table of the scans database until
+    plan_grants lets them start, which enforces the per-tool limits and the
+    global limit across all processes using the database. Each process
+    keeps one dispatcher task on its event loop, which only runs while the
+    process has runs waiting or in progress: it renews their leases, grants
+    whatever is startable (for every process) and wakes up local waiters
+    whose runs were granted.
+
+    limits maps tool name to the most runs allowed at once; tools without
+    an entry are bounded by global_limit alone.
+    """
+
+    def __init__(self, db_file, initializer=None, limits=None, global_limit=DEFAULT_GLOBAL_LIMIT, owner=None,
+                 lease_seconds=SLOT_LEASE_SECONDS, interval=DISPATCH_INTERVAL, clock=time.time):
+        self.db_file = db_file
+        self.initializer = initializer
+        self.limits = dict(limits or {})
+        self.global_limit = global_limit
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self.clock = clock
+        self._loop = None
+        self._waiting = {}
+        self._held = set()
+        self._dispatcher = None
+        self._wake = None
+
+    def _writer(self):
+        return get_batcher(self.db_file, self.initializer)
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Waiters of a loop that has gone away cannot be woken; their
+            # rows expire with their leases
+            self._loop = loop
+            self._waiting = {}
+            self._held = set()
+            self._dispatcher = None
+            self._wake = asyncio.Event()
+        return loop
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tool, scan_id='', submitter='', priority=INTERACTIVE):
+        """Wait until a run of tool may start, and hold its slot inside the block."""
+        loop = self._bind_loop()
+        rank = priority_rank(priority)
+
+        def request(conn):
+            now = self.clock()
+            return conn.execute(
+                'INSERT INTO tool_slots (tool, scan_id, submitter, priority, owner, requested_at, lease_expires) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (tool, scan_id, submitter, rank, self.owner, now, now + self.lease_seconds)
+            ).lastrowid
+
+        slot_id = await asyncio.wrap_future(self._writer().submit(request))
+        granted = loop.create_future()
+        self._waiting[slot_id] = granted
+        self._kick()
+        try:
+            await granted
+            yield
+        finally:
+            self._waiting.pop(slot_id, None)
+            self._held.discard(slot_id)
+            await asyncio.wrap_future(self._writer().submit(
+                lambda conn: conn.execute('DELETE FROM tool_slots WHERE slot_id = ?', (slot_id,))
+            ))
+            self._kick()
+
+    async def run(self, tool, coroutine_function, scan_id='', submitter='', priority=INTERACTIVE):
+        """Run coroutine_function() once tool gets a slot and return its result."""
+        async with self.slot(tool, scan_id=scan_id, submitter=submitter, priority=priority):
+            return await coroutine_function()
+
+    def _kick(self):
+        self._wake.set()
+        if self._dispatcher is None:
+            self._dispatcher = self._loop.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while self._waiting or self._held:
+            self._wake.clear()
+            granted = await asyncio.wrap_future(self._writer().submit(
+                self._tick_operation(list(self._waiting), list(self._held))
+            ))
+            for slot_id in granted:
+                future = self._waiting.pop(slot_id, None)
+                if future is not None and not future.done():
+                    self._held.add(slot_id)
+                    future.set_result(None)
+            # Only leases to renew: no need to look at the table as often
+            timeout = self.interval if self._waiting else self.lease_seconds / 3
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._dispatcher = None
+
+    def _tick_operation(self, waiting, held):
+        def operation(conn):
+            now = self.clock()
+            # Slots of processes that stopped renewing them
+            conn.execute('DELETE FROM tool_slots WHERE lease_expires < ?', (now,))
+            local = waiting + held
+            if local:
+                placeholders = ','.join('?' * len(local))
+                conn.execute(
+                    f'UPDATE tool_slots SET lease_expires = ? WHERE slot_id IN ({placeholders})',
+                    (now + self.lease_seconds, *local)
+                )
+
+            running = conn.execute(
+                'SELECT tool, submitter FROM tool_slots WHERE granted_at IS NOT NULL'
+            ).fetchall()
+            queued = conn.execute(
+                'SELECT slot_id, tool, submitter, priority, requested_at FROM tool_slots WHERE granted_at IS NULL'
+            ).fetchall()
+            grants = set(plan_grants(running, queued, self.limits, self.global_limit))
+            for slot_id, tool, _, _, requested_at in queued:
+                if slot_id in grants:
+                    conn.execute('UPDATE tool_slots SET granted_at = ? WHERE slot_id = ?', (now, slot_id))
+                    record_wait(conn, tool, now - requested_at, now)
+            conn.execute('DELETE FROM scheduler_waits WHERE recorded_at < ?', (now - STATS_WINDOW,))
+
+            if not waiting:
+                return []
+            placeholders = ','.join('?' * len(waiting))
+            return [row[0] for row in conn.execute(
+                f'SELECT slot_id FROM tool_slots WHERE granted_at IS NOT NULL AND slot_id IN ({placeholders})',
+                waiting
+            )]
+
+        return operation
+
+    def stats(self):
+        """Get tool slot usage, queue depth and recent wait times, per tool."""
+        conn = get_connection(self.db_file, self.initializer)
+        now = self.clock()
+        tools = {}
+        for tool, running, waiting, oldest in conn.execute(
+            'SELECT tool, COUNT(granted_at), COUNT(*) - COUNT(granted_at), '
+            'MIN(CASE WHEN granted_at IS NULL THEN requested_at END) '
+            'FROM tool_slots WHERE lease_expires >= ? GROUP BY tool',
+            (now,)
+        ):
+            tools[tool] = {
+                'running': running,
+                'waiting': waiting,
+                'oldest_wait_seconds': now - oldest if oldest is not None else 0.0
+            }
+        waits = wait_stats(conn, now)
+        for tool in set(self.limits) | (set(waits) - {SCAN_RESOURCE}):
+            tools.setdefault(tool, {'running': 0, 'waiting': 0, 'oldest_wait_seconds': 0.0})
+        for tool, entry in tools.items():
+            entry['limit'] = self.limits.get(tool)
+            entry['recent_waits'] = waits.get(tool)
+
+        return {
+            'global_limit': self.global_limit,
+            'running': sum(entry['running'] for entry in tools.values()),
+            'waiting': sum(entry['waiting'] for entry in tools.values()),
+            'tools': tools,
+            'scan_waits': waits.get(SCAN_RESOURCE)
+        }
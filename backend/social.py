@@ -0,0 +1,151 @@
+# social.py
+import re
+from urllib.parse import parse_qsl, urlencode
+
+# First path segments that are site features rather than accounts
+_TWITTER_RESERVED = ('intent', 'share', 'home', 'search', 'hashtag', 'i', 'explore', 'login', 'signup',
+                     'settings', 'messages', 'notifications', 'tos', 'privacy', 'compose')
+_FACEBOOK_RESERVED = ('sharer', 'sharer.php', 'share.php', 'dialog', 'plugins', 'share', 'login', 'login.php',
+                      'home.php', 'groups', 'events', 'watch', 'photo.php', 'story.php', 'permalink.php',
+                      'hashtag', 'policies', 'privacy', 'help', 'business', 'marketplace', 'gaming')
+_INSTAGRAM_RESERVED = ('p', 'explore', 'accounts', 'reel', 'reels', 'stories', 'direct', 'about', 'legal',
+                       'developer', 'tv')
+_GITHUB_RESERVED = ('features', 'about', 'pricing', 'login', 'join', 'marketplace', 'explore', 'topics',
+                    'sponsors', 'settings', 'apps', 'site', 'security', 'enterprise', 'enterprises',
+                    'collections', 'trending', 'events', 'notifications', 'search', 'new', 'contact',
+                    'customer-stories', 'orgs', 'organizations', 'account', 'dashboard', 'codespaces',
+                    'issues', 'pulls')
+_COMMON_RESERVED = ('login', 'signup', 'register', 'join', 'search', 'explore', 'discover', 'about', 'help',
+                    'settings', 'share', 'home', 'privacy', 'terms', 'legal', 'jobs', 'upload')
+
+
+def _not(reserved):
+    return '(?!(?:' + '|'.join(re.escape(name) for name in reserved) + ')(?:/|$))'
+
+
+# name: (hosts, the first being the canonical one; pattern of the profile
+# part of the path; whether that part is case-sensitive; query parameters
+# that are part of the profile URL). Subdomains of a host belong to its
+# platform (uk.linkedin.com, m.facebook.com).
+PLATFORMS = {
+    'twitter': (('twitter.com', 'x.com'), rf'/{_not(_TWITTER_RESERVED)}[a-z0-9_]{{1,15}}', False, ()),
+    'facebook': (('facebook.com', 'fb.com', 'fb.me'),
+                 rf'/profile\.php|/pages/[^/]+/\d+|/{_not(_FACEBOOK_RESERVED)}[a-z0-9.]{{5,50}}', False, ('id',)),
+    'instagram': (('instagram.com', 'instagr.am'), rf'/{_not(_INSTAGRAM_RESERVED)}[a-z0-9_.]{{1,30}}', False, ()),
+    'linkedin': (('linkedin.com',), r'/(?:company|in|school|showcase)/[^/]+', False, ()),
+    'youtube': (('youtube.com',), r'/(?:channel|c|user)/[^/]+|/@[^/]+', True, ()),
+    'github': (('github.com',), rf'/orgs/[a-z0-9-]{{1,39}}|/{_not(_GITHUB_RESERVED)}[a-z0-9-]{{1,39}}', False, ()),
+    'gitlab': (('gitlab.com',), rf'/{_not(_COMMON_RESERVED + ("users", "dashboard", "-"))}[a-z0-9_.-]{{2,255}}',
+               False, ()),
+    'tiktok': (('tiktok.com',), r'/@[a-z0-9_.]{2,24}', False, ()),
+    'pinterest': (('pinterest.com',), rf'/{_not(_COMMON_RESERVED + ("pin", "ideas", "today", "business", "_"))}'
+                                      r'[a-z0-9_]{3,30}', False, ()),
+    'reddit': (('reddit.com',), r'/(?:r|user|u)/[a-z0-9_-]+', False, ()),
+    'medium': (('medium.com',), r'/@[a-z0-9_.-]+', False, ()),
+    'telegram': (('t.me', 'telegram.me'), rf'/{_not(("share", "joinchat", "addstickers", "proxy", "iv", "s"))}'
+                                          r'[a-z0-9_]{5,32}', False, ()),
+    'discord': (('discord.gg',), r'/[a-z0-9-]{2,32}', True, ()),
+    'mastodon': (('mastodon.social',), r'/@[a-z0-9_]+', False, ()),
+    'threads': (('threads.net',), r'/@[a-z0-9_.]+', False, ()),
+    'bluesky': (('bsky.app',), r'/profile/[a-z0-9.:-]+', False, ()),
+    'tumblr': (('tumblr.com',), rf'/{_not(_COMMON_RESERVED + ("dashboard", "tagged", "policy", "widgets"))}'
+                                r'[a-z0-9-]+', False, ()),
+    'vimeo': (('vimeo.com',),
+              rf'/(?!\d+(?:/|$)){_not(_COMMON_RESERVED + ("ondemand", "log_in", "categories", "watch"))}[a-z0-9_]+',
+              False, ()),
+    'twitch': (('twitch.tv',),
+               rf'/{_not(_COMMON_RESERVED + ("directory", "p", "subscriptions", "videos"))}[a-z0-9_]{{4,25}}',
+               False, ()),
+    'behance': (('behance.net',), rf'/{_not(_COMMON_RESERVED + ("gallery", "galleries", "joblist", "live", "assets"))}'
+                                  r'[a-z0-9_-]+', False, ()),
+    'dribbble': (('dribbble.com',),
+                 rf'/{_not(_COMMON_RESERVED + ("shots", "designers", "tags", "stories", "session", "pro"))}[a-z0-9_-]+',
+                 False, ()),
+    'crunchbase': (('crunchbase.com',), r'/(?:organization|person)/[a-z0-9-]+', False, ()),
+    'wellfound': (('wellfound.com', 'angel.co'), r'/(?:company|u)/[a-z0-9-]+', False, ()),
+    'snapchat': (('snapchat.com',), r'/add/[a-z0-9._-]+', False, ()),
+    'soundcloud': (('soundcloud.com',),
+                   rf'/{_not(_COMMON_RESERVED + ("stream", "you", "pages", "mobile", "charts", "signin"))}[a-z0-9_-]+',
+                   False, ()),
+    'flickr': (('flickr.com',), r'/(?:photos|people)/[^/]+', False, ()),
+    'quora': (('quora.com',), r'/profile/[^/]+', False, ()),
+    'vk': (('vk.com',), rf'/{_not(_COMMON_RESERVED + ("share.php", "away.php", "feed", "im", "video", "audio"))}'
+                        r'[a-z0-9_.]+', False, ()),
+    'xing': (('xing.com',), r'/(?:profile|pages|companies)/[^/]+', False, ()),
+    'producthunt': (('producthunt.com',), r'/@[a-z0-9_]+|/products/[a-z0-9-]+', False, ()),
+    'patreon': (('patreon.com',), rf'/{_not(_COMMON_RESERVED + ("posts", "c", "policy"))}[a-z0-9_]+', False, ()),
+    'stackoverflow': (('stackoverflow.com',), r'/users/\d+', False, ()),
+    'yelp': (('yelp.com',), r'/biz/[a-z0-9-]+', False, ()),
+    'linktree': (('linktr.ee',), r'/[a-z0-9_.]+', False, ()),
+}
+
+# host: (platform, canonical host, compiled pattern, case-sensitive, kept params)
+_HOSTS = {}
+for _name, (_hosts, _pattern, _case_sensitive, _params) in PLATFORMS.items():
+    _compiled = re.compile(rf'(?:{_pattern})(?=/|$)', re.IGNORECASE)
+    for _host in _hosts:
+        _HOSTS[_host] = (_name, _hosts[0], _compiled, _case_sensitive, _params)
+
+
+# Label counts of the hosts above, so a lookup only tries suffixes that could match
+_LABEL_COUNTS = frozenset(host.count('.') + 1 for host in _HOSTS)
+_MAX_LABELS = max(_LABEL_COUNTS)
+
+
+def _platform(host):
+    """Find the platform of host or of a parent domain of it, by suffix."""
+    dot = len(host)
+    for labels in range(1, _MAX_LABELS + 1):
+        dot = host.rfind('.', 0, dot)
+        if labels in _LABEL_COUNTS:
+            platform = _HOSTS.get(host[dot + 1:])
+            if platform is not None:
+                return platform
+        if dot == -1:
+            return None
+    return None
+
+
+_URL = re.compile(r'https?://(?:[^/?#@]*@)?([^/?#:@\[\]]+)(?::\d*)?(?=[/?#]|$)([^?#]*)(?:\?([^#]*))?', re.IGNORECASE)
+
+
+def classify(url):
+    """Return (platform, canonical profile URL) for a social profile URL, else None.
+
+    The host is looked up by suffix, so "notfacebook.com" is no Facebook
+    page, while "m.facebook.com" is. Links that are not profiles (share
+    intents, posts, search pages) give None. The canonical URL is https on
+    the platform's main host, with the profile part of the path only: no
+    www, trailing slash, tracking parameters or fragment.
+    """
+    # One regex splits the URL; urlsplit took longer than all the rest
+    match = _URL.match(url.strip())
+    if match is None:
+        return None
+    host, path, query = match.groups()
+    platform = _platform(host.rstrip('.').lower())
+    if platform is None:
+        return None
+    name, canonical_host, pattern, case_sensitive, params = platform
+
+    match = pattern.match(path)
+    if match is None:
+        return None
+    path = match.group(0) if case_sensitive else match.group(0).lower()
+    if params and path.endswith('.php'):
+        # profile.php identifies nobody without its id
+        kept = [(key, value) for key, value in parse_qsl(query or '') if key in params]
+        if not kept:
+            return None
+        return name, f"https://{canonical_host}{path}?{urlencode(sorted(kept))}"
+    return name, f"https://{canonical_host}{path}"
+
+
+def find_profiles(links):
+    """Return the canonical social profile URLs among links, without repeats, in order."""
+    profiles = {}
+    for link in dict.fromkeys(links):
+        found = classify(link)
+        if found is not None:
+            profiles.setdefault(found[1], None)
+    return list(profiles)
@@ -1,8 +1,16 @@
 # storage.py
-import sqlite3
+import base64
 import json
 import os
-from datetime import datetime
+import sqlite3
+import time
+import zlib
+from datetime import datetime, timedelta
+from db import get_connection, get_batcher
+from job_queue import JobQueue, create_schema as create_job_schema
+from merge import normalize
+from scheduler import (ToolScheduler, INTERACTIVE, BULK, DEFAULT_GLOBAL_LIMIT, SCAN_RESOURCE,
+                       create_schema as create_scheduler_schema, parse_limits, priority_rank, record_wait)
 
 # Ensure the data directory exists
 os.makedirs('data', exist_ok=True)
@@ -10,11 +18,34 @@ os.makedirs('data', exist_ok=True)
 # SQLite database file
 DB_FILE = 'data/osint_scans.db'
 
-def init_db():
-    """Initialize the database with required tables."""
-    conn = sqlite3.connect(DB_FILE)
+# Result keys whose list values are stored as rows in the findings table
+FINDING_KINDS = ('subdomains', 'emails', 'ips', 'social_profiles')
+
+# scans.results holds a BLOB whose first byte names the encoding of the rest.
+# Rows written before compression hold plain JSON TEXT and stay readable.
+RESULTS_FORMAT_ZLIB = b'\x01'
+RESULTS_COMPRESSION_LEVEL = 6
+
+# Repeat scans of a domain store only the findings added and removed since
+# the previous completed scan. Every SNAPSHOT_INTERVAL-th scan in a chain is
+# written in full, which bounds how many deltas a read has to replay.
+SNAPSHOT_INTERVAL = 10
+
+def _create_schema(conn):
+    """Create the required tables on a fresh connection."""
     cursor = conn.cursor()
-    
+
+    # Let retention hand freed pages back to the OS a little at a time.
+    # auto_vacuum can only change through a VACUUM, which is instant while
+    # the file is still empty; compact_database converts older files.
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table'").fetchone():
+        try:
+            _enable_incremental_vacuum(conn)
+        except sqlite3.OperationalError:
+            # Busy past busy_timeout: another process is creating the file
+            # too, and compact_database converts it later if need be
+            pass
+
     # Create scans table if it doesn't exist
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS scans (
@@ -26,91 +57,1172 @@ def init_db():
         status TEXT NOT NULL
     )
     ''')
-    
+
+    # One row per (scan, kind, value, tool). source is '' when the tool
+    # that produced a value is unknown.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS findings (
+        scan_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        value TEXT NOT NULL,
+        source TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (scan_id, kind, value, source)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_findings_kind_value ON findings (kind, value)')
+
+    # Delta storage: a scan with a base_scan_id holds only its changes
+    # against that scan (op 1 = added, -1 = removed); chain_length counts
+    # the deltas back to the nearest full snapshot.
+    _add_column(conn, 'scans', 'base_scan_id', 'TEXT')
+    _add_column(conn, 'scans', 'chain_length', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(conn, 'findings', 'op', 'INTEGER NOT NULL DEFAULT 1')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_base ON scans (base_scan_id)')
+
+    # Per-kind finding counts, so listings never have to rebuild a scan
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS scan_counts (
+        scan_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (scan_id, kind)
+    ) WITHOUT ROWID
+    ''')
+
+    # Keyset pagination indexes for list_scans (newest first)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_start ON scans (start_time, scan_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_domain_start ON scans (domain, start_time, scan_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_status_start ON scans (status, start_time, scan_id)')
+
+    # Compact integer handle for a scan, used where a scan id would be
+    # repeated many times (the asset index)
+    _add_column(conn, 'scans', 'scan_key', 'INTEGER')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_scans_key ON scans (scan_key)')
+    cursor.execute(
+        'UPDATE scans SET scan_key = rowid + (SELECT IFNULL(MAX(scan_key), 0) FROM scans) '
+        'WHERE scan_key IS NULL'
+    )
+
+    # Cross-scan inverted index: every distinct asset value once, and the
+    # scans it was seen in. Maintained by update_scan_results.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS assets (
+        asset_id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        value TEXT NOT NULL,
+        UNIQUE (kind, value)
+    )
+    ''')
+    sighting_columns = [row[1] for row in conn.execute('PRAGMA table_info(asset_sightings)')]
+    if 'scan_id' in sighting_columns:
+        # The first version keyed sightings by scan id text; rebuild it
+        cursor.execute('DROP TABLE asset_sightings')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS asset_sightings (
+        asset_id INTEGER NOT NULL,
+        scan_key INTEGER NOT NULL,
+        PRIMARY KEY (asset_id, scan_key)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_asset_sightings_scan ON asset_sightings (scan_key, asset_id)')
+
+    # Where each tool of a scan is at (see workers.ToolStrategy.state)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS scan_tools (
+        scan_id TEXT NOT NULL,
+        tool TEXT NOT NULL,
+        state TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT,
+        error TEXT,
+        PRIMARY KEY (scan_id, tool)
+    ) WITHOUT ROWID
+    ''')
+
+    # Bulk submissions (POST /batches) and the scans of their domains
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS batches (
+        batch_id TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        priority TEXT NOT NULL,
+        submitter TEXT NOT NULL,
+        total INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS batch_scans (
+        batch_id TEXT NOT NULL,
+        scan_id TEXT NOT NULL,
+        domain TEXT NOT NULL,
+        PRIMARY KEY (batch_id, domain)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_batch_scans_scan ON batch_scans (scan_id)')
+
+    # What happened during scans, in order, for live subscribers (events.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS scan_events (
+        event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        scan_id TEXT NOT NULL,
+        type TEXT NOT NULL,
+        data TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_events_scan ON scan_events (scan_id, event_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_events_time ON scan_events (created_at)')
+
+    # Scans waiting for (or being run by) a worker process, and the tool
+    # runs of those scans waiting for (or holding) a scheduler slot
+    create_job_schema(conn)
+    create_scheduler_schema(conn)
+
     conn.commit()
-    conn.close()
+    _backfill_scan_counts(conn)
+    _backfill_asset_index(conn)
 
-# Initialize the database
-init_db()
+def _add_column(conn, table, column, declaration):
+    """Add a column to an existing table unless it is already there."""
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    if column not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+
+def _enable_incremental_vacuum(conn):
+    """Switch the database file to auto_vacuum=INCREMENTAL (rewrites the file)."""
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+
+def _backfill_scan_counts(conn):
+    """Fill scan_counts from findings the first time the table exists."""
+    if conn.execute('SELECT 1 FROM scan_counts LIMIT 1').fetchone():
+        return
+    with conn:
+        # Scans written before delta storage are all full snapshots
+        conn.execute(
+            'INSERT OR IGNORE INTO scan_counts (scan_id, kind, count) '
+            'SELECT scan_id, kind, COUNT(DISTINCT value) FROM findings GROUP BY scan_id, kind'
+        )
+
+def _backfill_asset_index(conn):
+    """Build the asset index from existing findings the first time it exists."""
+    if conn.execute('SELECT 1 FROM asset_sightings LIMIT 1').fetchone():
+        return
+
+    scan_ids = [row[0] for row in conn.execute('SELECT DISTINCT scan_id FROM findings')]
+    with conn:
+        for scan_id in scan_ids:
+            pairs = [
+                (kind, value)
+                for kind, values in _load_findings(conn, scan_id).items()
+                for value in values
+            ]
+            _index_assets(conn, scan_id, pairs)
+
+def _connection():
+    """Return this thread's pooled connection to the current DB_FILE."""
+    return get_connection(DB_FILE, _create_schema)
+
+def init_db():
+    """Initialize the database with required tables."""
+    _connection()
+
+def _split_findings(scan_id, results, sources=None):
+    """Split a results dict into its residual part and findings rows.
+
+    Each finding kind is replaced in the residual by its count, which marks
+    it as living in the findings table. sources gives the tools that found
+    each value, as {kind: {value: [tools]}} (see workers.merge_results).
+    """
+    residual = dict(results)
+    rows = []
+
+    for kind in FINDING_KINDS:
+        values = results.get(kind)
+        if not isinstance(values, list):
+            continue
+
+        found_by = (sources or {}).get(kind) or {}
+        unique_values = list(dict.fromkeys(values))
+        for value in unique_values:
+            for tool in found_by.get(value) or ['']:
+                rows.append((scan_id, kind, value, tool))
+        residual[kind] = len(unique_values)
+
+    return residual, rows
+
+def _encode_results(results):
+    """Serialize a results dict into the compressed storage format."""
+    payload = json.dumps(results, separators=(',', ':')).encode()
+    return RESULTS_FORMAT_ZLIB + zlib.compress(payload, RESULTS_COMPRESSION_LEVEL)
+
+def _load_results(value):
+    """Deserialize a stored results value in any supported format."""
+    if isinstance(value, str):
+        return json.loads(value)
+
+    marker, payload = value[:1], value[1:]
+    if marker == RESULTS_FORMAT_ZLIB:
+        return json.loads(zlib.decompress(payload))
+    raise ValueError(f"Unknown results format marker: {marker!r}")
+
+def _delta_chain(conn, scan_id):
+    """Return the scan ids from the nearest full snapshot up to scan_id."""
+    chain = []
+    current = scan_id
+    while current is not None and current not in chain:
+        chain.append(current)
+        row = conn.execute('SELECT base_scan_id FROM scans WHERE scan_id = ?', (current,)).fetchone()
+        current = row[0] if row else None
+    chain.reverse()
+    return chain
+
+def _reconstruct_findings(conn, scan_id, kind=None):
+    """Return a scan's (kind, value, source) findings, replaying its deltas.
+
+    Findings keep the order in which they were first stored.
+    """
+    query = 'SELECT kind, value, source, op FROM findings WHERE scan_id = ?'
+    if kind is not None:
+        query += ' AND kind = ?'
+    query += ' ORDER BY rowid'
+
+    current = {}
+    for link in _delta_chain(conn, scan_id):
+        params = (link,) if kind is None else (link, kind)
+        for row_kind, value, source, op in conn.execute(query, params):
+            if op > 0:
+                current[(row_kind, value, source)] = None
+            else:
+                current.pop((row_kind, value, source), None)
+    return list(current)
+
+def _load_findings(conn, scan_id):
+    """Return {kind: [values]} for a scan, in the order they were stored."""
+    findings = {}
+    for kind, value, _ in _reconstruct_findings(conn, scan_id):
+        values = findings.setdefault(kind, {})
+        values[value] = None
+    return {kind: list(values) for kind, values in findings.items()}
+
+def _decode_results(stored, findings):
+    """Rebuild the full results dict from the stored residual and findings."""
+    if not stored:
+        return None
+
+    results = _load_results(stored)
+    if isinstance(results, dict):
+        for kind in FINDING_KINDS:
+            if isinstance(results.get(kind), int):
+                results[kind] = findings.get(kind, [])
+    return results
+
+def _writer():
+    """Return the group-commit writer for the current DB_FILE."""
+    return get_batcher(DB_FILE, _create_schema)
+
+def _insert_scan(conn, scan_id, domain, start_time, status):
+    conn.execute(
+        'INSERT INTO scans (scan_id, domain, start_time, status, scan_key) '
+        'VALUES (?, ?, ?, ?, (SELECT IFNULL(MAX(scan_key), 0) + 1 FROM scans))',
+        (scan_id, domain, start_time.isoformat(), status)
+    )
+
+def submit_store_scan(scan_id, domain, start_time):
+    """Queue the initial scan record; returns a Future resolved on commit."""
+    return _writer().submit(lambda conn: _insert_scan(conn, scan_id, domain, start_time, 'running'))
 
 def store_scan(scan_id, domain, start_time):
     """Store initial scan record in the database."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        'INSERT INTO scans (scan_id, domain, start_time, status) VALUES (?, ?, ?, ?)',
-        (scan_id, domain, start_time.isoformat(), 'running')
+    submit_store_scan(scan_id, domain, start_time).result()
+
+# Seconds scan events are kept for subscribers catching up after a reconnect
+SCAN_EVENTS_TTL = 3600
+
+# Scan statuses after which nothing more happens to a scan
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+def _add_events(conn, scan_id, events):
+    """Record (type, data) events of a scan within the caller's transaction."""
+    now = time.time()
+    conn.executemany(
+        'INSERT INTO scan_events (scan_id, type, data, created_at) VALUES (?, ?, ?, ?)',
+        [(scan_id, event_type, json.dumps(data), now) for event_type, data in events]
     )
-    
-    conn.commit()
-    conn.close()
 
-def update_scan_results(scan_id, results, end_time):
-    """Update scan with results and completion time."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # Convert results to JSON string for storage
-    results_json = json.dumps(results)
-    
-    cursor.execute(
-        'UPDATE scans SET results = ?, end_time = ?, status = ? WHERE scan_id = ?',
-        (results_json, end_time.isoformat(), 'completed', scan_id)
+def _status_changed(conn, scan_id, status):
+    _add_events(conn, scan_id, [('status', {'status': status})])
+    if status in FINAL_STATUSES:
+        conn.execute('DELETE FROM scan_events WHERE created_at < ?', (time.time() - SCAN_EVENTS_TTL,))
+
+def _mark_scan_running(conn, job):
+    cursor = conn.execute(
+        "UPDATE scans SET status = 'running' WHERE scan_id = ? AND status = 'queued'", (job['scan_id'],)
     )
-    
-    conn.commit()
-    conn.close()
+    if cursor.rowcount:
+        _status_changed(conn, job['scan_id'], 'running')
+    record_wait(conn, SCAN_RESOURCE, job['claimed_at'] - job['enqueued_at'], job['claimed_at'])
+
+def _fail_abandoned_scan(conn, job):
+    conn.execute(
+        "UPDATE scans SET status = 'failed', end_time = ?, results = ? WHERE scan_id = ?",
+        (datetime.utcnow().isoformat(), _encode_results({'error': job['error']}), job['scan_id'])
+    )
+    _status_changed(conn, job['scan_id'], 'failed')
+
+def _cancel_queued_scan(conn, job):
+    conn.execute(
+        "UPDATE scans SET status = 'cancelled', end_time = ?, results = ? WHERE scan_id = ?",
+        (datetime.utcnow().isoformat(), _encode_results({'error': 'Scan was cancelled before it finished running'}),
+         job['scan_id'])
+    )
+    _status_changed(conn, job['scan_id'], 'cancelled')
+
+def scan_queue():
+    """Return the queue of scans waiting for a worker (see worker_pool.py).
+
+    A scan is 'queued' until a worker leases its job, then 'running'. Scans
+    whose workers keep dying are marked 'failed', and cancelled scans
+    'cancelled' (see submit_cancel_scan).
+    """
+    return JobQueue(DB_FILE, _create_schema, on_claim=_mark_scan_running, on_dead=_fail_abandoned_scan,
+                    on_cancel=_cancel_queued_scan)
+
+def submit_cancel_scan(scan_id):
+    """Cancel a queued or running scan; the Future gives its status, or None if there is no such scan.
+
+    A queued scan is 'cancelled' at once. A running one becomes
+    'cancelling' until its worker stops the tools and stores what they
+    found so far as a 'cancelled' scan. Finished scans keep their status.
+    """
+    def operation(conn):
+        row = conn.execute('SELECT status FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()
+        if row is None:
+            return None
+        outcome = scan_queue().cancel(conn, scan_id)
+        if outcome == 'cancelling':
+            conn.execute("UPDATE scans SET status = 'cancelling' WHERE scan_id = ?", (scan_id,))
+            _status_changed(conn, scan_id, 'cancelling')
+        return outcome or row[0]
+
+    return _writer().submit(operation)
+
+def cancel_scan(scan_id):
+    """Cancel a queued or running scan (see submit_cancel_scan)."""
+    return submit_cancel_scan(scan_id).result()
+
+# Tool runs allowed at once across all workers, for tools with a limit
+# (TOOL_LIMITS="Amass=2,theHarvester=4" overrides these)
+DEFAULT_TOOL_LIMITS = {'theHarvester': 4, 'Amass': 2, 'WordlistBruteForce': 2}
+
+_schedulers = {}
+
+def tool_scheduler():
+    """Return this process's ToolScheduler for the current DB_FILE.
+
+    Limits come from TOOL_LIMITS and TOOL_GLOBAL_LIMIT when they are set.
+    """
+    scheduler = _schedulers.get(DB_FILE)
+    if scheduler is None:
+        limits = dict(DEFAULT_TOOL_LIMITS, **parse_limits(os.getenv('TOOL_LIMITS')))
+        global_limit = int(os.getenv('TOOL_GLOBAL_LIMIT', DEFAULT_GLOBAL_LIMIT))
+        scheduler = _schedulers[DB_FILE] = ToolScheduler(DB_FILE, _create_schema, limits, global_limit)
+    return scheduler
+
+def scheduler_stats():
+    """Get scan queue depth, tool slot usage and recent wait times (p50/p95/max seconds)."""
+    tools = tool_scheduler().stats()
+    scans = scan_queue().stats()
+    scans['recent_waits'] = tools.pop('scan_waits')
+    return {'scans': scans, **tools}
+
+def submit_enqueue_scan(scan_id, domain, start_time, priority=INTERACTIVE, submitter=''):
+    """Queue a scan record together with its job; returns a Future resolved on commit."""
+    payload = {'domain': domain, 'start_time': start_time.isoformat()}
+
+    def operation(conn):
+        _insert_scan(conn, scan_id, domain, start_time, 'queued')
+        scan_queue().insert(conn, scan_id, payload, priority, submitter)
+
+    return _writer().submit(operation)
+
+def enqueue_scan(scan_id, domain, start_time, priority=INTERACTIVE, submitter=''):
+    """Store a new scan and queue it for the worker pool.
+
+    priority is a scheduler priority class ('interactive' or 'bulk');
+    submitter identifies who asked, for fair sharing between submitters.
+    """
+    submit_enqueue_scan(scan_id, domain, start_time, priority, submitter).result()
+
+# Seconds a completed scan is served to new requests for its domain instead
+# of running the tools again (SCAN_FRESHNESS_SECONDS overrides; 0 disables)
+DEFAULT_FRESHNESS_SECONDS = 3600
+
+def freshness_seconds():
+    return int(os.getenv('SCAN_FRESHNESS_SECONDS', DEFAULT_FRESHNESS_SECONDS))
+
+def _request_scan(conn, scan_id, domain, start_time, priority, submitter, max_age, force):
+    """Queue a scan or find one to share, within the caller's transaction (see submit_request_scan)."""
+    if not force:
+        row = conn.execute(
+            "SELECT s.scan_id, s.status FROM scans s JOIN jobs j ON j.scan_id = s.scan_id "
+            "WHERE s.domain = ? AND s.status IN ('queued', 'running') AND j.state != 'failed' "
+            "ORDER BY s.start_time DESC LIMIT 1",
+            (domain,)
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                'UPDATE jobs SET priority = MIN(priority, ?) WHERE scan_id = ?',
+                (priority_rank(priority), row[0])
+            )
+            return {'scan_id': row[0], 'status': row[1], 'coalesced': 'in_flight'}
+
+        if max_age > 0:
+            row = conn.execute(
+                "SELECT scan_id FROM scans s "
+                "WHERE domain = ? AND status = 'completed' AND end_time >= ? "
+                "AND EXISTS (SELECT 1 FROM scan_counts c WHERE c.scan_id = s.scan_id) "
+                "ORDER BY end_time DESC LIMIT 1",
+                (domain, (start_time - timedelta(seconds=max_age)).isoformat())
+            ).fetchone()
+            if row is not None:
+                return {'scan_id': row[0], 'status': 'completed', 'coalesced': 'fresh'}
+
+    _insert_scan(conn, scan_id, domain, start_time, 'queued')
+    payload = {'domain': domain, 'start_time': start_time.isoformat()}
+    scan_queue().insert(conn, scan_id, payload, priority, submitter)
+    return {'scan_id': scan_id, 'status': 'queued', 'coalesced': None}
+
+def submit_request_scan(scan_id, domain, start_time, priority=INTERACTIVE, submitter='', max_age=None, force=False):
+    """Queue a scan of domain unless an existing scan can answer for it.
+
+    Unless force is set, a scan of the same domain that is still queued or
+    running is shared (an interactive request lifts a bulk job to the
+    interactive class), and failing that, so is the newest scan completed
+    with results within the last max_age seconds (default:
+    freshness_seconds()). The Future gives {'scan_id', 'status',
+    'coalesced'}, where coalesced is 'in_flight', 'fresh' or None for a
+    new scan. Checking and queueing happen in one transaction, so
+    simultaneous requests for a domain end up on the same scan.
+    """
+    max_age = freshness_seconds() if max_age is None else max_age
+    return _writer().submit(
+        lambda conn: _request_scan(conn, scan_id, domain, start_time, priority, submitter, max_age, force)
+    )
+
+def request_scan(scan_id, domain, start_time, priority=INTERACTIVE, submitter='', max_age=None, force=False):
+    """Queue a scan of domain or share an equivalent one (see submit_request_scan)."""
+    return submit_request_scan(scan_id, domain, start_time, priority, submitter, max_age, force).result()
+
+def submit_enqueue_batch(batch_id, scans, start_time, priority=BULK, submitter='', max_age=None, force=False):
+    """Queue scans of many domains as one batch, in a single transaction.
+
+    scans is [(scan_id, domain)]; each domain is requested as by
+    submit_request_scan, so domains with a scan in flight or a fresh one
+    share it. The Future gives one {'domain', 'scan_id', 'status',
+    'coalesced'} per domain. See get_batch for the batch's progress.
+    """
+    scans = list(scans)
+    max_age = freshness_seconds() if max_age is None else max_age
+
+    def operation(conn):
+        conn.execute(
+            'INSERT INTO batches (batch_id, created_at, priority, submitter, total) VALUES (?, ?, ?, ?, ?)',
+            (batch_id, start_time.isoformat(), priority, submitter, len(scans))
+        )
+        outcomes = []
+        for scan_id, domain in scans:
+            outcome = _request_scan(conn, scan_id, domain, start_time, priority, submitter, max_age, force)
+            outcomes.append(dict(outcome, domain=domain))
+        conn.executemany(
+            'INSERT OR IGNORE INTO batch_scans (batch_id, scan_id, domain) VALUES (?, ?, ?)',
+            [(batch_id, outcome['scan_id'], outcome['domain']) for outcome in outcomes]
+        )
+        return outcomes
+
+    return _writer().submit(operation)
+
+def enqueue_batch(batch_id, scans, start_time, priority=BULK, submitter='', max_age=None, force=False):
+    """Queue scans of many domains as one batch (see submit_enqueue_batch)."""
+    return submit_enqueue_batch(batch_id, scans, start_time, priority, submitter, max_age, force).result()
+
+def get_batch(batch_id):
+    """Get a batch with the aggregate progress of its scans, or None.
+
+    'scans' counts the batch's domains by the status of their scan, and
+    'finished' counts those whose scan has finished.
+    """
+    conn = _connection()
+    row = conn.execute(
+        'SELECT batch_id, created_at, priority, submitter, total FROM batches WHERE batch_id = ?', (batch_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    counts = dict(conn.execute(
+        'SELECT s.status, COUNT(*) FROM batch_scans b JOIN scans s ON s.scan_id = b.scan_id '
+        'WHERE b.batch_id = ? GROUP BY s.status',
+        (batch_id,)
+    ).fetchall())
+    finished = sum(count for status, count in counts.items() if status in FINAL_STATUSES)
+    return {
+        'batch_id': row[0],
+        'created_at': row[1],
+        'priority': row[2],
+        'submitter': row[3],
+        'total': row[4],
+        'scans': counts,
+        'finished': finished,
+        'done': finished >= row[4]
+    }
+
+def submit_update_scan_results(scan_id, results, end_time, sources=None, status='completed'):
+    """Queue a results update; returns a Future resolved on commit.
+
+    With end_time and status None, the results are published as the partial
+    view of a scan still running and its status is left as it is.
+    """
+    # Encode on the caller's thread so the writer thread only runs SQL
+    residual, finding_rows = _split_findings(scan_id, results, sources)
+    encoded = _encode_results(residual)
+    asset_pairs = list(dict.fromkeys((kind, value) for _, kind, value, _ in finding_rows))
+
+    def operation(conn):
+        _write_findings(conn, scan_id, finding_rows, final=status is not None)
+        _write_counts(conn, scan_id, residual)
+        conn.execute(
+            'UPDATE scans SET results = ?, end_time = ?, status = IFNULL(?, status) WHERE scan_id = ?',
+            (encoded, end_time.isoformat() if end_time else None, status, scan_id)
+        )
+        if status is not None:
+            _status_changed(conn, scan_id, status)
+        _index_assets(conn, scan_id, asset_pairs)
+
+    return _writer().submit(operation)
+
+# Tool states after which a tool does no more work
+FINAL_TOOL_STATES = ('completed', 'failed', 'timed_out', 'stopped')
+
+def submit_update_tool_states(scan_id, states):
+    """Record where tools of a scan are at; states is [(tool, state, error)].
+
+    Returns a Future resolved on commit.
+    """
+    now = datetime.utcnow().isoformat()
+    rows = [
+        (scan_id, tool, state, now if state == 'running' else None,
+         now if state in FINAL_TOOL_STATES else None, error)
+        for tool, state, error in states
+    ]
+
+    def operation(conn):
+        _add_events(conn, scan_id, [
+            ('tool', {'tool': tool, 'state': state, 'error': error}) for tool, state, error in states
+        ])
+        conn.executemany(
+            'INSERT INTO scan_tools (scan_id, tool, state, started_at, finished_at, error) '
+            'VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (scan_id, tool) DO UPDATE SET state = excluded.state, '
+            'started_at = IFNULL(excluded.started_at, started_at), '
+            'finished_at = IFNULL(excluded.finished_at, finished_at), error = excluded.error',
+            rows
+        )
+
+    return _writer().submit(operation)
+
+def update_tool_states(scan_id, states):
+    """Record where tools of a scan are at (see submit_update_tool_states)."""
+    submit_update_tool_states(scan_id, states).result()
+
+def submit_scan_events(scan_id, events):
+    """Record (type, data) events of a scan, e.g. ('findings', {...}); returns a Future resolved on commit."""
+    events = list(events)
+    return _writer().submit(lambda conn: _add_events(conn, scan_id, events))
+
+def get_scan_events(scan_ids, after_id, limit=1000):
+    """Get the events of the given scans after event id after_id, oldest first.
+
+    Each event is {'id', 'scan_id', 'type', 'data'}.
+    """
+    scan_ids = list(scan_ids)
+    if not scan_ids:
+        return []
+    placeholders = ','.join('?' * len(scan_ids))
+    rows = _connection().execute(
+        f'SELECT event_id, scan_id, type, data FROM scan_events '
+        f'WHERE event_id > ? AND scan_id IN ({placeholders}) ORDER BY event_id LIMIT ?',
+        (after_id, *scan_ids, limit)
+    ).fetchall()
+    return [
+        {'id': event_id, 'scan_id': scan_id, 'type': event_type, 'data': json.loads(data)}
+        for event_id, scan_id, event_type, data in rows
+    ]
+
+def last_event_id():
+    """Get the id of the newest scan event (0 if there is none)."""
+    return _connection().execute('SELECT IFNULL(MAX(event_id), 0) FROM scan_events').fetchone()[0]
+
+def _load_tool_states(conn, scan_id):
+    return {
+        tool: {'state': state, 'started_at': started_at, 'finished_at': finished_at, 'error': error}
+        for tool, state, started_at, finished_at, error in conn.execute(
+            'SELECT tool, state, started_at, finished_at, error FROM scan_tools WHERE scan_id = ? ORDER BY tool',
+            (scan_id,)
+        )
+    }
+
+def _write_counts(conn, scan_id, residual):
+    conn.execute('DELETE FROM scan_counts WHERE scan_id = ?', (scan_id,))
+    conn.executemany(
+        'INSERT INTO scan_counts (scan_id, kind, count) VALUES (?, ?, ?)',
+        [(scan_id, kind, residual[kind]) for kind in FINDING_KINDS if isinstance(residual.get(kind), int)]
+    )
+
+def _materialize(conn, scan_id):
+    """Rewrite a delta-stored scan as a full snapshot."""
+    full = _reconstruct_findings(conn, scan_id)
+    conn.execute('DELETE FROM findings WHERE scan_id = ?', (scan_id,))
+    conn.executemany(
+        'INSERT INTO findings (scan_id, kind, value, source, op) VALUES (?, ?, ?, ?, 1)',
+        [(scan_id, kind, value, source) for kind, value, source in full]
+    )
+    conn.execute('UPDATE scans SET base_scan_id = NULL, chain_length = 0 WHERE scan_id = ?', (scan_id,))
+
+def _materialize_dependents(conn, scan_id):
+    """Turn scans stored as deltas against scan_id into full snapshots."""
+    dependents = conn.execute('SELECT scan_id FROM scans WHERE base_scan_id = ?', (scan_id,)).fetchall()
+    for (dependent,) in dependents:
+        _materialize(conn, dependent)
+
+def _write_findings(conn, scan_id, finding_rows, final=True):
+    """Store a scan's findings, as a delta against the previous scan of its domain when cheaper.
+
+    Partial results of a running scan (final False) are stored in full:
+    they are rewritten on every publish, and only completed scans serve
+    as the base of others, so none depends on them yet.
+    """
+    if final:
+        # Scans built on top of this one must not see its findings change
+        _materialize_dependents(conn, scan_id)
+    conn.execute('DELETE FROM findings WHERE scan_id = ?', (scan_id,))
+
+    current = [(kind, value, source) for _, kind, value, source in finding_rows]
+    rows = [(scan_id, kind, value, source, 1) for kind, value, source in current]
+    base_scan_id, chain_length = None, 0
+
+    # The previous completed scan, as get_scan_diff picks it
+    base = conn.execute(
+        "SELECT s.scan_id, s.chain_length FROM scans s "
+        "JOIN scans me ON me.scan_id = ? AND s.domain = me.domain "
+        "WHERE s.status = 'completed' AND (s.start_time, s.scan_id) < (me.start_time, me.scan_id) "
+        "ORDER BY s.start_time DESC, s.scan_id DESC LIMIT 1",
+        (scan_id,)
+    ).fetchone() if final else None
+    if base is not None and current and base[1] + 1 < SNAPSHOT_INTERVAL:
+        previous = _reconstruct_findings(conn, base[0])
+        current_set = set(current)
+        previous_set = set(previous)
+        delta = (
+            [(scan_id, kind, value, source, 1) for kind, value, source in current if (kind, value, source) not in previous_set] +
+            [(scan_id, kind, value, source, -1) for kind, value, source in previous if (kind, value, source) not in current_set]
+        )
+        if len(delta) < len(rows):
+            rows = delta
+            base_scan_id, chain_length = base[0], base[1] + 1
+
+    conn.executemany(
+        'INSERT OR IGNORE INTO findings (scan_id, kind, value, source, op) VALUES (?, ?, ?, ?, ?)',
+        rows
+    )
+    conn.execute(
+        'UPDATE scans SET base_scan_id = ?, chain_length = ? WHERE scan_id = ?',
+        (base_scan_id, chain_length, scan_id)
+    )
+
+def _scan_key(conn, scan_id):
+    """Return a scan's integer key, assigning one if it has none yet."""
+    row = conn.execute('SELECT scan_key FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()
+    if row is None or row[0] is not None:
+        return row[0] if row else None
+    conn.execute(
+        'UPDATE scans SET scan_key = (SELECT IFNULL(MAX(scan_key), 0) + 1 FROM scans) WHERE scan_id = ?',
+        (scan_id,)
+    )
+    return conn.execute('SELECT scan_key FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()[0]
+
+def _index_assets(conn, scan_id, pairs):
+    """Replace a scan's entries in the asset index with (kind, value) pairs."""
+    scan_key = _scan_key(conn, scan_id)
+    if scan_key is None:
+        return
+    conn.execute('DELETE FROM asset_sightings WHERE scan_key = ?', (scan_key,))
+
+    conn.executemany('INSERT OR IGNORE INTO assets (kind, value) VALUES (?, ?)', pairs)
+    conn.executemany(
+        'INSERT OR IGNORE INTO asset_sightings (asset_id, scan_key) '
+        'SELECT asset_id, ? FROM assets WHERE kind = ? AND value = ?',
+        [(scan_key, kind, value) for kind, value in pairs]
+    )
+
+def update_scan_results(scan_id, results, end_time, sources=None, status='completed'):
+    """Update scan with results and completion time.
+
+    Finding lists are written to the findings table, attributed to the tools
+    in sources ({kind: {value: [tools]}}) when given. status is the scan's
+    final status ('cancelled' for the partial results of a cancelled scan);
+    see submit_update_scan_results for publishing partial results.
+    """
+    submit_update_scan_results(scan_id, results, end_time, sources, status).result()
 
 def get_all_scans():
     """Get all stored scans from the database."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT scan_id, domain, start_time, end_time, results, status FROM scans')
-    rows = cursor.fetchall()
-    
+    conn = _connection()
+    rows = conn.execute(
+        'SELECT scan_id, domain, start_time, end_time, results, status FROM scans'
+    ).fetchall()
+
     scans = []
     for row in rows:
-        scan_id, domain, start_time, end_time, results_json, status = row
-        
+        scan_id, domain, start_time, end_time, stored_results, status = row
+
         scan = {
             'scan_id': scan_id,
             'domain': domain,
             'start_time': start_time,
             'end_time': end_time,
             'status': status,
-            'results': json.loads(results_json) if results_json else None
+            'results': _decode_results(stored_results, _load_findings(conn, scan_id))
         }
         scans.append(scan)
-    
-    conn.close()
+
     return scans
 
+def _encode_cursor(start_time, scan_id):
+    raw = json.dumps([start_time, scan_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        start_time, scan_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(start_time), str(scan_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def list_scans(limit=50, cursor=None, domain=None, status=None):
+    """Get one page of scan summaries, newest first.
+
+    Returns (scans, next_cursor). Each scan carries per-kind finding counts
+    instead of results; next_cursor is None on the last page.
+    """
+    clauses = []
+    params = []
+    if domain:
+        clauses.append('domain = ?')
+        params.append(domain)
+    if status:
+        clauses.append('status = ?')
+        params.append(status)
+    if cursor:
+        clauses.append('(start_time, scan_id) < (?, ?)')
+        params.extend(_decode_cursor(cursor))
+
+    where = f"WHERE {' AND '.join(clauses)} " if clauses else ''
+    conn = _connection()
+    rows = conn.execute(
+        'SELECT scan_id, domain, start_time, end_time, status FROM scans '
+        f'{where}ORDER BY start_time DESC, scan_id DESC LIMIT ?',
+        (*params, limit + 1)
+    ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][2], rows[-1][0])
+
+    counts = {row[0]: {kind: 0 for kind in FINDING_KINDS} for row in rows}
+    if counts:
+        placeholders = ','.join('?' * len(counts))
+        for scan_id, kind, count in conn.execute(
+            f'SELECT scan_id, kind, count FROM scan_counts WHERE scan_id IN ({placeholders})',
+            list(counts)
+        ):
+            counts[scan_id][kind] = count
+
+    scans = [
+        {
+            'scan_id': scan_id,
+            'domain': domain,
+            'start_time': start_time,
+            'end_time': end_time,
+            'status': status,
+            'counts': counts[scan_id]
+        }
+        for scan_id, domain, start_time, end_time, status in rows
+    ]
+    return scans, next_cursor
+
 def get_scan_by_id(scan_id):
     """Get a specific scan by ID."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute(
+    conn = _connection()
+    row = conn.execute(
         'SELECT scan_id, domain, start_time, end_time, results, status FROM scans WHERE scan_id = ?',
         (scan_id,)
-    )
-    row = cursor.fetchone()
-    
+    ).fetchone()
+
     if row:
-        scan_id, domain, start_time, end_time, results_json, status = row
-        
+        scan_id, domain, start_time, end_time, stored_results, status = row
+
         scan = {
             'scan_id': scan_id,
             'domain': domain,
             'start_time': start_time,
             'end_time': end_time,
             'status': status,
-            'results': json.loads(results_json) if results_json else None
+            'results': _decode_results(stored_results, _load_findings(conn, scan_id)),
+            'tools': _load_tool_states(conn, scan_id)
         }
-        conn.close()
         return scan
-    
-    conn.close()
+
     return None
+
+def get_findings(scan_id, kind):
+    """Get the values of one finding kind for a scan (index lookup per delta)."""
+    findings = _reconstruct_findings(_connection(), scan_id, kind)
+    return list(dict.fromkeys(value for _, value, _ in findings))
+
+def get_finding_sources(scan_id, kind):
+    """Get {value: [tools]} for one finding kind of a scan."""
+    sources = {}
+    for _, value, source in _reconstruct_findings(_connection(), scan_id, kind):
+        tools = sources.setdefault(value, [])
+        if source:
+            tools.append(source)
+    return sources
+
+def migrate_inline_findings(batch_size=500):
+    """Move finding lists still embedded in plain JSON results rows into the findings table.
+
+    Works through the table in rowid order, one writer transaction per
+    batch, so it can run in the background next to live traffic. Run it
+    before recompress_legacy_results, which leaves such rows to it; until
+    then their lists are read from the JSON. Returns the number of rows
+    migrated.
+    """
+    conn = _connection()
+    last_rowid = 0
+    migrated = 0
+
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, scan_id, results FROM scans "
+            "WHERE rowid > ? AND typeof(results) = 'text' ORDER BY rowid LIMIT ?",
+            (last_rowid, batch_size)
+        ).fetchall()
+        if not rows:
+            return migrated
+        last_rowid = rows[-1][0]
+
+        batch = []
+        for rowid, scan_id, results_json in rows:
+            results = _inline_findings(results_json)
+            if results is not None:
+                residual, finding_rows = _split_findings(scan_id, results)
+                batch.append((rowid, scan_id, results_json, residual, finding_rows))
+
+        def operation(conn):
+            count = 0
+            for rowid, scan_id, results_json, residual, finding_rows in batch:
+                # Only migrate rows nobody rewrote since we read them
+                cursor = conn.execute(
+                    'UPDATE scans SET results = ? WHERE rowid = ? AND results = ?',
+                    (_encode_results(residual), rowid, results_json)
+                )
+                if not cursor.rowcount:
+                    continue
+                conn.executemany(
+                    'INSERT OR IGNORE INTO findings (scan_id, kind, value, source) VALUES (?, ?, ?, ?)',
+                    finding_rows
+                )
+                _write_counts(conn, scan_id, residual)
+                pairs = list(dict.fromkeys((kind, value) for _, kind, value, _ in finding_rows))
+                _index_assets(conn, scan_id, pairs)
+                count += 1
+            return count
+
+        if batch:
+            migrated += _writer().submit(operation).result()
+
+def _inline_findings(results_json):
+    """Return the results dict of a plain JSON row if it still embeds finding lists, else None."""
+    try:
+        results = json.loads(results_json)
+    except (ValueError, TypeError):
+        return None
+    if isinstance(results, dict) and any(isinstance(results.get(kind), list) for kind in FINDING_KINDS):
+        return results
+    return None
+
+def recompress_legacy_results(batch_size=500):
+    """Re-encode plain JSON results rows into the compressed format.
+
+    Works through the table in rowid order, one batch per writer transaction
+    (the group-commit writer, like every other write), so it can run in the
+    background next to live traffic. Returns the number of rows re-encoded.
+    """
+    conn = _connection()
+    last_rowid = 0
+    migrated = 0
+
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, results FROM scans "
+            "WHERE rowid > ? AND typeof(results) = 'text' ORDER BY rowid LIMIT ?",
+            (last_rowid, batch_size)
+        ).fetchall()
+        if not rows:
+            return migrated
+
+        updates = []
+        for rowid, results_json in rows:
+            if _inline_findings(results_json) is not None:
+                # Left for migrate_inline_findings
+                continue
+            try:
+                updates.append((_encode_results(json.loads(results_json)), rowid, results_json))
+            except ValueError:
+                continue
+        last_rowid = rows[-1][0]
+        if not updates:
+            continue
+
+        def operation(conn):
+            # Only replace rows nobody rewrote since we read them
+            return conn.executemany(
+                'UPDATE scans SET results = ? WHERE rowid = ? AND results = ?',
+                updates
+            ).rowcount
+
+        migrated += _writer().submit(operation).result()
+
+def find_asset_sightings(kind, value):
+    """Get every scan and domain in which an asset value was seen.
+
+    Returns {'kind', 'value', 'domains', 'scans'}, newest sighting first.
+    Answered from the asset index, independent of how many scans exist.
+    value is normalized the way findings are (see merge.normalize), so any
+    spelling of it matches.
+    """
+    value = normalize(kind, value)
+    rows = _connection().execute(
+        'SELECT sc.scan_id, sc.domain, COALESCE(sc.end_time, sc.start_time) AS seen_at FROM assets a '
+        'JOIN asset_sightings s ON s.asset_id = a.asset_id '
+        'JOIN scans sc ON sc.scan_key = s.scan_key '
+        'WHERE a.kind = ? AND a.value = ? ORDER BY seen_at DESC',
+        (kind, value)
+    ).fetchall()
+
+    return {
+        'kind': kind,
+        'value': value,
+        'domains': list(dict.fromkeys(domain for _, domain, _ in rows)),
+        'scans': [
+            {'scan_id': scan_id, 'domain': domain, 'seen_at': seen_at}
+            for scan_id, domain, seen_at in rows
+        ]
+    }
+
+def find_related_domains(domain):
+    """Get other domains that share assets with a domain.
+
+    Returns a list of {'domain', 'shared': {kind: count}} ordered by the total
+    number of shared assets.
+    """
+    rows = _connection().execute(
+        'SELECT other_scan.domain, a.kind, COUNT(DISTINCT a.asset_id) '
+        'FROM (SELECT DISTINCT s.asset_id FROM scans sc '
+        '      JOIN asset_sightings s ON s.scan_key = sc.scan_key WHERE sc.domain = ?) mine '
+        'JOIN asset_sightings other ON other.asset_id = mine.asset_id '
+        'JOIN scans other_scan ON other_scan.scan_key = other.scan_key AND other_scan.domain != ? '
+        'JOIN assets a ON a.asset_id = mine.asset_id '
+        'GROUP BY other_scan.domain, a.kind',
+        (domain, domain)
+    )
+
+    related = {}
+    for other_domain, kind, count in rows:
+        related.setdefault(other_domain, {})[kind] = count
+
+    return sorted(
+        ({'domain': other_domain, 'shared': shared} for other_domain, shared in related.items()),
+        key=lambda entry: (-sum(entry['shared'].values()), entry['domain'])
+    )
+
+def get_scan_diff(scan_id):
+    """Compare a scan with the previous completed scan of the same domain.
+
+    Returns {'scan_id', 'domain', 'previous_scan_id', 'added', 'removed'},
+    where added/removed map each finding kind to its values, or None if the
+    scan does not exist. With no earlier scan, everything counts as added.
+    """
+    conn = _connection()
+    row = conn.execute(
+        'SELECT domain, start_time FROM scans WHERE scan_id = ?', (scan_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    domain, start_time = row
+
+    previous = conn.execute(
+        "SELECT scan_id FROM scans WHERE domain = ? AND status = 'completed' "
+        "AND (start_time, scan_id) < (?, ?) ORDER BY start_time DESC, scan_id DESC LIMIT 1",
+        (domain, start_time, scan_id)
+    ).fetchone()
+    previous_scan_id = previous[0] if previous else None
+
+    current = _load_findings(conn, scan_id)
+    before = _load_findings(conn, previous_scan_id) if previous_scan_id else {}
+
+    added = {}
+    removed = {}
+    for kind in FINDING_KINDS:
+        now_values = current.get(kind, [])
+        old_values = before.get(kind, [])
+        old_set, now_set = set(old_values), set(now_values)
+        added[kind] = [value for value in now_values if value not in old_set]
+        removed[kind] = [value for value in old_values if value not in now_set]
+
+    return {
+        'scan_id': scan_id,
+        'domain': domain,
+        'previous_scan_id': previous_scan_id,
+        'added': added,
+        'removed': removed
+    }
+
+def count_findings(scan_id):
+    """Get {kind: distinct value count} for a scan without decoding any results."""
+    counts = {kind: 0 for kind in FINDING_KINDS}
+    rows = _connection().execute(
+        'SELECT kind, count FROM scan_counts WHERE scan_id = ?',
+        (scan_id,)
+    )
+    for kind, count in rows:
+        counts[kind] = count
+    return counts
+
+def find_expired_scans(status, cutoff, limit=500):
+    """Get up to limit ids of scans with a status that started before cutoff, oldest first."""
+    rows = _connection().execute(
+        'SELECT scan_id FROM scans WHERE status = ? AND start_time < ? '
+        'ORDER BY start_time, scan_id LIMIT ?',
+        (status, cutoff.isoformat(), limit)
+    ).fetchall()
+    return [scan_id for (scan_id,) in rows]
+
+def export_scans(scan_ids):
+    """Get scans in a flat, self-contained form for archiving.
+
+    Returns (scans, findings): one dict per scan with its stored residual
+    results as JSON and its per-kind counts, and one dict per
+    (scan_id, domain, kind, value, source) finding with deltas replayed.
+    """
+    conn = _connection()
+    scans = []
+    findings = []
+    for scan_id in scan_ids:
+        row = conn.execute(
+            'SELECT domain, start_time, end_time, status, results FROM scans WHERE scan_id = ?',
+            (scan_id,)
+        ).fetchone()
+        if row is None:
+            continue
+        domain, start_time, end_time, status, stored = row
+
+        record = {
+            'scan_id': scan_id,
+            'domain': domain,
+            'start_time': start_time,
+            'end_time': end_time,
+            'status': status,
+            'results': json.dumps(_load_results(stored)) if stored else None
+        }
+        record.update(count_findings(scan_id))
+        scans.append(record)
+
+        findings.extend(
+            {'scan_id': scan_id, 'domain': domain, 'kind': kind, 'value': value, 'source': source}
+            for kind, value, source in _reconstruct_findings(conn, scan_id)
+        )
+    return scans, findings
+
+def submit_delete_scans(scan_ids):
+    """Queue the removal of scans; returns a Future resolved on commit."""
+    scan_ids = list(scan_ids)
+    doomed = set(scan_ids)
+
+    def operation(conn):
+        # Later scans stored as deltas on top of a deleted one become snapshots
+        for scan_id in scan_ids:
+            dependents = conn.execute('SELECT scan_id FROM scans WHERE base_scan_id = ?', (scan_id,)).fetchall()
+            for (dependent,) in dependents:
+                if dependent not in doomed:
+                    _materialize(conn, dependent)
+
+        orphans = set()
+        for scan_id in scan_ids:
+            scan_key = _scan_key(conn, scan_id)
+            if scan_key is not None:
+                orphans.update(
+                    asset_id for (asset_id,) in conn.execute(
+                        'SELECT asset_id FROM asset_sightings WHERE scan_key = ?', (scan_key,)
+                    )
+                )
+                conn.execute('DELETE FROM asset_sightings WHERE scan_key = ?', (scan_key,))
+            conn.execute('DELETE FROM findings WHERE scan_id = ?', (scan_id,))
+            conn.execute('DELETE FROM scan_counts WHERE scan_id = ?', (scan_id,))
+            conn.execute('DELETE FROM jobs WHERE scan_id = ?', (scan_id,))
+            conn.execute('DELETE FROM scan_tools WHERE scan_id = ?', (scan_id,))
+            conn.execute('DELETE FROM scan_events WHERE scan_id = ?', (scan_id,))
+            conn.execute('DELETE FROM batch_scans WHERE scan_id = ?', (scan_id,))
+            conn.execute('DELETE FROM scans WHERE scan_id = ?', (scan_id,))
+
+        conn.executemany(
+            'DELETE FROM assets WHERE asset_id = ? '
+            'AND NOT EXISTS (SELECT 1 FROM asset_sightings WHERE asset_id = ?)',
+            [(asset_id, asset_id) for asset_id in orphans]
+        )
+
+    return _writer().submit(operation)
+
+def delete_scans(scan_ids):
+    """Remove scans with their findings, counts and asset index entries."""
+    submit_delete_scans(scan_ids).result()
+
+def compact_database(max_pages=None):
+    """Return free pages to the OS with an incremental vacuum.
+
+    Frees at most max_pages pages (all of them by default) and returns the
+    number the incremental vacuum freed. A database created before
+    incremental vacuum was enabled is converted first with a one-off full
+    VACUUM, which already hands back every free page and is not counted.
+    Both run on the writer, so they do not race the batched writes.
+    """
+    conn = _connection()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        _writer().submit(_enable_incremental_vacuum, transaction=False).result()
+    pages_before = conn.execute('PRAGMA page_count').fetchone()[0]
+
+    free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    pages = free if max_pages is None else min(max_pages, free)
+
+    def operation(conn):
+        # The pragma frees one page per step, and sqlite3 steps a statement
+        # without result columns only once
+        for _ in range(int(pages)):
+            conn.execute('PRAGMA incremental_vacuum(1)')
+
+    if pages:
+        _writer().submit(operation).result()
+    return pages_before - conn.execute('PRAGMA page_count').fetchone()[0]
+
+# Initialize the database
+init_db()
@@ -8,6 +8,10 @@ import shutil
 # Add the parent directory to sys.path so tests can import from the main package
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# theHarvester and Amass are not installed where tests run; tests of the
+# real runners point them at fake tool scripts instead
+os.environ.setdefault("SIMULATE_TOOLS", "1")
+
 @pytest.fixture
 def temp_db():
     """Fixture that provides a temporary SQLite database for testing."""
@@ -41,4 +45,6 @@ def temp_db():
     yield db_path
     
     # Cleanup after the test
+    import db
+    db.close_all()
     shutil.rmtree(temp_dir) 
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""A tiny authoritative DNS server on 127.0.0.1 for tests and benchmarks.
+
+The zone maps a lowercase name (no trailing dot) to its records:
+
+    {"www.example.com": {"A": ["192.0.2.1"], "AAAA": ["2001:db8::1"]},
+     "alias.example.com": {"CNAME": "www.example.com"}}
+
+A and AAAA queries for an alias follow its CNAME inside the zone, the way a
+recursive resolver would answer. Names outside the zone get NXDOMAIN. With
+a delay, every query is answered from its own thread after sleeping, so
+concurrent clients overlap; max_in_flight records the peak overlap.
+"""
+import collections
+import socket
+import threading
+import time
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
+
+TTL = 300
+
+
+class StubDNSServer:
+    def __init__(self, zone, delay=0.0, wildcard=None):
+        self.zone = {name.lower().rstrip('.'): records for name, records in zone.items()}
+        self.delay = delay
+        # (zone name, records): every name under zone name that is not in
+        # the zone resolves to records, like a wildcard entry
+        self.wildcard = wildcard
+        self.queries = collections.Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.settimeout(0.1)
+        self.address, self.port = self._sock.getsockname()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._running = False
+
+    def start(self):
+        self._running = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._thread.join(timeout=2)
+        self._sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _serve(self):
+        while self._running:
+            try:
+                wire, client = self._sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if self.delay:
+                threading.Thread(target=self._answer, args=(wire, client), daemon=True).start()
+            else:
+                self._answer(wire, client)
+
+    def _records(self, name):
+        records = self.zone.get(name)
+        if records is None and self.wildcard is not None:
+            zone_name, wildcard_records = self.wildcard
+            if name.endswith('.' + zone_name):
+                return wildcard_records
+        return records
+
+    def _answer(self, wire, client):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            # Most brute-force names do not exist; answer those cheaply
+            response = self._fast_nxdomain(wire) or self._build_answer(wire)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        try:
+            self._sock.sendto(response, client)
+        except OSError:
+            pass
+
+    def _build_answer(self, wire):
+        query = dns.message.from_wire(wire)
+        response = dns.message.make_response(query)
+        response.flags |= dns.flags.AA
+        question = query.question[0]
+        name = question.name.to_text(omit_final_dot=True).lower()
+        rdtype = dns.rdatatype.to_text(question.rdtype)
+        with self._lock:
+            self.queries[(name, rdtype)] += 1
+
+        records = self._records(name)
+        owner = name
+        while True:
+            if records is None:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+                break
+            if rdtype != 'CNAME' and 'CNAME' in records:
+                # Answer with the alias, then whatever its target holds
+                target = records['CNAME']
+                response.answer.append(dns.rrset.from_text(
+                    owner + '.', TTL, dns.rdataclass.IN, 'CNAME', target + '.'))
+                owner = target
+                records = self._records(target)
+                continue
+            values = records.get(rdtype)
+            if values:
+                values = [values] if isinstance(values, str) else values
+                if rdtype == 'CNAME':
+                    values = [value + '.' for value in values]
+                response.answer.append(dns.rrset.from_text_list(
+                    owner + '.', TTL, dns.rdataclass.IN, rdtype, values))
+            break
+        return response.to_wire()
+
+    def _fast_nxdomain(self, wire):
+        """Build an NXDOMAIN reply by hand, without a full parse, for names not in the zone.
+
+        Returns None when the name exists and needs a real answer.
+        """
+        labels = []
+        position = 12
+        while position < len(wire) and wire[position]:
+            length = wire[position]
+            labels.append(wire[position + 1:position + 1 + length])
+            position += 1 + length
+        name = b'.'.join(labels).decode('ascii', 'replace').lower()
+        if self._records(name) is not None:
+            return None
+        question_end = position + 5
+        with self._lock:
+            qtype = int.from_bytes(wire[position + 1:position + 3], 'big')
+            self.queries[(name, dns.rdatatype.to_text(qtype))] += 1
+        # QR + AA, copy opcode and RD, rcode 3; one question, nothing else
+        flags = 0x8400 | (int.from_bytes(wire[2:4], 'big') & 0x7900) | dns.rcode.NXDOMAIN
+        return wire[:2] + flags.to_bytes(2, 'big') + b'\x00\x01' + b'\x00' * 6 + wire[12:question_end]
@@ -0,0 +1,32 @@
+"""Stand-in for an external tool: prints a recorded output file to stdout.
+
+    python fake_tool.py OUTPUT [--delay S] [--repeat N] [--exit-code C] [--stderr MSG] [tool args...]
+
+Any further arguments (the real tool's command line) are ignored.
+"""
+import argparse
+import sys
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument('output')
+parser.add_argument('--delay', type=float, default=0.0, help='seconds to sleep after each line')
+parser.add_argument('--repeat', type=int, default=1, help='print the file this many times')
+parser.add_argument('--exit-code', type=int, default=0)
+parser.add_argument('--stderr', default='')
+args, _ = parser.parse_known_args()
+
+with open(args.output) as f:
+    lines = f.readlines()
+
+for _ in range(args.repeat):
+    for line in lines:
+        sys.stdout.write(line)
+        if args.delay:
+            sys.stdout.flush()
+            time.sleep(args.delay)
+sys.stdout.flush()
+
+if args.stderr:
+    sys.stderr.write(args.stderr + '\n')
+sys.exit(args.exit_code)
@@ -0,0 +1,43 @@
+"""A local website for crawler tests and benchmarks, served by aiohttp.
+
+pages maps a path to (status, content type, body); other paths get a 404.
+delay adds latency to every response, and requests counts them per path.
+"""
+import asyncio
+import collections
+
+from aiohttp import web
+
+
+class StubSite:
+    def __init__(self, pages, delay=0.0):
+        self.pages = pages
+        self.delay = delay
+        self.requests = collections.Counter()
+        self.connections = set()
+        self._runner = None
+        self.base_url = None
+
+    async def _handle(self, request):
+        self.requests[request.path] += 1
+        self.connections.add(request.transport.get_extra_info('peername'))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if request.path not in self.pages:
+            raise web.HTTPNotFound()
+        status, content_type, body = self.pages[request.path]
+        return web.Response(status=status, body=body, content_type=content_type)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route('GET', '/{tail:.*}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/"
+        return self
+
+    async def stop(self):
+        await self._runner.cleanup()
@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from main import app
@@ -32,4 +33,117 @@ def test_get_all_scans():
     """Test retrieving all scans"""
     response = client.get("/scans")
     assert response.status_code == 200
-    assert isinstance(response.json(), list) 
\ No newline at end of file
+    assert isinstance(response.json(), list) 
+
+def test_get_scans_pagination():
+    """Test that listing honours limit and returns a next-page cursor"""
+    for _ in range(2):
+        client.post("/scan", json={"domain": "example.com", "force": True})
+    response = client.get("/scans", params={"limit": 1})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert "counts" in response.json()[0]
+    assert "X-Next-Cursor" in response.headers
+
+def test_get_scans_invalid_cursor():
+    """Test that a malformed cursor is rejected"""
+    response = client.get("/scans", params={"cursor": "garbage"})
+    assert response.status_code == 400
+
+
+def test_asset_lookup():
+    """Test the asset correlation endpoints"""
+    response = client.get("/assets/ips/192.0.2.1")
+    assert response.status_code == 200
+    assert response.json()["value"] == "192.0.2.1"
+    assert isinstance(response.json()["scans"], list)
+    
+    assert client.get("/assets/unknown/x").status_code == 400
+    assert client.get("/domains/example.com/related").status_code == 200
+
+
+def test_scan_diff_not_found():
+    """Test that diffing an unknown scan returns 404"""
+    response = client.get("/scans/does-not-exist/diff")
+    assert response.status_code == 404
+
+
+def test_scan_priority_and_scheduler_stats():
+    """Test scan priorities and the scheduler stats endpoint"""
+    response = client.post(
+        "/scan", json={"domain": "example.com", "priority": "bulk", "submitter": "nightly-sweep", "force": True}
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+    assert client.post("/scan", json={"domain": "example.com", "priority": "urgent"}).status_code == 422
+
+    stats = client.get("/scheduler").json()
+    assert stats["scans"]["queued"]["bulk"] >= 1
+    assert stats["tools"]["Amass"]["limit"] == 2
+
+def test_scan_requests_are_coalesced():
+    """Test that a request for a domain already queued returns that scan"""
+    first = client.post("/scan", json={"domain": "coalesce.example.com", "force": True}).json()
+    second = client.post("/scan", json={"domain": "coalesce.example.com"}).json()
+    assert second["scan_id"] == first["scan_id"]
+    assert second["coalesced"] == "in_flight"
+    assert client.post("/scan", json={"domain": "example.com", "max_age": -1}).status_code == 422
+
+def test_cancel_scan():
+    """Test cancelling a queued scan"""
+    scan_id = client.post("/scan", json={"domain": "cancel.example.com", "force": True}).json()["scan_id"]
+    response = client.delete(f"/scans/{scan_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+    assert client.get(f"/scans/{scan_id}").json()["status"] == "cancelled"
+    assert client.delete("/scans/no-such-scan").status_code == 404
+
+def test_scan_events_of_a_finished_scan():
+    """Test that the event stream of a finished scan is just its snapshot"""
+    scan_id = client.post("/scan", json={"domain": "events.example.com", "force": True}).json()["scan_id"]
+    client.delete(f"/scans/{scan_id}")
+    response = client.get(f"/scans/{scan_id}/events")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.count("event: ") == 1
+    assert "event: snapshot" in response.text
+    assert '"status": "cancelled"' in response.text
+    assert client.get("/scans/no-such-scan/events").status_code == 404
+
+def test_submit_batch():
+    """Test bulk submission as JSON and as an uploaded file"""
+    response = client.post("/batches", json={
+        "domains": ["batch-a.example.com", "BATCH-A.example.com", "batch b"], "force": True
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    summary = lines[0]
+    assert summary["accepted"] == 1
+    assert summary["duplicates"] == 1
+    assert summary["invalid"] == 1
+    assert lines[1]["domain"] == "batch-a.example.com"
+    assert lines[2] == {"line": 3, "value": "batch b", "error": "Invalid domain"}
+    
+    batch = client.get(f"/batches/{summary['batch_id']}").json()
+    assert batch["total"] == 1
+    assert batch["priority"] == "bulk"
+    
+    response = client.post("/batches/upload?force=true", content="batch-c.example.com\nbatch-d.example.com\n",
+                           headers={"Content-Type": "text/plain"})
+    assert response.status_code == 200
+    assert json.loads(response.text.splitlines()[0])["accepted"] == 2
+    
+    assert client.post("/batches", json={"domains": ["not valid"]}).status_code == 422
+    assert client.post("/batches/upload?priority=urgent", content="example.com").status_code == 422
+    assert client.get("/batches/no-such-batch").status_code == 404
+
+def test_oversized_uploads_are_rejected(monkeypatch):
+    """Test the upload limit, with and without a Content-Length"""
+    monkeypatch.setattr("main.MAX_UPLOAD_BYTES", 64)
+    line = b"too-many.example.com\n"
+    assert client.post("/batches/upload", content=line * 10).status_code == 413
+    # Chunked: the limit is enforced while reading
+    assert client.post("/batches/upload", content=iter([line] * 10)).status_code == 413
+    response = client.post("/batches/upload?force=true", content=iter([line]))
+    assert response.status_code == 200
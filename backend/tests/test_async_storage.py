@@ -0,0 +1,73 @@
+import pytest
+import asyncio
+import gc
+import time
+from datetime import datetime
+
+import async_storage
+
+async def measure_loop_lag(stop, interval=0.005):
+    """Sleep in small steps and record how late the loop wakes us up."""
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+    return lags
+
+def make_results(n):
+    return {
+        "subdomains": [f"host{i}.example.com" for i in range(n)],
+        "emails": [f"user{i}@example.com" for i in range(n // 10)],
+        "ips": [f"10.0.{i // 256}.{i % 256}" for i in range(n // 10)],
+        "social_profiles": [],
+        "errors": []
+    }
+
+@pytest.mark.asyncio
+async def test_async_storage_roundtrip(temp_db):
+    """Test that the async API reads back what it wrote"""
+    await async_storage.store_scan("async-scan-1", "example.com", datetime.now())
+    await async_storage.update_scan_results("async-scan-1", make_results(10), datetime.now())
+
+    scan = await async_storage.get_scan_by_id("async-scan-1")
+    assert scan["status"] == "completed"
+    assert len(scan["results"]["subdomains"]) == 10
+
+    scans, _ = await async_storage.list_scans()
+    assert scans[0]["counts"]["subdomains"] == 10
+
+@pytest.mark.asyncio
+async def test_event_loop_stays_responsive_under_db_load(temp_db):
+    """Concurrent reads and writes must not stall the event loop"""
+    scan_ids = [f"lag-scan-{i}" for i in range(20)]
+    for scan_id in scan_ids:
+        await async_storage.store_scan(scan_id, "example.com", datetime.now())
+
+    async def writer(scan_id):
+        await async_storage.update_scan_results(scan_id, make_results(2000), datetime.now())
+
+    async def reader(scan_id):
+        for _ in range(5):
+            await async_storage.get_scan_by_id(scan_id)
+            await async_storage.list_scans(limit=20)
+
+    # A full garbage collection of the test process's heap also stalls the
+    # loop, for reasons that have nothing to do with the database
+    gc.disable()
+    try:
+        stop = asyncio.Event()
+        monitor = asyncio.create_task(measure_loop_lag(stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(s) for s in scan_ids), *(reader(s) for s in scan_ids))
+        db_time = time.perf_counter() - started
+        stop.set()
+        lags = await monitor
+    finally:
+        gc.enable()
+
+    # The loop kept ticking while the database work ran; a blocking call
+    # would have stalled it for a large share of db_time
+    assert lags
+    assert max(lags) < min(0.1, db_time / 2)
+
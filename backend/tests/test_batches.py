@@ -0,0 +1,26 @@
+from batches import normalize_domain, parse_domains
+
+def test_normalize_domain():
+    """Test that domains are lowercased and URLs reduced to their host"""
+    assert normalize_domain(" Example.COM. ") == "example.com"
+    assert normalize_domain("https://www.example.com:8443/about?x=1") == "www.example.com"
+    assert normalize_domain("localhost") is None
+    assert normalize_domain("-bad.example.com") is None
+    assert normalize_domain("example.com; rm -rf /") is None
+    assert normalize_domain("a" * 64 + ".com") is None
+
+def test_parse_domains_validates_and_deduplicates():
+    """Test one-pass parsing of an uploaded domain list"""
+    lines = [
+        "# domains to scan",
+        "example.com",
+        "",
+        "EXAMPLE.com,some note",
+        "https://example.org/",
+        "not a domain",
+        "example.org",
+    ]
+    domains, duplicates, invalid = parse_domains(lines)
+    assert domains == ["example.com", "example.org"]
+    assert duplicates == 2
+    assert invalid == [{"line": 6, "value": "not a domain"}]
@@ -0,0 +1,98 @@
+import pytest
+
+from dns_stub import StubDNSServer
+from dns_cache import DNSCache
+from bruteforce import BruteForcer, iter_wordlist
+from workers import WordlistBruteForceStrategy
+
+ZONE = {
+    "www.example.com": {"A": ["192.0.2.10"]},
+    "vpn.example.com": {"A": ["192.0.2.20", "192.0.2.21"]},
+    "cdn.example.com": {"CNAME": "www.example.com"},
+    "txt.example.com": {"TXT": ["only text here"]},
+}
+
+def write_wordlist(tmp_path, words):
+    path = tmp_path / "words.txt"
+    path.write_text("\n".join(words))
+    return str(path)
+
+def make_engine(server, **kwargs):
+    kwargs.setdefault("cache", DNSCache())
+    return BruteForcer([server.address], port=server.port, timeout=0.5, **kwargs)
+
+def test_iter_wordlist_skips_junk(tmp_path):
+    """Test that only valid labels come out, lowercased, with byte offsets"""
+    path = write_wordlist(tmp_path, ["www", "", "# comment", "  Mail ", "bad label", "-dash", "a.b", "x" * 64, "last"])
+
+    words = list(iter_wordlist(path))
+
+    assert [word for word, _ in words] == ["www", "mail", "a.b", "last"]
+    offsets = [offset for _, offset in words]
+    assert offsets == sorted(offsets)
+    assert offsets[-1] == len(open(path, "rb").read())
+
+def test_iter_wordlist_empty_file(tmp_path):
+    """Test that an empty wordlist yields nothing"""
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    assert list(iter_wordlist(str(path))) == []
+
+@pytest.mark.asyncio
+async def test_bruteforce_finds_existing_names(tmp_path):
+    """Test discovery of A, CNAME and no-A names, with progress reported"""
+    words = ["www", "vpn", "cdn", "txt"] + [f"miss{i}" for i in range(200)]
+    progress = []
+    with StubDNSServer(ZONE) as server:
+        result = await make_engine(server, progress_callback=progress.append).run(
+            "example.com", write_wordlist(tmp_path, words)
+        )
+
+    assert result["wildcard"] is False
+    assert result["tried"] == len(words)
+    assert result["failed"] == 0
+    assert sorted(result["subdomains"]["vpn.example.com"]) == ["192.0.2.20", "192.0.2.21"]
+    assert result["subdomains"]["cdn.example.com"] == ["192.0.2.10"]
+    assert result["subdomains"]["txt.example.com"] == []
+    assert set(result["subdomains"]) == {"www.example.com", "vpn.example.com", "cdn.example.com", "txt.example.com"}
+    assert progress[-1]["fraction"] == 1.0
+    assert progress[-1]["tried"] == len(words)
+
+@pytest.mark.asyncio
+async def test_bruteforce_discards_wildcard_answers(tmp_path):
+    """Test that names only answered by a wildcard record are not reported"""
+    wildcard = ("example.com", {"A": ["192.0.2.99"]})
+    with StubDNSServer(ZONE, wildcard=wildcard) as server:
+        result = await make_engine(server).run(
+            "example.com", write_wordlist(tmp_path, ["www", "vpn", "anything", "random"])
+        )
+
+    assert result["wildcard"] is True
+    assert set(result["subdomains"]) == {"www.example.com", "vpn.example.com"}
+
+@pytest.mark.asyncio
+async def test_bruteforce_retries_on_next_resolver(tmp_path):
+    """Test that queries to a dead resolver time out and move to a live one"""
+    with StubDNSServer(ZONE) as server:
+        # Nothing listens on 127.0.0.2 (the stub is bound to 127.0.0.1 only)
+        engine = BruteForcer(["127.0.0.2", server.address], port=server.port,
+                             timeout=0.2, retries=2, cache=DNSCache())
+        result = await engine.run("example.com", write_wordlist(tmp_path, ["www", "vpn", "nope"]))
+
+    assert result["failed"] == 0
+    assert set(result["subdomains"]) == {"www.example.com", "vpn.example.com"}
+    assert engine.timeouts > 0
+
+@pytest.mark.asyncio
+async def test_wordlist_strategy(tmp_path):
+    """Test the brute-force ToolStrategy returns subdomains and IPs"""
+    with StubDNSServer(ZONE) as server:
+        strategy = WordlistBruteForceStrategy(
+            "test-scan-1", "example.com",
+            wordlist=write_wordlist(tmp_path, ["www", "vpn", "nope"]),
+            nameservers=[server.address], port=server.port
+        )
+        result = await strategy.execute()
+
+    assert sorted(result["subdomains"]) == ["vpn.example.com", "www.example.com"]
+    assert sorted(result["ips"]) == ["192.0.2.10", "192.0.2.20", "192.0.2.21"]
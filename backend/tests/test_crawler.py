@@ -0,0 +1,75 @@
+import pytest
+import pytest_asyncio
+
+from crawler import Crawler, LinkExtractor
+from site_stub import StubSite
+
+HOME = b"""<html><head><title>Example</title></head><body>
+<a href="/about">About</a> <A class="x" HREF='https://twitter.com/example'>Twitter</A>
+<a href=https://www.linkedin.com/company/example>LinkedIn</a>
+<a href="#top">Top</a> <a href="mailto:info@example.com">Mail</a>
+<a href="https://facebook.com/example?a=1&amp;b=2#posts">Facebook</a>
+</body></html>"""
+
+ABOUT = b'<p>About us</p><a href="https://twitter.com/example">Us on Twitter</a><a href="team">Team</a>'
+
+@pytest_asyncio.fixture
+async def site():
+    stub = await StubSite({
+        "/": (200, "text/html", HOME),
+        "/about": (200, "text/html", ABOUT),
+        "/big": (200, "text/html", b'<a href="/first">1</a>' + b"x" * 500000 + b'<a href="/last">2</a>'),
+        "/logo.png": (200, "image/png", b'<a href="/not-html">'),
+    }).start()
+    yield stub
+    await stub.stop()
+
+def test_link_extractor_handles_chunks_split_anywhere():
+    """Test that links come out the same however the page is chunked"""
+    expected = LinkExtractor("https://example.com/").feed(HOME)
+    assert expected == [
+        "https://example.com/about",
+        "https://twitter.com/example",
+        "https://www.linkedin.com/company/example",
+        "https://facebook.com/example?a=1&b=2",
+    ]
+    for size in (1, 5, 33):
+        extractor = LinkExtractor("https://example.com/")
+        links = []
+        for i in range(0, len(HOME), size):
+            links.extend(extractor.feed(HOME[i:i + size]))
+        assert links + extractor.close() == expected
+
+@pytest.mark.asyncio
+async def test_crawl_fetches_the_usual_pages_over_one_pool(site):
+    """Test that the homepage, /about and /contact are crawled with links deduplicated"""
+    crawler = Crawler(per_host=1)
+    crawl = await crawler.crawl(site.base_url)
+
+    assert [page["status"] for page in crawl["pages"]] == [200, 200, 404]
+    assert crawl["links"] == [
+        site.base_url + "about",
+        "https://twitter.com/example",
+        "https://www.linkedin.com/company/example",
+        "https://facebook.com/example?a=1&b=2",
+        site.base_url + "team",
+    ]
+    # One connection per host, kept alive from page to page
+    await crawler.crawl(site.base_url)
+    assert len(site.connections) == 1
+
+@pytest.mark.asyncio
+async def test_pages_are_capped_and_only_html_is_read(site):
+    """Test the response size cap and the content type check"""
+    crawler = Crawler(max_bytes=100000)
+    big = await crawler.fetch_links(site.base_url + "big")
+    assert big["links"] == [site.base_url + "first"]
+    assert big["truncated"]
+
+    image = await crawler.fetch_links(site.base_url + "logo.png")
+    assert image["status"] == 200
+    assert image["links"] == []
+
+    failed = await crawler.fetch_links("http://127.0.0.1:1/")
+    assert failed["error"]
+    assert failed["links"] == []
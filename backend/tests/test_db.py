@@ -0,0 +1,99 @@
+import pytest
+import sqlite3
+import threading
+
+import db
+
+def create_table(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)')
+    conn.commit()
+
+def insert(name):
+    def operation(conn):
+        return conn.execute('INSERT INTO items (name) VALUES (?)', (name,)).lastrowid
+    return operation
+
+def test_connections_are_per_thread_and_reused(temp_db):
+    """Test that a thread gets the same WAL connection back on every call"""
+    conn = db.get_connection(temp_db)
+    assert db.get_connection(temp_db) is conn
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.get_connection(temp_db)))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+def test_write_batcher_group_commits_concurrent_writes(temp_db):
+    """Test that writes arriving together share a transaction"""
+    batcher = db.WriteBatcher(temp_db, create_table, flush_interval=0.05)
+    try:
+        futures = [batcher.submit(insert(f"item-{i}")) for i in range(50)]
+        row_ids = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.stop()
+    
+    assert len(set(row_ids)) == 50
+    assert batcher.writes_committed == 50
+    assert batcher.batches_committed < 50
+    
+    conn = sqlite3.connect(temp_db)
+    assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 50
+    conn.close()
+
+def test_write_batcher_isolates_failing_writes(temp_db):
+    """Test that one failing write does not roll back the rest of its batch"""
+    batcher = db.WriteBatcher(temp_db, create_table, flush_interval=0.05)
+    try:
+        ok = batcher.submit(insert("dup"))
+        failing = batcher.submit(insert("dup"))
+        after = batcher.submit(insert("other"))
+        assert ok.result(timeout=5)
+        with pytest.raises(sqlite3.IntegrityError):
+            failing.result(timeout=5)
+        assert after.result(timeout=5)
+    finally:
+        batcher.stop()
+    
+    conn = sqlite3.connect(temp_db)
+    names = sorted(name for (name,) in conn.execute('SELECT name FROM items'))
+    conn.close()
+    assert names == ["dup", "other"]
+
+def test_write_batcher_fails_writes_when_the_lock_is_held(temp_db, monkeypatch):
+    """Test that a batch that cannot get the write lock fails its futures instead of leaving them pending"""
+    monkeypatch.setattr(db, "CONNECTION_PRAGMAS", db.CONNECTION_PRAGMAS[:-1] + ("PRAGMA busy_timeout=100",))
+    conn = sqlite3.connect(temp_db)
+    conn.execute('PRAGMA journal_mode=WAL')
+    create_table(conn)
+    conn.close()
+    
+    # Another process writing: it holds the write lock past the busy timeout
+    other = sqlite3.connect(temp_db, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    batcher = db.WriteBatcher(temp_db)
+    try:
+        blocked = [batcher.submit(insert(f"blocked-{i}")) for i in range(3)]
+        for future in blocked:
+            with pytest.raises(sqlite3.OperationalError):
+                future.result(timeout=5)
+        
+        other.execute('ROLLBACK')
+        assert batcher.submit(insert("after")).result(timeout=5)
+    finally:
+        other.close()
+        batcher.stop()
+
+def test_write_batcher_runs_writes_outside_a_transaction_alone(temp_db):
+    """Test that a VACUUM can go through the writer between batched writes"""
+    batcher = db.WriteBatcher(temp_db, create_table, flush_interval=0.05)
+    try:
+        before = batcher.submit(insert("before"))
+        vacuum = batcher.submit(lambda conn: conn.execute('VACUUM').fetchall(), transaction=False)
+        after = batcher.submit(insert("after"))
+        assert before.result(timeout=5) and after.result(timeout=5)
+        assert vacuum.result(timeout=5) == []
+    finally:
+        batcher.stop()
+    assert batcher.writes_committed == 3
@@ -0,0 +1,85 @@
+import pytest
+
+import db
+from dns_cache import DNSCache, ENTRY_OVERHEAD
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_entries_expire_after_their_ttl():
+    """Test that answers are served until their TTL runs out"""
+    clock = FakeClock()
+    cache = DNSCache(clock=clock)
+    cache.put("www.example.com", "A", ["192.0.2.1"], ttl=60)
+
+    clock.now += 59
+    assert cache.get("WWW.example.com.", "A") == ["192.0.2.1"]
+    clock.now += 1
+    assert cache.get("www.example.com", "A") is None
+    assert cache.stats()["entries"] == 0
+
+def test_negative_answers():
+    """Test that NXDOMAIN covers every type and NODATA only its own"""
+    clock = FakeClock()
+    cache = DNSCache(clock=clock, negative_ttl=30)
+    cache.put_nxdomain("gone.example.com")
+    cache.put("www.example.com", "AAAA", [], ttl=10)
+
+    assert cache.get("gone.example.com", "A") == []
+    assert cache.get("gone.example.com", "MX") == []
+    assert cache.get("www.example.com", "AAAA") == []
+    assert cache.get("www.example.com", "A") is None
+
+    clock.now += 30
+    assert cache.get("gone.example.com", "A") is None
+
+def test_lru_eviction_by_memory_budget():
+    """Test that the least recently used entries go first once over budget"""
+    entry_size = ENTRY_OVERHEAD + len("host0.example.com") + len("192.0.2.0")
+    cache = DNSCache(max_bytes=3 * entry_size)
+    for i in range(3):
+        cache.put(f"host{i}.example.com", "A", [f"192.0.2.{i}"], ttl=60)
+
+    # Touch host0 so host1 is now the least recently used
+    assert cache.get("host0.example.com", "A") == ["192.0.2.0"]
+    cache.put("host3.example.com", "A", ["192.0.2.3"], ttl=60)
+
+    assert cache.get("host1.example.com", "A") is None
+    assert cache.get("host0.example.com", "A") == ["192.0.2.0"]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+
+def test_hit_and_miss_counters():
+    """Test the counters reported by stats()"""
+    cache = DNSCache()
+    cache.put("www.example.com", "A", ["192.0.2.1"], ttl=60)
+    cache.get("www.example.com", "A")
+    cache.get("www.example.com", "A")
+    cache.get("mail.example.com", "A")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+def test_persistence_survives_restart(tmp_path):
+    """Test that a new cache on the same file starts warm, minus expired entries"""
+    path = str(tmp_path / "dns_cache.db")
+    clock = FakeClock()
+    cache = DNSCache(path=path, clock=clock)
+    cache.put("www.example.com", "A", ["192.0.2.1"], ttl=600)
+    cache.put("short.example.com", "A", ["192.0.2.2"], ttl=5)
+    cache.put_nxdomain("gone.example.com", ttl=600)
+    cache.persist().result()
+    db.close_all()
+
+    clock.now += 10
+    restarted = DNSCache(path=path, clock=clock)
+    assert restarted.get("www.example.com", "A") == ["192.0.2.1"]
+    assert restarted.get("gone.example.com", "A") == []
+    assert restarted.get("short.example.com", "A") is None
+    db.close_all()
@@ -0,0 +1,64 @@
+import pytest
+import asyncio
+from datetime import datetime
+
+import storage
+from events import ScanEventHub
+
+async def collect(hub, scan_id, after_id):
+    return [event async for event in hub.events(scan_id, after_id)]
+
+@pytest.mark.asyncio
+async def test_events_fan_out_until_the_scan_finishes(temp_db):
+    """Test that every subscriber of a scan gets its events, in order, and only its own"""
+    storage.store_scan("scan-1", "example.com", datetime.now())
+    storage.store_scan("scan-2", "example.org", datetime.now())
+    hub = ScanEventHub(poll_interval=0.02)
+    start = storage.last_event_id()
+    subscribers = [asyncio.create_task(collect(hub, "scan-1", start)) for _ in range(3)]
+    await asyncio.sleep(0.1)
+
+    storage.update_tool_states("scan-1", [("Amass", "running", None)])
+    storage.submit_scan_events("scan-2", [("findings", {"tool": "Amass", "kind": "subdomains", "values": ["x"]})])
+    storage.submit_scan_events("scan-1", [("findings", {"tool": "Amass", "kind": "subdomains", "values": ["a"]})])
+    storage.update_scan_results("scan-1", {"subdomains": ["a.example.com"]}, datetime.now())
+    storage.submit_scan_events("scan-1", [("findings", {"tool": "late", "kind": "ips", "values": []})]).result()
+
+    streams = await asyncio.wait_for(asyncio.gather(*subscribers), 5)
+    for events in streams:
+        assert [event["type"] for event in events] == ["tool", "findings", "status"]
+        assert events[1]["data"]["values"] == ["a"]
+        assert events[2]["data"] == {"status": "completed"}
+    assert not hub._subscribers
+
+@pytest.mark.asyncio
+async def test_late_subscriber_catches_up(temp_db):
+    """Test that a subscriber resuming from an older event gets the ones it missed"""
+    storage.store_scan("scan-1", "example.com", datetime.now())
+    hub = ScanEventHub(poll_interval=0.02)
+    start = storage.last_event_id()
+    live = asyncio.create_task(collect(hub, "scan-1", start))
+    storage.update_tool_states("scan-1", [("Amass", "running", None)])
+    await asyncio.sleep(0.1)
+
+    resumed = asyncio.create_task(collect(hub, "scan-1", start))
+    await asyncio.sleep(0.1)
+    storage.update_tool_states("scan-1", [("Amass", "completed", None)])
+    storage.update_scan_results("scan-1", {}, datetime.now(), status="cancelled")
+
+    first, second = await asyncio.wait_for(asyncio.gather(live, resumed), 5)
+    assert [event["id"] for event in first] == [event["id"] for event in second]
+    assert [event["data"].get("state") for event in second] == ["running", "completed", None]
+
+@pytest.mark.asyncio
+async def test_subscriber_that_falls_behind_is_dropped(temp_db):
+    """Test that a subscriber's backlog is bounded; it reconnects to catch up"""
+    storage.store_scan("scan-1", "example.com", datetime.now())
+    hub = ScanEventHub(poll_interval=0.02, queue_size=5)
+    subscriber = asyncio.create_task(collect(hub, "scan-1", storage.last_event_id()))
+    await asyncio.sleep(0.1)
+    # More events than it can hold arrive in one poll
+    storage.submit_scan_events("scan-1", [("findings", {"values": [i]}) for i in range(20)]).result()
+
+    assert await asyncio.wait_for(subscriber, 5) == []
+    assert not hub._subscribers
@@ -0,0 +1,40 @@
+import os
+
+from extract import Extractor, extract
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'theharvester_output.txt')
+
+def test_extract_scopes_to_domain():
+    """Test that hostnames and emails outside the target domain are skipped"""
+    text = (
+        "Contact Admin@Example.com or noc@other.org.\n"
+        "api.example.com, cdn.example.net, example.com.evil.org\n"
+        "See https://www.example.com/about?x=1) and https://other.org/\n"
+    )
+    found = extract(text, "example.com")
+    assert found["subdomains"] == ["api.example.com", "www.example.com"]
+    assert found["emails"] == ["admin@example.com"]
+    assert found["urls"] == ["https://www.example.com/about?x=1", "https://other.org/"]
+    assert extract(text)["emails"] == ["admin@example.com", "noc@other.org"]
+
+def test_extract_ip_addresses():
+    """Test that only whole, valid IPv4 and IPv6 addresses are found"""
+    text = "192.0.2.1 host:198.51.100.7 v1.2.3.4.5 999.1.1.1 2001:DB8::1 12:30:45 ::1 build 10.0.0"
+    assert extract(text)["ips"] == ["192.0.2.1", "198.51.100.7", "2001:db8::1", "::1"]
+
+def test_chunks_split_anywhere_give_the_same_findings():
+    """Test incremental extraction over byte chunks split mid-token and mid-character"""
+    with open(FIXTURE, 'rb') as f:
+        data = f.read() + "\nnoté dev.example.com\n".encode()
+    expected = extract(data, "example.com")
+    assert "mail.example.com" in expected["subdomains"]
+    assert "dev.example.com" in expected["subdomains"]
+
+    for size in (1, 7, 64):
+        extractor = Extractor("example.com")
+        findings = []
+        for i in range(0, len(data), size):
+            findings.extend(extractor.feed(data[i:i + size]))
+        findings.extend(extractor.close())
+        for kind, values in expected.items():
+            assert [value for k, value in findings if k == kind] == values
@@ -0,0 +1,228 @@
+import pytest
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import storage
+from storage import cancel_scan, enqueue_scan, get_scan_by_id, scan_queue
+from worker_pool import Worker
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_queue(lease_seconds=10, clock=None):
+    queue = scan_queue()
+    queue.lease_seconds = lease_seconds
+    if clock is not None:
+        queue.clock = clock
+    return queue
+
+def test_claims_are_fifo_and_exclusive(temp_db):
+    """Test that concurrent claimers each get a different job, oldest first"""
+    for i in range(3):
+        enqueue_scan(f"scan-{i}", "example.com", datetime.now())
+    assert get_scan_by_id("scan-0")["status"] == "queued"
+
+    queue = make_queue()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        claimed = list(pool.map(lambda i: queue.claim(f"worker-{i}"), range(8)))
+
+    jobs = [job for job in claimed if job is not None]
+    assert sorted(job["scan_id"] for job in jobs) == ["scan-0", "scan-1", "scan-2"]
+    assert all(job["payload"]["domain"] == "example.com" for job in jobs)
+    assert get_scan_by_id("scan-0")["status"] == "running"
+    assert queue.claim("late-worker") is None
+
+def test_claims_favor_priority_then_quiet_submitters(temp_db):
+    """Test that bulk scans wait for interactive ones and submitters take turns"""
+    for i in range(3):
+        enqueue_scan(f"bulk-{i}", "example.com", datetime.now(), priority="bulk", submitter="script")
+    for i in range(3):
+        enqueue_scan(f"alice-{i}", "example.com", datetime.now(), submitter="alice")
+    enqueue_scan("bob-0", "example.com", datetime.now(), submitter="bob")
+
+    queue = make_queue()
+    order = [queue.claim("worker-a")["scan_id"] for _ in range(7)]
+
+    assert order[:4] == ["alice-0", "bob-0", "alice-1", "alice-2"]
+    assert order[4:] == ["bulk-0", "bulk-1", "bulk-2"]
+    stats = queue.stats()
+    assert stats["running"] == 7
+    assert stats["queued"] == {"interactive": 0, "bulk": 0}
+    assert storage.scheduler_stats()["scans"]["recent_waits"]["count"] == 7
+
+def test_expired_lease_moves_to_another_worker(temp_db):
+    """Test that a dead worker's job is leased again and the old lease is fenced off"""
+    clock = FakeClock()
+    queue = make_queue(clock=clock)
+    enqueue_scan("scan-1", "example.com", datetime.now())
+
+    first = queue.claim("worker-a")
+    clock.now += 5
+    assert queue.submit_renew(first["job_id"], "worker-a").result()
+    clock.now += 9
+    assert queue.claim("worker-b") is None  # renewed lease has not run out yet
+
+    clock.now += 5
+    second = queue.claim("worker-b")
+    assert second["scan_id"] == "scan-1"
+    assert second["attempts"] == 2
+    assert not queue.submit_renew(first["job_id"], "worker-a").result()
+    assert not queue.submit_complete(first["job_id"], "worker-a").result()
+
+    assert queue.submit_complete(second["job_id"], "worker-b").result()
+    assert queue.get_job("scan-1") is None
+
+def test_job_is_given_up_after_max_attempts(temp_db):
+    """Test that a job whose workers keep dying fails its scan"""
+    clock = FakeClock()
+    queue = make_queue(clock=clock)
+    enqueue_scan("scan-1", "example.com", datetime.now())
+
+    for attempt in range(queue.max_attempts):
+        assert queue.claim(f"worker-{attempt}")["attempts"] == attempt + 1
+        clock.now += 11
+
+    assert queue.claim("worker-last") is None
+    assert queue.get_job("scan-1")["state"] == "failed"
+    scan = get_scan_by_id("scan-1")
+    assert scan["status"] == "failed"
+    assert "3 attempts" in scan["results"]["error"]
+
+def test_released_job_keeps_its_attempts(temp_db):
+    """Test that handing a job back does not count against it"""
+    queue = make_queue()
+    enqueue_scan("scan-1", "example.com", datetime.now())
+
+    job = queue.claim("worker-a")
+    assert queue.submit_release(job["job_id"], "worker-a").result()
+    assert queue.get_job("scan-1")["state"] == "queued"
+    assert queue.claim("worker-b")["attempts"] == 1
+
+@pytest.mark.asyncio
+async def test_worker_runs_jobs_on_one_loop(temp_db):
+    """Test that a worker runs at most `concurrency` jobs at once and keeps their leases"""
+    for i in range(4):
+        enqueue_scan(f"scan-{i}", "example.com", datetime.now())
+    running, peak, done = set(), [0], []
+
+    async def run_job(job):
+        running.add(job["scan_id"])
+        peak[0] = max(peak[0], len(running))
+        await asyncio.sleep(0.3)  # longer than the lease
+        running.discard(job["scan_id"])
+        done.append(job["scan_id"])
+
+    worker = Worker(make_queue(lease_seconds=0.15), run_job, name="worker-a", concurrency=2, poll_interval=0.05)
+    task = asyncio.create_task(worker.run())
+    while len(done) < 4:
+        await asyncio.sleep(0.05)
+    worker.stop()
+    await task
+
+    assert sorted(done) == [f"scan-{i}" for i in range(4)]
+    assert peak[0] == 2
+    assert worker.jobs_done == 4
+    assert all(scan_queue().get_job(f"scan-{i}") is None for i in range(4))
+
+@pytest.mark.asyncio
+async def test_stopped_worker_hands_back_its_jobs(temp_db):
+    """Test that stopping a worker cancels its scans and requeues them"""
+    enqueue_scan("scan-1", "example.com", datetime.now())
+    started = asyncio.Event()
+
+    async def run_job(job):
+        started.set()
+        await asyncio.sleep(60)
+
+    worker = Worker(make_queue(), run_job, name="worker-a", poll_interval=0.05)
+    task = asyncio.create_task(worker.run())
+    await asyncio.wait_for(started.wait(), 5)
+    worker.stop()
+    await asyncio.wait_for(task, 5)
+
+    job = scan_queue().get_job("scan-1")
+    assert job["state"] == "queued"
+    assert job["attempts"] == 0
+
+def test_cancelled_jobs_leave_the_queue(temp_db):
+    """Test that a queued job is dropped at once and a leased one is flagged"""
+    clock = FakeClock()
+    queue = make_queue(clock=clock)
+    enqueue_scan("scan-1", "example.com", datetime.now())
+    enqueue_scan("scan-2", "example.com", datetime.now())
+    job = queue.claim("worker-a")
+
+    assert cancel_scan("scan-2") == "cancelled"
+    assert get_scan_by_id("scan-2")["status"] == "cancelled"
+    assert queue.claim("worker-b") is None
+
+    assert cancel_scan("scan-1") == "cancelling"
+    assert get_scan_by_id("scan-1")["status"] == "cancelling"
+    assert queue.cancelled_jobs([job["job_id"], 999]) == {job["job_id"]}
+    # Its worker died before stopping it
+    clock.now += 11
+    assert queue.claim("worker-b") is None
+    assert get_scan_by_id("scan-1")["status"] == "cancelled"
+    assert cancel_scan("scan-1") == "cancelled"
+    assert cancel_scan("missing") is None
+
+@pytest.mark.asyncio
+async def test_worker_passes_on_cancellation(temp_db):
+    """Test that cancelling a running job sets its cancel_requested event"""
+    enqueue_scan("scan-1", "example.com", datetime.now())
+    stopped = []
+
+    async def run_job(job):
+        await asyncio.wait_for(job["cancel_requested"].wait(), 5)
+        stopped.append(job["scan_id"])
+
+    worker = Worker(make_queue(), run_job, name="worker-a", poll_interval=0.05)
+    task = asyncio.create_task(worker.run())
+    while get_scan_by_id("scan-1")["status"] != "running":
+        await asyncio.sleep(0.05)
+    assert cancel_scan("scan-1") == "cancelling"
+    while not stopped:
+        await asyncio.sleep(0.05)
+    worker.stop()
+    await task
+
+    assert worker.jobs_done == 1
+    assert scan_queue().get_job("scan-1") is None
+
+def test_worker_pool_runs_queued_scans(temp_db):
+    """Test that the worker pool process runs scans queued while it was down"""
+    for i in range(2):
+        enqueue_scan(f"scan-{i}", "example.com", datetime.now())
+
+    pool = subprocess.Popen(
+        [sys.executable, "worker_pool.py", "--workers", "2", "--concurrency", "1", "--db", temp_db],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if all(get_scan_by_id(f"scan-{i}")["status"] == "completed" for i in range(2)):
+                break
+            time.sleep(0.2)
+    finally:
+        pool.send_signal(signal.SIGTERM)
+        pool.wait(timeout=10)
+
+    for i in range(2):
+        scan = get_scan_by_id(f"scan-{i}")
+        assert scan["status"] == "completed"
+        assert "api.example.com" in scan["results"]["subdomains"]
+    assert scan_queue().get_job("scan-0") is None
+    assert pool.returncode == 0
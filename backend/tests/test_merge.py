@@ -0,0 +1,83 @@
+import pytest
+from datetime import datetime
+
+from merge import FindingsMerger, normalize
+from storage import store_scan, update_scan_results, get_finding_sources
+from workers import merge_results
+
+@pytest.mark.parametrize("kind, values, expected", [
+    ("subdomains", ["WWW.Example.com", "www.example.com.", " www.example.com\n"], "www.example.com"),
+    ("subdomains", ["bücher.example.com", "BÜCHER.example.com.", "xn--bcher-kva.example.com"],
+     "xn--bcher-kva.example.com"),
+    ("emails", ["Admin@EXAMPLE.com", "Admin@example.com."], "Admin@example.com"),
+    ("emails", ["info@bücher.de"], "info@xn--bcher-kva.de"),
+    ("ips", ["2001:DB8:0:0:0:0:0:1", "2001:db8::1", "[2001:db8::1]"], "2001:db8::1"),
+    ("ips", ["10.0.0.1", " 10.0.0.1 "], "10.0.0.1"),
+    ("social_profiles", ["http://www.Twitter.com/Acme/?utm_source=site", "https://x.com/acme"],
+     "https://twitter.com/acme"),
+])
+def test_normalize(kind, values, expected):
+    """Test that the forms of a value normalize to one, which stays as it is"""
+    for value in values:
+        assert normalize(kind, value) == expected
+    assert normalize(kind, expected) == expected
+
+def test_unparseable_values_are_kept():
+    """Test that values which do not parse are only stripped"""
+    assert normalize("ips", " 010.0.0.1 ") == "010.0.0.1"
+    assert normalize("emails", "not-an-email") == "not-an-email"
+    assert normalize("social_profiles", "https://example.com/Page") == "https://example.com/Page"
+    assert normalize("subdomains", "bad\udcff.example.com") == "bad\udcff.example.com"
+
+def test_merger_records_provenance():
+    """Test bitmasks per value, in first-seen order"""
+    merger = FindingsMerger(["theHarvester", "Amass"])
+    merger.add("theHarvester", {"subdomains": ["WWW.example.com", "mail.example.com"], "emails": ["a@Example.com"]})
+    merger.add("Amass", {"subdomains": ["www.example.com.", "api.example.com"], "error": "Amass was stopped"})
+    merger.add("crawler", {"subdomains": ["api.example.com", ""]})
+
+    assert merger.tools == ["theHarvester", "Amass", "crawler"]
+    assert merger.findings["subdomains"] == {"www.example.com": 0b011, "mail.example.com": 0b001,
+                                             "api.example.com": 0b110}
+    assert merger.result() == {
+        "subdomains": ["www.example.com", "mail.example.com", "api.example.com"],
+        "emails": ["a@example.com"], "ips": [], "social_profiles": [], "errors": ["Amass was stopped"]
+    }
+    assert merger.tools_of(0b101) == ["theHarvester", "crawler"]
+    assert merger.provenance("subdomains")["api.example.com"] == ["Amass", "crawler"]
+
+def test_overlap_statistics():
+    """Test found, unique and pairwise counts per tool"""
+    merger = FindingsMerger(["a", "b", "c"])
+    merger.add("a", {"ips": ["1.1.1.1", "2.2.2.2", "3.3.3.3"]})
+    merger.add("b", {"ips": ["2.2.2.2", "3.3.3.3", "4.4.4.4"]})
+    merger.add("c", {"ips": ["3.3.3.3"]})
+
+    ips = merger.overlap()["ips"]
+    assert ips["total"] == 4
+    assert ips["shared"] == 2
+    assert ips["tools"]["a"] == {"found": 3, "unique": 1, "with": {"b": 2, "c": 1}}
+    assert ips["tools"]["b"] == {"found": 3, "unique": 1, "with": {"a": 2, "c": 1}}
+    assert ips["tools"]["c"] == {"found": 1, "unique": 0, "with": {"a": 1, "b": 1}}
+    assert merger.overlap()["emails"]["total"] == 0
+
+@pytest.mark.asyncio
+async def test_merged_findings_are_attributed(temp_db):
+    """Test that stored sources match tools whatever form they reported a value in"""
+    scan_id = "test-merge-1"
+    store_scan(scan_id, "example.com", datetime.now())
+    tool_results = {
+        "theHarvester": {"subdomains": ["WWW.example.com"], "emails": ["admin@EXAMPLE.com"]},
+        "Amass": {"subdomains": ["www.example.com.", "mail.example.com"]}
+    }
+    sources = {}
+    merged = await merge_results(list(tool_results.values()), list(tool_results), sources)
+    assert merged["subdomains"] == ["www.example.com", "mail.example.com"]
+    assert merged["overlap"]["subdomains"]["shared"] == 1
+    assert sources["emails"] == {"admin@example.com": ["theHarvester"]}
+
+    update_scan_results(scan_id, merged, datetime.now(), sources=sources)
+    assert get_finding_sources(scan_id, "subdomains") == {
+        "www.example.com": ["theHarvester", "Amass"],
+        "mail.example.com": ["Amass"]
+    }
@@ -0,0 +1,80 @@
+import pytest
+
+from dns_stub import StubDNSServer
+from dns_cache import DNSCache
+from resolver import AsyncResolver, resolve_domain, addresses
+from workers import get_subdomains, get_ips
+
+ZONE = {
+    "example.com": {"A": ["192.0.2.1"]},
+    "www.example.com": {"A": ["192.0.2.10", "192.0.2.11"], "AAAA": ["2001:db8::10"]},
+    "mail.example.com": {"A": ["192.0.2.20"]},
+    "api.example.com": {"CNAME": "www.example.com"},
+    "dev.example.com": {"CNAME": "gone.example.net"},
+}
+
+@pytest.fixture
+def dns_server():
+    with StubDNSServer(ZONE) as server:
+        yield server
+
+def make_resolver(server, **kwargs):
+    kwargs.setdefault("cache", DNSCache())
+    return AsyncResolver(nameservers=[server.address], port=server.port, **kwargs)
+
+@pytest.mark.asyncio
+async def test_resolve_a_aaaa_cname(dns_server):
+    """Test that one name's A, AAAA and CNAME records come back together"""
+    resolver = make_resolver(dns_server)
+
+    www = await resolver.resolve("www.example.com")
+    assert sorted(www["A"]) == ["192.0.2.10", "192.0.2.11"]
+    assert www["AAAA"] == ["2001:db8::10"]
+    assert www["CNAME"] == []
+
+    # An alias resolves to its target's addresses
+    api = await resolver.resolve("api.example.com")
+    assert api["CNAME"] == ["www.example.com"]
+    assert sorted(addresses(api)) == ["192.0.2.10", "192.0.2.11", "2001:db8::10"]
+
+    missing = await resolver.resolve("nope.example.com")
+    assert missing == {"A": [], "AAAA": [], "CNAME": []}
+
+@pytest.mark.asyncio
+async def test_resolve_domain_single_pass(dns_server):
+    """Test that subdomains and IPs come from one lookup per name and type"""
+    resolution = await resolve_domain("example.com", resolver=make_resolver(dns_server))
+
+    # dev is a dangling alias: it has no address but still exists
+    assert resolution["subdomains"] == ["www.example.com", "mail.example.com", "api.example.com", "dev.example.com"]
+    assert sorted(resolution["ips"]) == ["192.0.2.1", "192.0.2.10", "192.0.2.11", "192.0.2.20", "2001:db8::10"]
+    assert max(dns_server.queries.values()) == 1
+
+    assert get_subdomains("example.com", resolution) == resolution["subdomains"]
+    assert get_ips("example.com", resolution) == resolution["ips"]
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    """Test that lookups overlap but never exceed the semaphore limit"""
+    zone = {f"host{i}.example.com": {"A": [f"192.0.2.{i}"]} for i in range(40)}
+    with StubDNSServer(zone, delay=0.05) as server:
+        resolver = make_resolver(server, concurrency=5)
+        records = await resolver.resolve_many(list(zone), rdtypes=("A",))
+
+    assert all(records[name]["A"] for name in zone)
+    assert 1 < server.max_in_flight <= 5
+
+@pytest.mark.asyncio
+async def test_repeat_lookups_are_served_from_cache(dns_server):
+    """Test that a second scan of a domain sends no queries, negative answers included"""
+    cache = DNSCache()
+    await resolve_domain("example.com", resolver=make_resolver(dns_server, cache=cache))
+    sent = sum(dns_server.queries.values())
+
+    resolution = await resolve_domain("example.com", resolver=make_resolver(dns_server, cache=cache))
+
+    assert sum(dns_server.queries.values()) == sent
+    assert "dev.example.com" in resolution["subdomains"]
+    assert cache.stats()["hits"] == sent
+    assert cache.get("nope.example.com", "MX") is None
+    assert cache.get("ftp.example.com", "MX") == []
@@ -0,0 +1,115 @@
+import pytest
+import json
+import os
+from datetime import datetime, timedelta
+
+import storage
+import retention
+from storage import store_scan, update_scan_results, get_scan_by_id, find_asset_sightings
+
+NOW = datetime(2024, 6, 1)
+
+def add_scan(scan_id, domain, start_time, subdomains, complete=True):
+    store_scan(scan_id, domain, start_time)
+    if complete:
+        update_scan_results(scan_id, {"subdomains": subdomains, "emails": [], "ips": [], "errors": []},
+                            start_time + timedelta(minutes=5))
+
+def test_apply_retention_archives_expired_scans(temp_db, tmp_path):
+    """Test that only scans past their status TTL move to the archive"""
+    add_scan("old-1", "example.com", NOW - timedelta(days=100), ["a.example.com", "b.example.com"])
+    add_scan("new-1", "example.com", NOW - timedelta(days=10), ["a.example.com"])
+    add_scan("stuck-1", "example.org", NOW - timedelta(days=30), [], complete=False)
+    add_scan("running-1", "example.org", NOW - timedelta(days=1), [], complete=False)
+
+    summary = retention.apply_retention(now=NOW, archive_dir=str(tmp_path))
+
+    assert summary["archived"] == {"completed": 1, "running": 1, "failed": 0, "cancelled": 0}
+    assert get_scan_by_id("old-1") is None
+    assert get_scan_by_id("stuck-1") is None
+    assert get_scan_by_id("new-1")["results"]["subdomains"] == ["a.example.com"]
+    assert get_scan_by_id("running-1") is not None
+
+    scans = retention.read_archive("scans", archive_dir=str(tmp_path))
+    assert sorted(scans["scan_id"]) == ["old-1", "stuck-1"]
+    old = scans[scans["scan_id"] == "old-1"].iloc[0]
+    assert old["subdomains"] == 2
+    assert json.loads(old["results"])["errors"] == []
+
+    findings = retention.read_archive(
+        "findings", archive_dir=str(tmp_path), filters=[("kind", "==", "subdomains")]
+    )
+    assert sorted(findings["value"]) == ["a.example.com", "b.example.com"]
+
+def test_dry_run_only_counts(temp_db, tmp_path):
+    """Test that a dry run archives and deletes nothing"""
+    add_scan("old-1", "example.com", NOW - timedelta(days=100), ["a.example.com"])
+
+    summary = retention.apply_retention(now=NOW, archive_dir=str(tmp_path), dry_run=True)
+
+    assert summary["archived"]["completed"] == 1
+    assert get_scan_by_id("old-1") is not None
+    assert not os.path.exists(tmp_path / "scans")
+
+def test_archiving_a_delta_base_keeps_later_scans_intact(temp_db, tmp_path):
+    """Test that scans stored as deltas survive the deletion of their base"""
+    base = [f"host{i}.example.com" for i in range(20)]
+    add_scan("day-1", "example.com", NOW - timedelta(days=100), base)
+    add_scan("day-2", "example.com", NOW - timedelta(days=5), base + ["new.example.com"])
+    conn = storage._connection()
+    assert conn.execute("SELECT base_scan_id FROM scans WHERE scan_id = 'day-2'").fetchone()[0] == "day-1"
+
+    retention.apply_retention(now=NOW, archive_dir=str(tmp_path))
+
+    assert get_scan_by_id("day-1") is None
+    assert get_scan_by_id("day-2")["results"]["subdomains"] == base + ["new.example.com"]
+
+def test_archiving_prunes_the_asset_index(temp_db, tmp_path):
+    """Test that assets only seen in archived scans leave the index"""
+    add_scan("old-1", "example.com", NOW - timedelta(days=100), ["gone.example.com", "kept.example.com"])
+    add_scan("new-1", "example.net", NOW - timedelta(days=1), ["kept.example.com"])
+
+    retention.apply_retention(now=NOW, archive_dir=str(tmp_path))
+
+    assert find_asset_sightings("subdomains", "gone.example.com")["scans"] == []
+    assert [s["scan_id"] for s in find_asset_sightings("subdomains", "kept.example.com")["scans"]] == ["new-1"]
+    conn = storage._connection()
+    assert conn.execute("SELECT COUNT(*) FROM assets WHERE value = 'gone.example.com'").fetchone()[0] == 0
+
+def test_compact_database_returns_free_pages(temp_db, tmp_path):
+    """Test that archiving a large scan shrinks the database file"""
+    storage.compact_database()
+    add_scan("big-1", "example.com", NOW - timedelta(days=100), [f"host{i}.example.com" for i in range(20000)])
+    storage._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    size_before = os.path.getsize(temp_db)
+
+    summary = retention.apply_retention(now=NOW, archive_dir=str(tmp_path))
+    storage._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    assert summary["pages_freed"] > 0
+    assert storage._connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert storage._connection().execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert os.path.getsize(temp_db) < size_before / 2
+
+def test_compact_database_converts_older_files(temp_db):
+    """Test the first run on a file without incremental vacuum"""
+    add_scan("big-1", "example.com", NOW, [f"host{i}.example.com" for i in range(20000)])
+    storage.delete_scans(["big-1"])
+    conn = storage._connection()
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+
+    # The conversion's VACUUM frees the pages; only incremental vacuums are counted
+    assert storage.compact_database() == 0
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert storage.compact_database() == 0
+
+def test_parse_ttls():
+    """Test the status=days TTL format"""
+    assert retention.parse_ttls("completed=30, running=0.5") == {
+        "completed": timedelta(days=30),
+        "running": timedelta(hours=12)
+    }
+    with pytest.raises(ValueError):
+        retention.parse_ttls("completed")
@@ -0,0 +1,117 @@
+import pytest
+import asyncio
+import time
+
+import storage
+from scheduler import ToolScheduler, plan_grants, parse_limits
+
+def make_scheduler(limits=None, global_limit=16, owner=None, **kwargs):
+    return ToolScheduler(storage.DB_FILE, storage._create_schema, limits, global_limit, owner=owner,
+                         interval=0.02, **kwargs)
+
+def test_plan_grants_priority_and_limits():
+    """Test that interactive runs go first and capped tools are skipped over"""
+    waiting = [
+        (1, "Amass", "alice", 1, 1.0),
+        (2, "Amass", "bob", 0, 2.0),
+        (3, "Amass", "carol", 0, 3.0),
+        (4, "theHarvester", "alice", 1, 4.0),
+    ]
+    assert plan_grants([], waiting, {"Amass": 1}, 16) == [2, 4]
+    assert plan_grants([("Amass", "x")], waiting, {"Amass": 1}, 16) == [4]
+    assert plan_grants([], waiting, {}, 2) == [2, 3]
+
+def test_plan_grants_shares_between_submitters():
+    """Test that a submitter with runs in progress waits behind one without"""
+    waiting = [(i, "Amass", "bulk-script", 0, float(i)) for i in range(1, 5)] + [(9, "Amass", "analyst", 0, 9.0)]
+    assert plan_grants([], waiting, {"Amass": 2}, 16) == [1, 9]
+    assert plan_grants([("Amass", "bulk-script")], waiting, {"Amass": 2}, 16) == [9]
+
+def test_parse_limits():
+    """Test the TOOL_LIMITS format"""
+    assert parse_limits("Amass=2, theHarvester=4") == {"Amass": 2, "theHarvester": 4}
+    assert parse_limits("") == {}
+    with pytest.raises(ValueError):
+        parse_limits("Amass")
+
+@pytest.mark.asyncio
+async def test_tool_limit_holds_across_processes(temp_db):
+    """Test that schedulers of different processes share one per-tool limit"""
+    workers = [make_scheduler({"Amass": 2}, owner=f"worker-{i}") for i in range(2)]
+    running, peak = [0], [0]
+
+    async def amass():
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.1)
+        running[0] -= 1
+        return "done"
+
+    results = await asyncio.gather(*[
+        workers[i % 2].run("Amass", amass, scan_id=f"scan-{i}", submitter="alice") for i in range(6)
+    ])
+
+    assert results == ["done"] * 6
+    assert peak[0] == 2
+    stats = workers[0].stats()
+    assert stats["tools"]["Amass"]["running"] == 0
+    assert stats["tools"]["Amass"]["limit"] == 2
+    assert stats["tools"]["Amass"]["recent_waits"]["count"] == 6
+    assert stats["tools"]["Amass"]["recent_waits"]["max"] >= 0.1
+
+@pytest.mark.asyncio
+async def test_waiting_runs_show_in_stats(temp_db):
+    """Test queue depth while runs wait for a global slot"""
+    scheduler = make_scheduler(global_limit=1)
+    release = asyncio.Event()
+
+    async def hold():
+        await release.wait()
+
+    tasks = [asyncio.create_task(scheduler.run("theHarvester", hold)) for _ in range(3)]
+    await asyncio.sleep(0.2)
+    stats = scheduler.stats()
+    assert stats["running"] == 1
+    assert stats["waiting"] == 2
+    assert stats["tools"]["theHarvester"]["oldest_wait_seconds"] > 0
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert scheduler.stats()["waiting"] == 0
+
+@pytest.mark.asyncio
+async def test_slots_of_a_dead_process_are_freed(temp_db):
+    """Test that a slot whose lease ran out stops counting against the limit"""
+    conn = storage._connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO tool_slots (tool, scan_id, submitter, priority, owner, requested_at, granted_at, lease_expires) "
+            "VALUES ('Amass', 'scan-0', 'alice', 0, 'dead-worker', ?, ?, ?)",
+            (time.time() - 60, time.time() - 60, time.time() - 1)
+        )
+
+    async def amass():
+        return "ran"
+
+    scheduler = make_scheduler({"Amass": 1})
+    assert await asyncio.wait_for(scheduler.run("Amass", amass), 5) == "ran"
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place(temp_db):
+    """Test that cancelling a waiting run removes its request"""
+    scheduler = make_scheduler({"Amass": 1})
+    release = asyncio.Event()
+
+    async def hold():
+        await release.wait()
+
+    holder = asyncio.create_task(scheduler.run("Amass", hold))
+    waiter = asyncio.create_task(scheduler.run("Amass", hold))
+    await asyncio.sleep(0.2)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.stats()["waiting"] == 0
+
+    release.set()
+    await holder
@@ -0,0 +1,51 @@
+import pytest
+
+from social import classify, find_profiles
+
+@pytest.mark.parametrize("url", [
+    "https://notfacebook.com/acme",
+    "https://twitter.com.evil.org/acme",
+    "https://example.com/?next=https://twitter.com/acme",
+    "https://www.facebook.com/sharer/sharer.php?u=https%3A%2F%2Fexample.com",
+    "https://twitter.com/intent/tweet?text=hello",
+    "https://www.linkedin.com/shareArticle?mini=true&url=x",
+    "https://www.facebook.com/profile.php",
+    "https://www.youtube.com/watch?v=abc",
+    "https://instagram.com/p/Cx1",
+    "https://github.com/orgs",
+    "https://github.com/sponsors/acme",
+    "https://github.com/enterprise",
+    "mailto:hello@twitter.com",
+])
+def test_non_profiles_are_rejected(url):
+    """Test look-alike hosts, share intents and content links"""
+    assert classify(url) is None
+
+def test_profiles_are_canonicalized():
+    """Test scheme, host, path and query canonicalization"""
+    assert classify("http://www.Twitter.com/Acme/?utm_source=site#top") == ("twitter", "https://twitter.com/acme")
+    assert classify("https://x.com/acme/status/123") == ("twitter", "https://twitter.com/acme")
+    assert classify("https://uk.linkedin.com/company/acme-corp/about/") == (
+        "linkedin", "https://linkedin.com/company/acme-corp"
+    )
+    assert classify("https://m.facebook.com/profile.php?id=42&ref=bookmarks") == (
+        "facebook", "https://facebook.com/profile.php?id=42"
+    )
+    # Channel ids are case-sensitive
+    assert classify("https://www.youtube.com/channel/UCabcDEF/videos") == (
+        "youtube", "https://youtube.com/channel/UCabcDEF"
+    )
+    assert classify("https://github.com/acme/website") == ("github", "https://github.com/acme")
+    assert classify("https://github.com/orgs/Acme/people") == ("github", "https://github.com/orgs/acme")
+
+def test_find_profiles_deduplicates_in_order():
+    """Test that variants of one profile count once"""
+    links = [
+        "https://example.com/about",
+        "https://twitter.com/acme",
+        "https://www.facebook.com/acmecorp/",
+        "https://mobile.twitter.com/ACME?lang=en",
+        "https://facebook.com/AcmeCorp",
+        "https://twitter.com/acme",
+    ] * 1000
+    assert find_profiles(links) == ["https://twitter.com/acme", "https://facebook.com/acmecorp"]
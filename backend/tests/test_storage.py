@@ -1,8 +1,9 @@
 import pytest
 import sqlite3
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import zlib
 
 # Import the storage functions to test
 from storage import (
@@ -10,9 +11,24 @@ from storage import (
     update_scan_results,
     get_scan_by_id,
     get_all_scans,
+    list_scans,
+    get_findings,
+    get_finding_sources,
+    count_findings,
+    migrate_inline_findings,
+    recompress_legacy_results,
+    find_asset_sightings,
+    find_related_domains,
+    get_scan_diff,
+    request_scan,
+    enqueue_batch,
+    get_batch,
+    cancel_scan,
+    scan_queue,
     DB_FILE
 )
 
+
 def test_store_scan(temp_db):
     """Test storing a scan in the database"""
     scan_id = "test-scan-1"
@@ -31,6 +47,7 @@ def test_store_scan(temp_db):
     assert scan["domain"] == domain
     assert scan["status"] == "running"  # Default status when creating a scan
 
+
 def test_update_scan_results(temp_db):
     """Test updating scan results in the database"""
     scan_id = "test-scan-2"
@@ -61,6 +78,7 @@ def test_update_scan_results(temp_db):
     assert "subdomains" in scan["results"]
     assert "emails" in scan["results"]
 
+
 def test_get_scan_by_id(temp_db):
     """Test retrieving a scan by ID"""
     scan_id = "test-scan-3"
@@ -90,6 +108,7 @@ def test_get_scan_by_id(temp_db):
     assert "subdomains" in scan["results"]
     assert scan["results"]["subdomains"][0] == "sub1.example.com"
 
+
 def test_get_all_scans(temp_db):
     """Test retrieving all scans"""
     # Clear the database
@@ -116,4 +135,294 @@ def test_get_all_scans(temp_db):
         assert scan["scan_id"] in scan_ids
         index = scan_ids.index(scan["scan_id"])
         assert scan["domain"] == domains[index]
-        assert scan["status"] == "running" 
\ No newline at end of file
+        assert scan["status"] == "running" 
+
+
+def test_update_scan_results_writes_findings(temp_db):
+    """Test that finding lists are normalized into the findings table"""
+    scan_id = "test-scan-7"
+    store_scan(scan_id, "example.com", datetime.now())
+    
+    results = {
+        "subdomains": ["www.example.com", "mail.example.com"],
+        "emails": ["admin@example.com"],
+        "ips": [],
+        "social_profiles": [],
+        "errors": ["tool failed"]
+    }
+    sources = {
+        "subdomains": {"www.example.com": ["theHarvester", "Amass"], "mail.example.com": ["Amass"]},
+        "emails": {"admin@example.com": ["theHarvester"]}
+    }
+    update_scan_results(scan_id, results, datetime.now(), sources=sources)
+    
+    # The blob no longer carries the lists, only their counts
+    conn = sqlite3.connect(temp_db)
+    blob = conn.execute("SELECT results FROM scans WHERE scan_id = ?", (scan_id,)).fetchone()[0]
+    stored = json.loads(zlib.decompress(blob[1:]))
+    conn.close()
+    assert stored["subdomains"] == 2
+    assert stored["errors"] == ["tool failed"]
+    
+    # The response shape is rebuilt from the findings table
+    scan = get_scan_by_id(scan_id)
+    assert scan["results"] == results
+    
+    assert get_findings(scan_id, "subdomains") == ["www.example.com", "mail.example.com"]
+    assert count_findings(scan_id) == {"subdomains": 2, "emails": 1, "ips": 0, "social_profiles": 0}
+    assert get_finding_sources(scan_id, "subdomains") == {
+        "www.example.com": ["theHarvester", "Amass"],
+        "mail.example.com": ["Amass"]
+    }
+
+
+def test_legacy_inline_results_are_migrated(temp_db):
+    """Test that rows holding the old JSON blob are moved into findings"""
+    import db
+    import storage
+    
+    results = {"subdomains": ["a.example.com"], "emails": [], "ips": ["1.1.1.1"], "social_profiles": [], "errors": []}
+    conn = sqlite3.connect(temp_db)
+    conn.execute(
+        "INSERT INTO scans (scan_id, domain, start_time, end_time, results, status) VALUES (?, ?, ?, ?, ?, ?)",
+        ("legacy-scan", "example.com", "2024-01-01T00:00:00", "2024-01-01T00:01:00", json.dumps(results), "completed")
+    )
+    conn.commit()
+    conn.close()
+    
+    # Reconnecting no longer scans the table; the row reads as it is until migrated
+    db.close_all()
+    storage.init_db()
+    assert get_scan_by_id("legacy-scan")["results"] == results
+    assert recompress_legacy_results() == 0
+    
+    assert migrate_inline_findings(batch_size=1) == 1
+    assert migrate_inline_findings() == 0
+    assert count_findings("legacy-scan")["ips"] == 1
+    assert get_scan_by_id("legacy-scan")["results"] == results
+    assert find_asset_sightings("ips", "1.1.1.1")["domains"] == ["example.com"]
+
+
+def test_list_scans_paginates_with_counts(temp_db):
+    """Test keyset pagination, filters and the counts-only projection"""
+    for i in range(5):
+        scan_id = f"page-scan-{i}"
+        store_scan(scan_id, "example.com" if i % 2 == 0 else "test.com", datetime(2024, 1, 1, 0, i))
+        update_scan_results(scan_id, {"subdomains": [f"s{n}.example.com" for n in range(i)], "errors": []}, datetime.now())
+    
+    first_page, cursor = list_scans(limit=2)
+    assert [scan["scan_id"] for scan in first_page] == ["page-scan-4", "page-scan-3"]
+    assert first_page[0]["counts"]["subdomains"] == 4
+    assert "results" not in first_page[0]
+    assert cursor is not None
+    
+    second_page, cursor = list_scans(limit=2, cursor=cursor)
+    assert [scan["scan_id"] for scan in second_page] == ["page-scan-2", "page-scan-1"]
+    
+    last_page, cursor = list_scans(limit=2, cursor=cursor)
+    assert [scan["scan_id"] for scan in last_page] == ["page-scan-0"]
+    assert cursor is None
+    
+    filtered, _ = list_scans(domain="test.com", status="completed")
+    assert [scan["scan_id"] for scan in filtered] == ["page-scan-3", "page-scan-1"]
+
+
+def test_list_scans_rejects_bad_cursor(temp_db):
+    """Test that a malformed cursor raises ValueError"""
+    with pytest.raises(ValueError):
+        list_scans(cursor="not-a-cursor")
+
+
+def test_results_are_stored_compressed(temp_db):
+    """Test that the results column holds a marked, compressed BLOB"""
+    store_scan("compressed-scan", "example.com", datetime.now())
+    update_scan_results("compressed-scan", {"subdomains": [], "errors": ["x" * 5000]}, datetime.now())
+    
+    conn = sqlite3.connect(temp_db)
+    stored = conn.execute("SELECT results FROM scans WHERE scan_id = 'compressed-scan'").fetchone()[0]
+    conn.close()
+    assert isinstance(stored, bytes)
+    assert stored[:1] == b"\x01"
+    assert len(stored) < 500
+    
+    assert get_scan_by_id("compressed-scan")["results"]["errors"] == ["x" * 5000]
+
+
+def test_recompress_legacy_results(temp_db):
+    """Test that plain JSON rows stay readable and get re-encoded"""
+    conn = sqlite3.connect(temp_db)
+    for i in range(3):
+        conn.execute(
+            "INSERT INTO scans (scan_id, domain, start_time, results, status) VALUES (?, ?, ?, ?, ?)",
+            (f"text-scan-{i}", "example.com", "2024-01-01T00:00:00", json.dumps({"errors": [f"e{i}"]}), "completed")
+        )
+    conn.commit()
+    
+    assert get_scan_by_id("text-scan-1")["results"] == {"errors": ["e1"]}
+    assert recompress_legacy_results(batch_size=2) == 3
+    assert recompress_legacy_results() == 0
+    
+    kinds = conn.execute("SELECT DISTINCT typeof(results) FROM scans").fetchall()
+    conn.close()
+    assert kinds == [("blob",)]
+    assert get_scan_by_id("text-scan-1")["results"] == {"errors": ["e1"]}
+
+
+def test_asset_index_tracks_shared_assets(temp_db):
+    """Test the cross-scan index of which scans and domains saw an asset"""
+    scans = [
+        ("idx-1", "example.com", {"ips": ["192.0.2.1"], "emails": ["ops@corp.test"]}),
+        ("idx-2", "example.org", {"ips": ["192.0.2.1", "192.0.2.2"]}),
+        ("idx-3", "other.net", {"ips": ["198.51.100.7"], "emails": ["ops@corp.test"]}),
+    ]
+    for scan_id, domain, results in scans:
+        store_scan(scan_id, domain, datetime.now())
+        update_scan_results(scan_id, results, datetime.now())
+    
+    sightings = find_asset_sightings("ips", "192.0.2.1")
+    assert sorted(sighting["scan_id"] for sighting in sightings["scans"]) == ["idx-1", "idx-2"]
+    assert sorted(sightings["domains"]) == ["example.com", "example.org"]
+    assert find_asset_sightings("ips", "203.0.113.1")["scans"] == []
+    
+    # Lookups match however the value is spelled
+    sightings = find_asset_sightings("emails", "ops@CORP.Test.")
+    assert sightings["value"] == "ops@corp.test"
+    assert sorted(sighting["scan_id"] for sighting in sightings["scans"]) == ["idx-1", "idx-3"]
+    
+    related = find_related_domains("example.com")
+    assert related == [
+        {"domain": "example.org", "shared": {"ips": 1}},
+        {"domain": "other.net", "shared": {"emails": 1}}
+    ]
+    
+    # Re-storing a scan replaces its sightings instead of adding to them
+    update_scan_results("idx-2", {"ips": ["192.0.2.2"]}, datetime.now())
+    assert [s["scan_id"] for s in find_asset_sightings("ips", "192.0.2.1")["scans"]] == ["idx-1"]
+
+
+def test_repeat_scans_are_stored_as_deltas(temp_db, monkeypatch):
+    """Test delta storage, periodic snapshots and reconstruction"""
+    import storage
+    monkeypatch.setattr(storage, "SNAPSHOT_INTERVAL", 3)
+    
+    base = [f"host{i}.example.com" for i in range(50)]
+    runs = [
+        base,
+        base[1:] + ["new1.example.com"],
+        base[2:] + ["new1.example.com", "new2.example.com"],
+        base[2:] + ["new1.example.com"],
+    ]
+    for day, subdomains in enumerate(runs):
+        scan_id = f"day-{day}"
+        store_scan(scan_id, "example.com", datetime(2024, 1, 1 + day))
+        update_scan_results(scan_id, {"subdomains": subdomains, "errors": []}, datetime(2024, 1, 1 + day, 1))
+    
+    conn = sqlite3.connect(temp_db)
+    chain = dict(conn.execute("SELECT scan_id, chain_length FROM scans"))
+    rows = dict(conn.execute("SELECT scan_id, COUNT(*) FROM findings GROUP BY scan_id"))
+    conn.close()
+    assert chain == {"day-0": 0, "day-1": 1, "day-2": 2, "day-3": 0}
+    assert rows["day-1"] == 2  # one added, one removed
+    assert rows["day-2"] == 2
+    assert rows["day-3"] == 49  # snapshot after SNAPSHOT_INTERVAL
+    
+    for day, subdomains in enumerate(runs):
+        assert get_scan_by_id(f"day-{day}")["results"]["subdomains"] == subdomains
+        assert count_findings(f"day-{day}")["subdomains"] == len(subdomains)
+    
+    diff = get_scan_diff("day-2")
+    assert diff["previous_scan_id"] == "day-1"
+    assert diff["added"]["subdomains"] == ["new2.example.com"]
+    assert diff["removed"]["subdomains"] == ["host1.example.com"]
+    assert get_scan_diff("day-0")["added"]["subdomains"] == base
+    assert get_scan_diff("missing") is None
+
+
+def test_rewriting_a_base_scan_keeps_dependents_intact(temp_db):
+    """Test that deltas built on a scan survive that scan being rewritten"""
+    subdomains = [f"host{i}.example.com" for i in range(10)]
+    store_scan("base", "example.com", datetime(2024, 1, 1))
+    update_scan_results("base", {"subdomains": subdomains}, datetime(2024, 1, 1, 1))
+    store_scan("next", "example.com", datetime(2024, 1, 2))
+    update_scan_results("next", {"subdomains": subdomains[1:]}, datetime(2024, 1, 2, 1))
+    
+    update_scan_results("base", {"subdomains": ["other.example.com"]}, datetime(2024, 1, 1, 2))
+    
+    assert get_scan_by_id("next")["results"]["subdomains"] == subdomains[1:]
+    assert get_scan_by_id("base")["results"]["subdomains"] == ["other.example.com"]
+
+
+def test_deltas_are_taken_against_the_previous_scan(temp_db):
+    """Test that a scan finishing late is not encoded against a newer one, nor a partial publish at all"""
+    subdomains = [f"host{i}.example.com" for i in range(10)]
+    store_scan("older", "example.com", datetime(2024, 1, 1))
+    update_scan_results("older", {"subdomains": subdomains}, datetime(2024, 1, 1, 1))
+    store_scan("late", "example.com", datetime(2024, 1, 2))
+    store_scan("newer", "example.com", datetime(2024, 1, 3))
+    update_scan_results("newer", {"subdomains": subdomains[2:]}, datetime(2024, 1, 3, 1))
+    
+    # Published while running: plain rows, no base
+    update_scan_results("late", {"subdomains": subdomains[:5]}, None, status=None)
+    conn = sqlite3.connect(temp_db)
+    assert conn.execute("SELECT base_scan_id FROM scans WHERE scan_id = 'late'").fetchone() == (None,)
+    
+    update_scan_results("late", {"subdomains": subdomains[1:]}, datetime(2024, 1, 4))
+    bases = dict(conn.execute("SELECT scan_id, base_scan_id FROM scans"))
+    conn.close()
+    assert bases == {"older": None, "late": "older", "newer": "older"}
+    assert get_scan_by_id("late")["results"]["subdomains"] == subdomains[1:]
+
+
+def test_requests_share_a_scan_in_flight(temp_db):
+    """Test that a second request for a queued domain joins its scan"""
+    now = datetime.now()
+    first = request_scan("scan-1", "example.com", now, priority="bulk", submitter="script")
+    assert first == {"scan_id": "scan-1", "status": "queued", "coalesced": None}
+    
+    second = request_scan("scan-2", "example.com", now, submitter="alice")
+    assert second == {"scan_id": "scan-1", "status": "queued", "coalesced": "in_flight"}
+    assert get_scan_by_id("scan-2") is None
+    # The interactive request lifts the shared job out of the bulk class
+    assert scan_queue().get_job("scan-1")["priority"] == "interactive"
+    
+    assert request_scan("scan-3", "other.com", now)["coalesced"] is None
+    assert request_scan("scan-4", "example.com", now, force=True)["scan_id"] == "scan-4"
+
+
+def test_fresh_results_are_reused(temp_db):
+    """Test that a recently completed scan answers new requests within max_age"""
+    start = datetime.now() - timedelta(minutes=30)
+    store_scan("old", "example.com", start - timedelta(days=1))
+    update_scan_results("old", {"subdomains": ["a.example.com"]}, start - timedelta(days=1))
+    store_scan("recent", "example.com", start)
+    update_scan_results("recent", {"subdomains": ["a.example.com"]}, start)
+    store_scan("broken", "example.com", start)
+    update_scan_results("broken", {"error": "tool crashed"}, start)
+    
+    now = datetime.now()
+    assert request_scan("new-1", "example.com", now) == {
+        "scan_id": "recent", "status": "completed", "coalesced": "fresh"
+    }
+    assert request_scan("new-2", "example.com", now, max_age=60)["scan_id"] == "new-2"
+
+
+def test_batch_is_queued_with_shared_scans(temp_db):
+    """Test that a batch queues its domains as bulk jobs and reuses scans in flight"""
+    now = datetime.now()
+    request_scan("existing", "b.example.com", now, submitter="alice")
+    outcomes = enqueue_batch("batch-1", [("scan-a", "a.example.com"), ("scan-b", "b.example.com"),
+                                         ("scan-c", "c.example.com")], now, submitter="script")
+    
+    assert [outcome["scan_id"] for outcome in outcomes] == ["scan-a", "existing", "scan-c"]
+    assert outcomes[1] == {"domain": "b.example.com", "scan_id": "existing", "status": "queued", "coalesced": "in_flight"}
+    assert scan_queue().get_job("scan-a")["priority"] == "bulk"
+    # Joining a bulk batch does not demote an interactive scan
+    assert scan_queue().get_job("existing")["priority"] == "interactive"
+    
+    cancel_scan("scan-c")
+    batch = get_batch("batch-1")
+    assert batch["total"] == 3
+    assert batch["scans"] == {"queued": 2, "cancelled": 1}
+    assert batch["finished"] == 1
+    assert not batch["done"]
+    assert get_batch("missing") is None
@@ -0,0 +1,151 @@
+import pytest
+import os
+import sys
+import time
+import tracemalloc
+
+from tool_runner import stream_lines, parse_amass_line, TheHarvesterParser, ToolError
+from workers import TheHarvesterStrategy, AmassStrategy, run_tool
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+FAKE_TOOL = os.path.join(FIXTURES, "fake_tool.py")
+
+def fake_tool(output, *options):
+    return f"{sys.executable} {FAKE_TOOL} {os.path.join(FIXTURES, output)} " + " ".join(options)
+
+@pytest.fixture
+def real_tools(monkeypatch):
+    """Run the real tool runners (against fake tool scripts)"""
+    monkeypatch.setenv("SIMULATE_TOOLS", "0")
+
+def test_theharvester_parser_sections():
+    """Test that only the IPs, Emails and Hosts sections produce findings"""
+    parser = TheHarvesterParser("example.com")
+    findings = []
+    with open(os.path.join(FIXTURES, "theharvester_output.txt")) as f:
+        for line in f:
+            findings.extend(parser.feed(line))
+
+    assert [v for k, v in findings if k == "emails"] == ["admin@example.com", "support@example.com"]
+    assert [v for k, v in findings if k == "subdomains"] == ["mail.example.com", "www.example.com", "dev.example.com"]
+    assert "2606:2800:220:1:248:1893:25c8:1946" in [v for k, v in findings if k == "ips"]
+    assert "93.184.216.36" in [v for k, v in findings if k == "ips"]
+    assert not any("AS15133" in v or "login" in v for _, v in findings)
+    # Lines are checked for findings, not taken whole
+    parser.feed("[*] IPs found: 1")
+    assert parser.feed("no address here") == []
+
+def test_parse_amass_line():
+    """Test JSON and plain Amass lines, ignoring other domains and junk"""
+    assert parse_amass_line('{"name":"WWW.example.com.","addresses":[{"ip":"192.0.2.1"}]}', "example.com") == [
+        ("subdomains", "www.example.com"), ("ips", "192.0.2.1")
+    ]
+    assert parse_amass_line("blog.example.com", "example.com") == [("subdomains", "blog.example.com")]
+    assert parse_amass_line("cdn.othersite.net", "example.com") == []
+    assert parse_amass_line("{broken", "example.com") == []
+
+@pytest.mark.asyncio
+async def test_theharvester_strategy_runs_tool(real_tools, monkeypatch):
+    """Test TheHarvesterStrategy parses the real tool's output"""
+    monkeypatch.setenv("THEHARVESTER_CMD", fake_tool("theharvester_output.txt"))
+    result = await TheHarvesterStrategy("test-scan-1", "example.com").execute()
+
+    assert result["subdomains"] == ["mail.example.com", "www.example.com", "dev.example.com"]
+    assert result["emails"] == ["admin@example.com", "support@example.com"]
+    assert "93.184.216.35" in result["ips"]
+
+@pytest.mark.asyncio
+async def test_amass_strategy_runs_tool(real_tools, monkeypatch):
+    """Test AmassStrategy parses -json lines from the real tool"""
+    monkeypatch.setenv("AMASS_CMD", fake_tool("amass_output.jsonl"))
+    result = await AmassStrategy("test-scan-1", "example.com").execute()
+
+    assert result["subdomains"] == ["www.example.com", "api.example.com", "blog.example.com"]
+    assert result["ips"] == ["93.184.216.34", "93.184.216.40", "2606:2800:220:1::40"]
+
+@pytest.mark.asyncio
+async def test_findings_arrive_while_tool_runs(real_tools, monkeypatch):
+    """Test that findings are reported as lines are printed, not at exit"""
+    monkeypatch.setenv("AMASS_CMD", fake_tool("amass_output.jsonl", "--delay 0.2"))
+    arrivals = []
+    strategy = AmassStrategy("test-scan-1", "example.com",
+                             on_findings=lambda tool, kind, values: arrivals.append((time.monotonic(), kind, values)))
+
+    await strategy.execute()
+    finished = time.monotonic()
+
+    assert arrivals[0][1:] == ("subdomains", ["www.example.com"])
+    # The first finding came in about a second before the tool exited
+    assert finished - arrivals[0][0] > 0.6
+
+@pytest.mark.asyncio
+async def test_tool_failure_is_reported(real_tools, monkeypatch):
+    """Test that a non-zero exit becomes an error with the tool's stderr"""
+    monkeypatch.setenv("AMASS_CMD", fake_tool("amass_output.jsonl", "--exit-code 2", "--stderr", "rate-limited"))
+    result = await AmassStrategy("test-scan-1", "example.com").execute()
+    assert "status 2" in result["error"]
+    assert "rate-limited" in result["error"]
+
+    monkeypatch.setenv("AMASS_CMD", "/nonexistent/amass")
+    result = await AmassStrategy("test-scan-1", "example.com").execute()
+    assert "not installed" in result["error"]
+
+@pytest.mark.asyncio
+async def test_memory_stays_flat_for_huge_output():
+    """Test that megabytes of output are parsed without being buffered"""
+    cmd = [sys.executable, FAKE_TOOL, os.path.join(FIXTURES, "amass_output.jsonl"), "--repeat", "10000"]
+    tracemalloc.start()
+    try:
+        lines = 0
+        async for line in stream_lines(cmd):
+            parse_amass_line(line, "example.com")
+            lines += 1
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert lines == 5 * 10000
+    # ~6 MB went through the pipe
+    assert peak < 2 * 1024 * 1024
+
+@pytest.mark.asyncio
+async def test_overlong_lines_are_skipped_whole(monkeypatch):
+    """Test that a line over the limit is dropped up to its newline, not yielded in pieces"""
+    import tool_runner
+    monkeypatch.setattr(tool_runner, "MAX_LINE_BYTES", 1024)
+    script = (
+        "import sys, time\n"
+        "print('before', flush=True)\n"
+        "sys.stdout.write('x' * 3000); sys.stdout.flush(); time.sleep(0.2)\n"
+        "print('tail of the long line')\n"
+        "print('y' * 3000)\n"
+        "print('after')\n"
+        "sys.stdout.write('z' * 5000)\n"
+    )
+    lines = [line async for line in stream_lines([sys.executable, "-c", script])]
+    assert lines == ["before", "after"]
+
+@pytest.mark.asyncio
+async def test_stopping_early_kills_the_tool():
+    """Test that abandoning the stream does not leave the tool running"""
+    cmd = [sys.executable, FAKE_TOOL, os.path.join(FIXTURES, "amass_output.jsonl"), "--delay", "1", "--repeat", "100"]
+    stream = stream_lines(cmd)
+    started = time.monotonic()
+    assert await stream.__anext__()
+    await stream.aclose()
+    assert time.monotonic() - started < 3
+
+    with pytest.raises(ToolError):
+        async for _ in stream_lines([sys.executable, "-c", "import sys; sys.exit(1)"]):
+            pass
+
+@pytest.mark.asyncio
+async def test_timed_out_tool_keeps_partial_findings(real_tools, monkeypatch):
+    """Test that a tool past its timeout is stopped with what it printed so far"""
+    monkeypatch.setenv("AMASS_CMD", fake_tool("amass_output.jsonl", "--delay 0.3", "--repeat 100"))
+    started = time.monotonic()
+    result = await run_tool(AmassStrategy("test-scan-1", "example.com"), timeout=1)
+
+    assert time.monotonic() - started < 2
+    assert result["subdomains"][0] == "www.example.com"
+    assert result["error"] == "Amass timed out after 1 seconds"
@@ -0,0 +1,98 @@
+import pytest
+import asyncio
+from contextlib import ExitStack
+
+from whois_client import WhoisClient, WhoisCache, registrable_domain, parse_response
+from whois_stub import StubWhoisServer
+
+IANA = {"com": "domain: COM\r\nrefer: whois.registry.test\r\n"}
+REGISTRY = {
+    "example.com": (
+        "   Domain Name: EXAMPLE.COM\r\n"
+        "   Registrar: Example Registrar, Inc.\r\n"
+        "   Registrar WHOIS Server: whois.registrar.test\r\n"
+        "   Name Server: A.IANA-SERVERS.NET\r\n"
+        "   Name Server: B.IANA-SERVERS.NET\r\n"
+        "   Registrar Abuse Contact Email: abuse@registrar.test\r\n"
+    ),
+    "other.com": "   Domain Name: OTHER.COM\r\n   Registrar: Example Registrar, Inc.\r\n",
+}
+REGISTRAR = {
+    "example.com": (
+        "% Terms of use: do not abuse this service\r\n"
+        "Domain Name: example.com\r\n"
+        "Registrant Email: hostmaster@example.com\r\n"
+        "Admin Email: hostmaster@example.com\r\n"
+    ),
+}
+
+@pytest.fixture
+def whois_servers():
+    with ExitStack() as stack:
+        yield {
+            name: stack.enter_context(StubWhoisServer(responses))
+            for name, responses in (("whois.iana.org", IANA), ("whois.registry.test", REGISTRY),
+                                    ("whois.registrar.test", REGISTRAR))
+        }
+
+def make_client(servers, **kwargs):
+    kwargs.setdefault("server_interval", 0)
+    kwargs.setdefault("cache", WhoisCache())
+    return WhoisClient(server_addresses={name: server.address for name, server in servers.items()}, **kwargs)
+
+def test_registrable_domain():
+    """Test that subdomains map to the domain they are registered under"""
+    assert registrable_domain("mail.dev.Example.com.") == "example.com"
+    assert registrable_domain("www.example.co.uk") == "example.co.uk"
+    assert registrable_domain("bücher.de") == "xn--bcher-kva.de"
+
+def test_parse_response():
+    """Test that fields are collected and comments skipped"""
+    fields = parse_response("% comment: no\r\nName Server: A.TEST\r\nName Server: B.TEST\r\nEmpty:\r\n")
+    assert fields == {"name server": ["A.TEST", "B.TEST"]}
+
+@pytest.mark.asyncio
+async def test_lookup_follows_referrals(whois_servers):
+    """Test the root, registry and registrar chain and the merged record"""
+    client = make_client(whois_servers)
+    record = await client.lookup("mail.example.com")
+
+    assert record["domain"] == "example.com"
+    assert record["servers"] == ["whois.iana.org", "whois.registry.test", "whois.registrar.test"]
+    assert record["registrar"] == "Example Registrar, Inc."
+    assert record["name_servers"] == ["a.iana-servers.net", "b.iana-servers.net"]
+    assert record["emails"] == ["abuse@registrar.test", "hostmaster@example.com"]
+    assert [query for query, _ in whois_servers["whois.iana.org"].queries] == ["com"]
+
+@pytest.mark.asyncio
+async def test_lookups_are_cached_per_registrable_domain(whois_servers):
+    """Test that subdomains, repeat and concurrent lookups share one query chain"""
+    client = make_client(whois_servers)
+    records = await asyncio.gather(*[client.lookup(f"host{i}.example.com") for i in range(5)])
+    assert all(record is records[0] for record in records)
+    await client.lookup("www.example.com")
+    assert client.queries == 3
+
+    # The TLD's registry is remembered for other domains
+    await client.lookup("other.com")
+    assert client.queries == 4
+    assert len(whois_servers["whois.iana.org"].queries) == 1
+
+@pytest.mark.asyncio
+async def test_queries_to_a_server_are_spaced(whois_servers):
+    """Test the per-server rate limit"""
+    client = make_client(whois_servers, server_interval=0.2)
+    await asyncio.gather(client.lookup("example.com"), client.lookup("other.com"))
+
+    times = [at for _, at in whois_servers["whois.registry.test"].queries]
+    assert len(times) == 2
+    assert times[1] - times[0] >= 0.15
+
+@pytest.mark.asyncio
+async def test_unreachable_server_fails_the_lookup(whois_servers):
+    """Test that a lookup that gets no answer raises and is not cached"""
+    whois_servers["whois.registry.test"].stop()
+    client = make_client(whois_servers, timeout=1)
+    with pytest.raises((OSError, asyncio.TimeoutError)):
+        await client.lookup("example.com")
+    assert client.cache.stats()["entries"] == 0
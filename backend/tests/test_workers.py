@@ -1,12 +1,36 @@
 import pytest
 import asyncio
+from datetime import datetime
+import workers
 from workers import (
     TheHarvesterStrategy, 
     AmassStrategy, 
+    ToolStrategy,
     run_tools_async,
     merge_results
 )
 
+class StuckTool(ToolStrategy):
+    """Finds one subdomain, then hangs"""
+    name = "StuckTool"
+
+    async def execute(self):
+        self.add_findings([("subdomains", f"stuck.{self.domain}")])
+        await asyncio.sleep(60)
+
+class QuickTool(ToolStrategy):
+    name = "QuickTool"
+
+    async def execute(self):
+        return {"subdomains": [f"quick.{self.domain}"]}
+
+@pytest.fixture
+def stuck_scan(temp_db, monkeypatch):
+    """Make scans run one quick and one hanging tool"""
+    monkeypatch.setattr(workers.ScanToolsFactory, "create_tools", staticmethod(
+        lambda scan_id, domain, on_findings=None: [QuickTool(scan_id, domain), StuckTool(scan_id, domain)]
+    ))
+
 @pytest.mark.asyncio
 async def test_the_harvester_strategy():
     """Test TheHarvesterStrategy executes and returns data"""
@@ -61,4 +85,54 @@ async def test_merge_results():
     assert len(merged["subdomains"]) == 3  # Duplicates removed
     assert "sub1.example.com" in merged["subdomains"]
     assert "sub2.example.com" in merged["subdomains"]
-    assert "sub3.example.com" in merged["subdomains"] 
\ No newline at end of file
+    assert "sub3.example.com" in merged["subdomains"] 
+
+@pytest.mark.asyncio
+async def test_scan_deadline_keeps_finished_results(stuck_scan):
+    """Test that a scan past its deadline completes with partial results"""
+    tool_results = {}
+    merged = await run_tools_async("test-scan-1", "example.com", tool_results, timeout=0.5)
+
+    assert sorted(merged["subdomains"]) == ["quick.example.com", "stuck.example.com"]
+    assert merged["errors"] == ["StuckTool was stopped: the scan timed out after 0.5 seconds"]
+    assert tool_results["StuckTool"]["subdomains"] == ["stuck.example.com"]
+
+@pytest.mark.asyncio
+async def test_cancelling_a_scan_stops_its_tools(stuck_scan):
+    """Test that setting the cancel event stops the tools and stores a cancelled scan"""
+    workers.storage.store_scan("test-scan-1", "example.com", datetime.now())
+    cancelled = asyncio.Event()
+    asyncio.get_running_loop().call_later(0.3, cancelled.set)
+
+    await asyncio.wait_for(
+        workers.run_scan("test-scan-1", "example.com", datetime.now(), cancelled=cancelled), 5
+    )
+
+    scan = workers.storage.get_scan_by_id("test-scan-1")
+    assert scan["status"] == "cancelled"
+    assert "stuck.example.com" in scan["results"]["subdomains"]
+    assert scan["results"]["errors"] == ["StuckTool was stopped: the scan was cancelled"]
+
+@pytest.mark.asyncio
+async def test_finished_tools_are_published_while_the_scan_runs(stuck_scan):
+    """Test that a scan shows each tool's state and the findings of those done"""
+    workers.storage.store_scan("test-scan-1", "example.com", datetime.now())
+    cancelled = asyncio.Event()
+    scan = asyncio.create_task(workers.run_scan("test-scan-1", "example.com", datetime.now(), cancelled=cancelled))
+
+    for _ in range(50):
+        partial = workers.storage.get_scan_by_id("test-scan-1")
+        if partial["results"] and partial["tools"]["StuckTool"]["state"] != "queued":
+            break
+        await asyncio.sleep(0.1)
+    assert partial["status"] == "running"
+    assert partial["results"]["subdomains"] == ["quick.example.com"]
+    assert partial["tools"]["QuickTool"]["state"] == "completed"
+    assert partial["tools"]["StuckTool"]["state"] == "running"
+    assert partial["tools"]["StuckTool"]["started_at"] is not None
+
+    cancelled.set()
+    await asyncio.wait_for(scan, 5)
+    final = workers.storage.get_scan_by_id("test-scan-1")
+    assert final["tools"]["StuckTool"]["state"] == "stopped"
+    assert final["tools"]["StuckTool"]["error"] == "StuckTool was stopped: the scan was cancelled"
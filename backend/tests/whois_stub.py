@@ -0,0 +1,47 @@
+"""A tiny WHOIS server on 127.0.0.1 for tests.
+
+responses maps a query (lowercase) to the text to answer it with; other
+queries get "No match". Every query is recorded in queries with the time it
+arrived, and answered after delay seconds from its own thread.
+"""
+import socketserver
+import threading
+import time
+
+
+class StubWhoisServer:
+    def __init__(self, responses, delay=0.0):
+        self.responses = {query.lower(): text for query, text in responses.items()}
+        self.delay = delay
+        self.queries = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                query = self.rfile.readline().decode().strip().lower()
+                with stub._lock:
+                    stub.queries.append((query, time.monotonic()))
+                if stub.delay:
+                    time.sleep(stub.delay)
+                text = stub.responses.get(query, f'No match for "{query.upper()}".\r\n')
+                self.wfile.write(text.encode())
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.address = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,169 @@
+# tool_runner.py
+import asyncio
+import json
+import os
+import re
+import signal
+from collections import deque
+
+from extract import extract
+
+# Longest stdout line we accept from a tool; longer lines are skipped
+MAX_LINE_BYTES = 1024 * 1024
+
+# Lines of stderr kept for the error message of a failed run
+STDERR_TAIL_LINES = 20
+
+
+class ToolError(Exception):
+    """An external tool could not be started or exited unsuccessfully."""
+
+
+async def stream_lines(cmd):
+    """Run cmd and yield its stdout lines as they are printed.
+
+    Nothing but the current line is held in memory, however much the tool
+    prints. stderr is drained alongside (keeping only its tail), so a chatty
+    tool cannot block on a full pipe. Raises ToolError if the tool cannot be
+    started or exits with a non-zero status. If the caller stops iterating
+    early or is cancelled (e.g. on a timeout), the tool is killed along with
+    any processes it started.
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=MAX_LINE_BYTES,
+            start_new_session=True
+        )
+    except FileNotFoundError:
+        raise ToolError(f"{cmd[0]} is not installed")
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    async def drain_stderr():
+        async for line in process.stderr:
+            stderr_tail.append(line.decode(errors='replace').rstrip())
+
+    stderr_task = asyncio.create_task(drain_stderr())
+    try:
+        while True:
+            try:
+                line = await process.stdout.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                # Output ended; a last line may lack its newline
+                line = e.partial
+            except asyncio.LimitOverrunError as e:
+                # Line longer than MAX_LINE_BYTES: skip it whole, however it arrives
+                await _skip_line(process.stdout, e.consumed)
+                continue
+            if not line:
+                break
+            yield line.decode(errors='replace').rstrip('\r\n')
+
+        returncode = await process.wait()
+        await stderr_task
+        if returncode != 0:
+            detail = "; ".join(line for line in stderr_tail if line)
+            raise ToolError(f"{cmd[0]} exited with status {returncode}" + (f": {detail}" if detail else ""))
+    finally:
+        if process.returncode is None:
+            _kill_process_group(process)
+            await process.wait()
+        stderr_task.cancel()
+
+
+async def _skip_line(stream, consumed):
+    """Discard the rest of the current line, up to and including its newline."""
+    while True:
+        # The first `consumed` buffered bytes hold no newline
+        await stream.read(consumed)
+        try:
+            await stream.readuntil(b'\n')
+            return
+        except asyncio.IncompleteReadError:
+            return
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+
+
+def _kill_process_group(process):
+    """Kill a tool and its children (it leads a session of its own)."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def parse_amass_line(line, domain):
+    """Return (kind, value) findings from one line of Amass output.
+
+    Understands both `-json` lines ({"name": ..., "addresses": [{"ip": ...}]})
+    and the plain one-hostname-per-line output. Hostnames are taken with
+    extract.extract, which also limits them to domain.
+    """
+    line = line.strip()
+    if not line:
+        return []
+
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return []
+        findings = [('subdomains', name) for name in extract(str(record.get('name', '')), domain)['subdomains']]
+        for address in record.get('addresses') or []:
+            if isinstance(address, dict) and address.get('ip'):
+                findings.append(('ips', address['ip']))
+        return findings
+
+    return [('subdomains', name) for name in extract(line.split()[0], domain)['subdomains']]
+
+
+class TheHarvesterParser:
+    """Incremental parser for theHarvester's console report.
+
+    theHarvester prints its findings in sections:
+
+        [*] IPs found: 2
+        -------------------
+        192.0.2.1
+        ...
+        [*] Emails found: 1
+        ----------------------
+        admin@example.com
+        ...
+        [*] Hosts found: 3
+        ---------------------
+        mail.example.com:192.0.2.1
+
+    feed() takes one line at a time and returns the findings it contains,
+    so a report of any length is parsed as it streams in. The findings in a
+    line are taken with extract.extract; a section only yields its kinds.
+    """
+
+    HEADER = re.compile(r'^\[\*\]\s*(.*?)\s*(?:found)?\s*:\s*\d*\s*$', re.IGNORECASE)
+    SECTIONS = {
+        'ips': ('ips',),
+        'emails': ('emails',),
+        # host, or host:ip[, ip...]
+        'hosts': ('subdomains', 'ips'),
+    }
+
+    def __init__(self, domain):
+        self.domain = domain.lower()
+        self.section = None
+
+    def feed(self, line):
+        line = line.strip()
+        if line.startswith('[*]'):
+            match = self.HEADER.match(line)
+            title = match.group(1).lower() if match else ''
+            self.section = self.SECTIONS.get(title)
+            return []
+        if not line or self.section is None or set(line) <= set('-='):
+            return []
+
+        found = extract(line, self.domain)
+        return [(kind, value) for kind in self.section for value in found[kind]]
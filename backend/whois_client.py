@@ -0,0 +1,279 @@
+# whois_client.py
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from extract import extract
+
+# Where every lookup starts: IANA knows the WHOIS server of each TLD
+ROOT_SERVER = 'whois.iana.org'
+WHOIS_PORT = 43
+
+# Referrals followed after the root (TLD registry, then registrar)
+MAX_REFERRALS = 3
+
+# Seconds allowed for one query, connection included
+DEFAULT_TIMEOUT = 10.0
+
+# Responses are cut off after this many bytes
+MAX_RESPONSE_BYTES = 256 * 1024
+
+# How long a parsed record is cached for its registrable domain (seconds)
+DEFAULT_CACHE_TTL = 24 * 3600
+
+# Registrable domains kept in the cache; the least recently used go first
+DEFAULT_CACHE_ENTRIES = 10000
+
+# Minimum seconds between two queries to the same server. WHOIS servers
+# throttle or ban clients that query too fast.
+DEFAULT_SERVER_INTERVAL = 1.0
+
+# Second-level labels under which registrations are made one level down
+# (example.co.uk). Not the whole Public Suffix List, but the common cases.
+SECOND_LEVEL_SUFFIXES = {
+    'ac', 'co', 'com', 'edu', 'gob', 'gov', 'govt', 'ltd', 'mil', 'net', 'nic', 'nom', 'or', 'org', 'plc', 'sch'
+}
+
+# Fields that point to the next server to ask
+_REFERRAL_FIELDS = ('refer', 'whois', 'registrar whois server', 'referralserver')
+
+_FIELD = re.compile(r'^\s*([A-Za-z][\w /().-]{0,60}?)\s*:\s*(.*?)\s*$')
+
+
+def registrable_domain(hostname):
+    """Return the registered domain of hostname ("mail.example.co.uk" gives "example.co.uk").
+
+    Internationalized names come back in their ASCII (punycode) form, which
+    is what WHOIS servers are queried with.
+    """
+    hostname = hostname.lower().rstrip('.')
+    if not hostname.isascii():
+        hostname = hostname.encode('idna').decode('ascii')
+    labels = hostname.split('.')
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def parse_response(text):
+    """Return the "key: value" fields of a WHOIS response as {key: [values]}.
+
+    Keys are lowercased; comment lines (% and #) and empty values are skipped.
+    """
+    fields = {}
+    for line in text.splitlines():
+        if line.startswith(('%', '#')):
+            continue
+        match = _FIELD.match(line)
+        if match and match.group(2):
+            fields.setdefault(match.group(1).lower(), []).append(match.group(2))
+    return fields
+
+
+def _referral(fields, current):
+    for key in _REFERRAL_FIELDS:
+        for value in fields.get(key, ()):
+            server = value.lower()
+            if '://' in server:
+                server = server.split('://', 1)[1]
+            server = server.split('/', 1)[0].split(':', 1)[0].rstrip('.')
+            if server and server != current:
+                return server
+    return None
+
+
+class WhoisCache:
+    """TTL-aware LRU cache of parsed WHOIS records, keyed by registrable domain."""
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL, max_entries=DEFAULT_CACHE_ENTRIES, clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, domain):
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is not None and entry[1] > self._clock():
+                self._entries.move_to_end(domain)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[domain]
+            self.misses += 1
+            return None
+
+    def put(self, domain, record):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[domain] = (record, self._clock() + self.ttl)
+            self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+class WhoisClient:
+    """Asynchronous WHOIS lookups over TCP port 43.
+
+    A lookup asks the root server (IANA) for the TLD's registry, then follows
+    referrals to the registry and the registrar's server, and returns the
+    fields of every response merged (the most specific server wins). Lookups
+    are made per registrable domain: subdomains share the record, which is
+    cached, and concurrent lookups of one domain share a single query chain.
+    Queries to any one server are spaced at least server_interval seconds
+    apart, across all lookups in the process.
+
+    server_addresses maps server names to (host, port) to connect to
+    instead (used by the tests to point at local stub servers).
+    """
+
+    def __init__(self, root_server=ROOT_SERVER, timeout=DEFAULT_TIMEOUT, server_interval=DEFAULT_SERVER_INTERVAL,
+                 cache=None, server_addresses=None, clock=time.monotonic):
+        self.root_server = root_server
+        self.timeout = timeout
+        self.server_interval = server_interval
+        self.cache = cache if cache is not None else WhoisCache()
+        self.server_addresses = server_addresses or {}
+        self._clock = clock
+        self._next_query = {}
+        self._schedule_lock = threading.Lock()
+        self._tld_servers = {}
+        self._in_flight = {}
+        self.queries = 0
+
+    async def lookup(self, hostname):
+        """Return the WHOIS record of hostname's registrable domain.
+
+        The record is {'domain', 'servers', 'fields', 'emails', 'registrar',
+        'name_servers'}, with the servers asked in order. Raises OSError or
+        asyncio.TimeoutError if neither the root nor the registry could be
+        reached; failed lookups are not cached.
+        """
+        domain = registrable_domain(hostname)
+        record = self.cache.get(domain)
+        if record is not None:
+            return record
+
+        loop = asyncio.get_running_loop()
+        future = self._in_flight.get(domain)
+        if future is None or future.get_loop() is not loop:
+            future = loop.create_task(self._lookup(domain))
+            self._in_flight[domain] = future
+            future.add_done_callback(lambda done: self._forget(domain, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, domain, future):
+        if self._in_flight.get(domain) is future:
+            del self._in_flight[domain]
+
+    async def _lookup(self, domain):
+        tld = domain.rsplit('.', 1)[-1]
+        servers = []
+        fields = {}
+        server = self._tld_servers.get(tld)
+        if server is None:
+            server = self.root_server
+            response = parse_response(await self.query(server, tld))
+            servers.append(server)
+            server = _referral(response, server)
+            if server is None:
+                raise OSError(f"No WHOIS server known for .{tld}")
+            self._tld_servers[tld] = server
+
+        for _ in range(MAX_REFERRALS):
+            try:
+                text = await self.query(server, domain)
+            except (OSError, asyncio.TimeoutError):
+                if not fields:
+                    raise
+                # The registry answered; the registrar's server is optional
+                break
+            servers.append(server)
+            response = parse_response(text)
+            for key, values in response.items():
+                fields[key] = values
+            server = _referral(response, server)
+            if server is None or server in servers:
+                break
+
+        record = {
+            'domain': domain,
+            'servers': servers,
+            'fields': fields,
+            'emails': extract('\n'.join(value for values in fields.values() for value in values))['emails'],
+            'registrar': (fields.get('registrar') or [None])[0],
+            'name_servers': sorted({value.lower().rstrip('.') for value in fields.get('name server', [])})
+        }
+        self.cache.put(domain, record)
+        return record
+
+    async def query(self, server, query):
+        """Send one query to server and return its whole response as text."""
+        await self._wait_turn(server)
+        host, port = self.server_addresses.get(server, (server, WHOIS_PORT))
+        self.queries += 1
+
+        async def exchange():
+            reader, writer = await asyncio.open_connection(host, port)
+            try:
+                writer.write(f"{query}\r\n".encode())
+                await writer.drain()
+                data = await reader.read(MAX_RESPONSE_BYTES)
+                chunks = [data]
+                size = len(data)
+                while data and size < MAX_RESPONSE_BYTES:
+                    data = await reader.read(MAX_RESPONSE_BYTES - size)
+                    chunks.append(data)
+                    size += len(data)
+                return b''.join(chunks)
+            finally:
+                writer.close()
+
+        data = await asyncio.wait_for(exchange(), self.timeout)
+        return data.decode('utf-8', errors='replace')
+
+    async def _wait_turn(self, server):
+        """Wait until server may be queried again, and claim that slot."""
+        with self._schedule_lock:
+            now = self._clock()
+            start = max(now, self._next_query.get(server, now))
+            self._next_query[server] = start + self.server_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_whois_client():
+    """Return the process-wide client, created on first use.
+
+    WHOIS_CACHE_TTL sets how long records are cached (seconds; 0 disables
+    the cache) and WHOIS_SERVER_INTERVAL the spacing of queries per server.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WhoisClient(
+                server_interval=float(os.getenv('WHOIS_SERVER_INTERVAL', DEFAULT_SERVER_INTERVAL)),
+                cache=WhoisCache(ttl=int(os.getenv('WHOIS_CACHE_TTL', DEFAULT_CACHE_TTL)))
+            )
+        return _client
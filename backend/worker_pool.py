@@ -0,0 +1,245 @@
+"""Worker pool that runs queued scans outside the API process.
+
+The API only stores a scan and queues its job (storage.enqueue_scan). This
+pool starts N worker processes; each runs one long-lived event loop that
+leases jobs from storage.scan_queue() and runs up to SCAN_WORKER_CONCURRENCY
+scans on it at a time, renewing the leases while they run. Jobs survive
+restarts: a job whose worker dies is leased again once its lease runs out,
+and a worker that is stopped hands its unfinished jobs straight back.
+
+Run from the backend directory:
+
+    python worker_pool.py [--workers 4] [--concurrency 8] [--db data/osint_scans.db]
+
+SCAN_WORKERS and SCAN_WORKER_CONCURRENCY set the defaults of --workers
+(one per CPU) and --concurrency.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+import storage
+from workers import run_job
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='{"timestamp": "%(asctime)s", "level": "%(levelname)s", "message": %(message)s}',
+    datefmt='%Y-%m-%dT%H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Scans one worker runs at once. Scans mostly wait on tools and the network,
+# so a single event loop keeps several busy.
+DEFAULT_CONCURRENCY = 8
+
+# Seconds an idle worker waits before looking for new jobs again
+POLL_INTERVAL = 1.0
+
+# Seconds between checks for crashed worker processes
+SUPERVISE_INTERVAL = 1.0
+
+
+class Worker:
+    """Claims jobs from a JobQueue and runs them on the current event loop.
+
+    run_job(job) is the coroutine that does the work. While it runs, the
+    job's lease is renewed every third of the lease time; if the lease is
+    lost (another worker took the job over), the run is cancelled.
+
+    job['cancel_requested'] is an asyncio.Event, set when the job is
+    cancelled through JobQueue.cancel. run_job should then wrap up what it
+    has and return; the job is completed as usual.
+    """
+
+    def __init__(self, queue, run_job, name=None, concurrency=DEFAULT_CONCURRENCY, poll_interval=POLL_INTERVAL):
+        self.queue = queue
+        self.run_job = run_job
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.jobs_done = 0
+        self._running = {}
+        self._cancel_requests = {}
+        self._stopping = None
+        self._slot_freed = None
+
+    async def run(self):
+        """Run jobs until stop() is called, then hand back the unfinished ones."""
+        self._stopping = asyncio.Event()
+        self._slot_freed = asyncio.Event()
+        logger.info(json.dumps({"event": "worker_started", "worker": self.name, "concurrency": self.concurrency}))
+        watcher = asyncio.create_task(self._watch_cancellations())
+
+        while not self._stopping.is_set():
+            if len(self._running) >= self.concurrency:
+                self._slot_freed.clear()
+                await self._wait(self._slot_freed)
+                continue
+            job = await asyncio.wrap_future(self.queue.submit_claim(self.name))
+            if job is None:
+                await self._wait(timeout=self.poll_interval)
+                continue
+            job['cancel_requested'] = self._cancel_requests[job['job_id']] = asyncio.Event()
+            task = asyncio.create_task(self._run_leased(job))
+            self._running[job['job_id']] = task
+            task.add_done_callback(functools.partial(self._finished, job['job_id']))
+
+        watcher.cancel()
+        await self._hand_back()
+        logger.info(json.dumps({"event": "worker_stopped", "worker": self.name, "jobs_done": self.jobs_done}))
+
+    def stop(self):
+        """Stop claiming jobs; run() cancels and releases the running ones."""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _wait(self, event=None, timeout=None):
+        """Wait for event (or timeout), returning early if the worker is stopped."""
+        waiters = [asyncio.ensure_future(self._stopping.wait())]
+        if event is not None:
+            waiters.append(asyncio.ensure_future(event.wait()))
+        await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+
+    def _finished(self, job_id, task):
+        self._running.pop(job_id, None)
+        self._cancel_requests.pop(job_id, None)
+        self._slot_freed.set()
+
+    async def _watch_cancellations(self):
+        """Pass cancellation requests for the running jobs on to run_job."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            pending = [job_id for job_id, event in self._cancel_requests.items() if not event.is_set()]
+            if not pending:
+                continue
+            for job_id in await loop.run_in_executor(None, self.queue.cancelled_jobs, pending):
+                event = self._cancel_requests.get(job_id)
+                if event is not None:
+                    logger.info(json.dumps({"event": "job_cancel_requested", "worker": self.name, "job_id": job_id}))
+                    event.set()
+
+    async def _run_leased(self, job):
+        logger.info(json.dumps({
+            "event": "job_started",
+            "worker": self.name,
+            "scan_id": job['scan_id'],
+            "attempt": job['attempts']
+        }))
+        work = asyncio.create_task(self.run_job(job))
+        keeper = asyncio.create_task(self._keep_lease(job, work))
+        try:
+            await work
+        except asyncio.CancelledError:
+            if not work.cancelled():
+                raise
+            return
+        except Exception as e:
+            # run_job records scan failures itself; this is a bug in it
+            logger.error(json.dumps({
+                "event": "job_failed",
+                "worker": self.name,
+                "scan_id": job['scan_id'],
+                "error": str(e)
+            }))
+        finally:
+            keeper.cancel()
+
+        await asyncio.wrap_future(self.queue.submit_complete(job['job_id'], self.name))
+        self.jobs_done += 1
+
+    async def _keep_lease(self, job, work):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            renewed = await asyncio.wrap_future(self.queue.submit_renew(job['job_id'], self.name))
+            if not renewed:
+                logger.warning(json.dumps({"event": "lease_lost", "worker": self.name, "scan_id": job['scan_id']}))
+                work.cancel()
+                return
+
+    async def _hand_back(self):
+        """Cancel the running jobs and put them back in the queue."""
+        tasks = dict(self._running)
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for job_id in tasks:
+            await asyncio.wrap_future(self.queue.submit_release(job_id, self.name))
+
+
+async def _serve(name, concurrency):
+    worker = Worker(storage.scan_queue(), run_job, name=name, concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, worker.stop)
+    await worker.run()
+
+
+def worker_main(index, concurrency, db_file=None):
+    """Entry point of one worker process."""
+    if db_file:
+        storage.DB_FILE = db_file
+    asyncio.run(_serve(f"{socket.gethostname()}:{os.getpid()}:{index}", concurrency))
+
+
+def run_pool(workers, concurrency=DEFAULT_CONCURRENCY, db_file=None):
+    """Start worker processes and restart any that crash, until SIGTERM/SIGINT."""
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    def start(index):
+        process = multiprocessing.Process(
+            target=worker_main, args=(index, concurrency, db_file), name=f"scan-worker-{index}"
+        )
+        process.start()
+        return process
+
+    processes = [start(index) for index in range(workers)]
+    logger.info(json.dumps({"event": "pool_started", "workers": workers, "concurrency": concurrency}))
+
+    while not stopping:
+        time.sleep(SUPERVISE_INTERVAL)
+        for index, process in enumerate(processes):
+            if not process.is_alive() and not stopping:
+                logger.error(json.dumps({
+                    "event": "worker_died",
+                    "worker": index,
+                    "exit_code": process.exitcode
+                }))
+                processes[index] = start(index)
+
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+    logger.info(json.dumps({"event": "pool_stopped"}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=int(os.getenv("SCAN_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument('--concurrency', type=int,
+                        default=int(os.getenv("SCAN_WORKER_CONCURRENCY", DEFAULT_CONCURRENCY)))
+    parser.add_argument('--db', help='database file (default: %s)' % storage.DB_FILE)
+    args = parser.parse_args()
+
+    run_pool(args.workers, args.concurrency, args.db)
+
+
+if __name__ == '__main__':
+    main()
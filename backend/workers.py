@@ -1,16 +1,21 @@
 from datetime import datetime
-import subprocess
-import socket
 import dns.resolver
-import requests
-from bs4 import BeautifulSoup
-from storage import update_scan_results
-import time
+import async_storage
+import storage
+from scheduler import INTERACTIVE, parse_limits
+from resolver import resolve_domain
+from bruteforce import BruteForcer
+from tool_runner import stream_lines, parse_amass_line, TheHarvesterParser
+from whois_client import get_whois_client
+from crawler import Crawler, get_crawler
+from social import find_profiles
+from merge import FindingsMerger, KINDS
 import asyncio
+import functools
 import json
-import re
 import logging
 import os
+import shlex
 
 # Configure logging
 logging.basicConfig(
@@ -20,92 +25,145 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def get_subdomains(domain: str) -> list:
-    """Get subdomains using dns.resolver"""
-    subdomains = set()
+def get_subdomains(domain: str, resolution: dict = None) -> list:
+    """Get subdomains that resolve, from common prefixes
+
+    Pass the result of resolver.resolve_domain as resolution to reuse a
+    resolution pass already made (get_ips takes the same argument).
+    """
     try:
-        # Common subdomain prefixes
-        prefixes = ['www', 'mail', 'ftp', 'smtp', 'pop', 'api', 'dev', 'staging', 'test']
-        for prefix in prefixes:
-            try:
-                subdomain = f"{prefix}.{domain}"
-                socket.gethostbyname(subdomain)
-                subdomains.add(subdomain)
-            except socket.gaierror:
-                continue
+        if resolution is None:
+            resolution = asyncio.run(resolve_domain(domain))
+        return resolution["subdomains"]
     except Exception as e:
         print(f"Error getting subdomains: {e}")
-    return list(subdomains)
+        return []
 
 def get_emails(domain: str) -> list:
-    """Get email addresses from WHOIS and website"""
-    emails = set()
+    """Get email addresses from the WHOIS record of domain
+
+    Records are looked up over the WHOIS protocol and cached per registrable
+    domain, so subdomains of one domain share a lookup (see whois_client).
+    """
     try:
-        # Try to get WHOIS information
-        whois_cmd = f"whois {domain}"
-        result = subprocess.run(whois_cmd, shell=True, capture_output=True, text=True)
-        if result.stdout:
-            # Simple email regex pattern
-            import re
-            email_pattern = r'[\w\.-]+@[\w\.-]+\.\w+'
-            found_emails = re.findall(email_pattern, result.stdout)
-            emails.update(found_emails)
+        return asyncio.run(get_whois_client().lookup(domain))["emails"]
     except Exception as e:
         print(f"Error getting emails: {e}")
-    return list(emails)
+        return []
 
-def get_ips(domain: str) -> list:
-    """Get IP addresses for domain and subdomains"""
-    ips = set()
+def get_ips(domain: str, resolution: dict = None) -> list:
+    """Get IPv4 and IPv6 addresses for domain and subdomains"""
     try:
-        # Get IP for main domain
-        ip = socket.gethostbyname(domain)
-        ips.add(ip)
-        
-        # Get IPs for subdomains
-        subdomains = get_subdomains(domain)
-        for subdomain in subdomains:
-            try:
-                ip = socket.gethostbyname(subdomain)
-                ips.add(ip)
-            except socket.gaierror:
-                continue
+        if resolution is None:
+            resolution = asyncio.run(resolve_domain(domain))
+        return resolution["ips"]
     except Exception as e:
         print(f"Error getting IPs: {e}")
-    return list(ips)
+        return []
 
 def get_social_profiles(domain: str) -> list:
-    """Get social media profiles"""
-    profiles = []
+    """Get social media profiles linked from the domain's website
+
+    Crawls the homepage, /about and /contact (see crawler.Crawler) and
+    returns the canonical URLs of the profiles they link to (see social).
+    """
+    async def crawl():
+        return await Crawler().crawl_site(domain)
+
     try:
-        # Try to get website content
-        response = requests.get(f"https://{domain}", timeout=5)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Look for social media links
-            social_domains = ['twitter.com', 'linkedin.com', 'facebook.com', 'instagram.com']
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                for social_domain in social_domains:
-                    if social_domain in href:
-                        profiles.append(href)
+        return find_profiles(asyncio.run(crawl())["links"])
     except Exception as e:
         print(f"Error getting social profiles: {e}")
-    return profiles
+        return []
+
+def simulate_tools() -> bool:
+    """Whether to return canned results instead of running external tools
+
+    Set SIMULATE_TOOLS=1 where theHarvester and Amass are not installed
+    (development, tests, the demo Docker setup).
+    """
+    return os.getenv("SIMULATE_TOOLS") == "1"
+
+# Seconds a tool may run once it has a slot, and a whole scan may take
+# (tool slot waits included). See tool_timeout and scan_timeout.
+DEFAULT_TOOL_TIMEOUT = 900
+DEFAULT_SCAN_TIMEOUT = 3600
+
+def tool_timeout(name: str):
+    """Seconds the named tool may run before it is stopped (None: no limit)
+
+    TOOL_TIMEOUT_SECONDS overrides the default for all tools and
+    TOOL_TIMEOUTS ("Amass=1800,theHarvester=600") for single tools;
+    0 means no limit.
+    """
+    timeouts = parse_limits(os.getenv("TOOL_TIMEOUTS"))
+    return timeouts.get(name, int(os.getenv("TOOL_TIMEOUT_SECONDS", DEFAULT_TOOL_TIMEOUT))) or None
+
+def scan_timeout():
+    """Seconds a scan's tools may take in all (SCAN_TIMEOUT_SECONDS; None: no limit)"""
+    return int(os.getenv("SCAN_TIMEOUT_SECONDS", DEFAULT_SCAN_TIMEOUT)) or None
+
 
 class ToolStrategy:
-    """Strategy pattern for running different OSINT tools"""
-    def __init__(self, scan_id, domain):
+    """Strategy pattern for running different OSINT tools
+
+    on_findings, if given, is called as on_findings(tool name, kind, values)
+    whenever the tool reports new findings, while it is still running.
+
+    state tracks a run through run_tool: "queued" (waiting for a slot),
+    "running", then "completed", "failed", "timed_out" or "stopped" (by
+    the scan deadline or a cancellation).
+    """
+    name = "tool"
+
+    def __init__(self, scan_id, domain, on_findings=None):
         self.scan_id = scan_id
         self.domain = domain
+        self.on_findings = on_findings
+        self.findings = {}
+        self.state = "queued"
         
     async def execute(self):
         raise NotImplementedError("Subclasses must implement execute()")
 
+    def add_findings(self, findings):
+        """Record (kind, value) findings, reporting the new ones to on_findings"""
+        new = {}
+        for kind, value in findings:
+            values = self.findings.setdefault(kind, {})
+            if value not in values:
+                values[value] = None
+                new.setdefault(kind, []).append(value)
+        if self.on_findings is not None:
+            for kind, values in new.items():
+                self.on_findings(self.name, kind, values)
+
+    def collected(self, *kinds):
+        """Return the recorded findings of the given kinds as a result dict"""
+        return {kind: list(self.findings.get(kind, ())) for kind in kinds}
+
+    def partial_result(self, error):
+        """Return everything recorded so far, for a run stopped early, with the reason"""
+        result = {kind: list(values) for kind, values in self.findings.items()}
+        result["error"] = error
+        return result
+
 
 class TheHarvesterStrategy(ToolStrategy):
-    """Strategy for running theHarvester"""
+    """Strategy for running theHarvester
+
+    THEHARVESTER_CMD overrides how theHarvester is invoked (e.g.
+    "python3 /opt/theHarvester/theHarvester.py") and THEHARVESTER_SOURCES
+    the data sources it queries.
+    """
+    name = "theHarvester"
+
+    def command(self):
+        return shlex.split(os.getenv("THEHARVESTER_CMD", "theHarvester")) + [
+            "-d", self.domain,
+            "-b", os.getenv("THEHARVESTER_SOURCES", "all")
+        ]
+
     async def execute(self):
         logger.info(json.dumps({
             "scan_id": self.scan_id,
@@ -115,15 +173,18 @@ class TheHarvesterStrategy(ToolStrategy):
         }))
         
         try:
-            # Use asyncio.create_subprocess_exec for safer process creation
-            cmd = ["theHarvester", "-d", self.domain, "-b", "all"]
-            
-            # Simulate theHarvester results for development - REMOVE IN PRODUCTION
-            await asyncio.sleep(4)  # Simulate tool running time
-            
-            # Simulated results - in production, parse the actual output
-            subdomains = [f"mail.{self.domain}", f"www.{self.domain}", f"dev.{self.domain}"]
-            emails = [f"admin@{self.domain}", f"info@{self.domain}"]
+            if simulate_tools():
+                # Simulated results for development
+                await asyncio.sleep(4)  # Simulate tool running time
+                self.add_findings([("subdomains", f"{prefix}.{self.domain}") for prefix in ("mail", "www", "dev")])
+                self.add_findings([("emails", f"{user}@{self.domain}") for user in ("admin", "info")])
+            else:
+                parser = TheHarvesterParser(self.domain)
+                async for line in stream_lines(self.command()):
+                    self.add_findings(parser.feed(line))
+
+            result = self.collected("subdomains", "emails", "ips")
+            subdomains, emails = result["subdomains"], result["emails"]
             
             logger.info(json.dumps({
                 "scan_id": self.scan_id,
@@ -134,10 +195,7 @@ class TheHarvesterStrategy(ToolStrategy):
                 "emails_found": len(emails)
             }))
             
-            return {
-                "subdomains": subdomains,
-                "emails": emails
-            }
+            return result
         except Exception as e:
             logger.error(json.dumps({
                 "scan_id": self.scan_id,
@@ -150,7 +208,18 @@ class TheHarvesterStrategy(ToolStrategy):
 
 
 class AmassStrategy(ToolStrategy):
-    """Strategy for running Amass"""
+    """Strategy for running Amass
+
+    AMASS_CMD overrides how Amass is invoked. Results are read from its
+    -json output, written to stdout.
+    """
+    name = "Amass"
+
+    def command(self):
+        return shlex.split(os.getenv("AMASS_CMD", "amass")) + [
+            "enum", "-passive", "-silent", "-d", self.domain, "-json", "/dev/stdout"
+        ]
+
     async def execute(self):
         logger.info(json.dumps({
             "scan_id": self.scan_id,
@@ -160,15 +229,17 @@ class AmassStrategy(ToolStrategy):
         }))
         
         try:
-            # Use asyncio.create_subprocess_exec for safer process creation
-            cmd = ["amass", "enum", "-d", self.domain, "-passive"]
-            
-            # Simulate Amass results for development - REMOVE IN PRODUCTION
-            await asyncio.sleep(5)  # Simulate tool running time
-            
-            # Simulated results - in production, parse the actual output
-            subdomains = [f"api.{self.domain}", f"blog.{self.domain}", f"store.{self.domain}"]
-            ips = ["192.168.1.1", "10.0.0.1"]
+            if simulate_tools():
+                # Simulated results for development
+                await asyncio.sleep(5)  # Simulate tool running time
+                self.add_findings([("subdomains", f"{prefix}.{self.domain}") for prefix in ("api", "blog", "store")])
+                self.add_findings([("ips", ip) for ip in ("192.168.1.1", "10.0.0.1")])
+            else:
+                async for line in stream_lines(self.command()):
+                    self.add_findings(parse_amass_line(line, self.domain))
+
+            result = self.collected("subdomains", "ips")
+            subdomains, ips = result["subdomains"], result["ips"]
             
             logger.info(json.dumps({
                 "scan_id": self.scan_id,
@@ -179,10 +250,7 @@ class AmassStrategy(ToolStrategy):
                 "ips_found": len(ips)
             }))
             
-            return {
-                "subdomains": subdomains,
-                "ips": ips
-            }
+            return result
         except Exception as e:
             logger.error(json.dumps({
                 "scan_id": self.scan_id,
@@ -196,6 +264,8 @@ class AmassStrategy(ToolStrategy):
 
 class SocialProfilesStrategy(ToolStrategy):
     """Strategy for finding social profiles"""
+    name = "SocialProfilesFinder"
+
     async def execute(self):
         logger.info(json.dumps({
             "scan_id": self.scan_id,
@@ -205,15 +275,19 @@ class SocialProfilesStrategy(ToolStrategy):
         }))
         
         try:
-            # Simulate finding social profiles
-            await asyncio.sleep(3)
-            
-            # Simulated results
-            profiles = [
-                f"https://twitter.com/{self.domain.split('.')[0]}",
-                f"https://linkedin.com/company/{self.domain.split('.')[0]}",
-                f"https://facebook.com/{self.domain.split('.')[0]}"
-            ]
+            if simulate_tools():
+                # Simulated results for development
+                await asyncio.sleep(3)
+                profiles = [
+                    f"https://twitter.com/{self.domain.split('.')[0]}",
+                    f"https://linkedin.com/company/{self.domain.split('.')[0]}",
+                    f"https://facebook.com/{self.domain.split('.')[0]}"
+                ]
+            else:
+                crawl = await get_crawler().crawl_site(self.domain)
+                profiles = find_profiles(crawl["links"])
+            self.add_findings(("social_profiles", profile) for profile in profiles)
+            profiles = self.collected("social_profiles")["social_profiles"]
             
             logger.info(json.dumps({
                 "scan_id": self.scan_id,
@@ -237,72 +311,242 @@ class SocialProfilesStrategy(ToolStrategy):
             return {"error": str(e)}
 
 
+class WordlistBruteForceStrategy(ToolStrategy):
+    """Strategy for brute-forcing subdomains from a wordlist
+
+    The wordlist comes from BRUTEFORCE_WORDLIST and queries go to the
+    comma-separated BRUTEFORCE_RESOLVERS (default: the system resolvers).
+    """
+    name = "WordlistBruteForce"
+
+    def __init__(self, scan_id, domain, on_findings=None, wordlist=None, nameservers=None, port=53):
+        super().__init__(scan_id, domain, on_findings)
+        self.wordlist = wordlist or os.getenv("BRUTEFORCE_WORDLIST")
+        self.nameservers = nameservers
+        self.port = port
+
+    @staticmethod
+    def configured_nameservers():
+        resolvers = os.getenv("BRUTEFORCE_RESOLVERS")
+        if resolvers:
+            return [address.strip() for address in resolvers.split(",") if address.strip()]
+        return dns.resolver.Resolver().nameservers
+
+    def log_progress(self, progress):
+        logger.info(json.dumps({
+            "scan_id": self.scan_id,
+            "tool": self.name,
+            "domain": self.domain,
+            "status": "progress",
+            **progress
+        }))
+
+    async def execute(self):
+        logger.info(json.dumps({
+            "scan_id": self.scan_id,
+            "tool": self.name,
+            "domain": self.domain,
+            "status": "starting",
+            "wordlist": self.wordlist
+        }))
+
+        try:
+            engine = BruteForcer(
+                self.nameservers or self.configured_nameservers(),
+                port=self.port,
+                progress_callback=self.log_progress,
+                progress_interval=10.0
+            )
+            result = await engine.run(self.domain, self.wordlist)
+
+            self.add_findings(
+                finding
+                for subdomain, addresses in result["subdomains"].items()
+                for finding in [("subdomains", subdomain)] + [("ips", ip) for ip in addresses]
+            )
+            subdomains, ips = self.collected("subdomains", "ips").values()
+
+            logger.info(json.dumps({
+                "scan_id": self.scan_id,
+                "tool": self.name,
+                "domain": self.domain,
+                "status": "completed",
+                "names_tried": result["tried"],
+                "wildcard": result["wildcard"],
+                "subdomains_found": len(subdomains)
+            }))
+
+            return {
+                "subdomains": subdomains,
+                "ips": ips
+            }
+        except Exception as e:
+            logger.error(json.dumps({
+                "scan_id": self.scan_id,
+                "tool": self.name,
+                "domain": self.domain,
+                "status": "error",
+                "error": str(e)
+            }))
+            return {"error": str(e)}
+
+
 class ScanToolsFactory:
     """Factory pattern for creating OSINT tool strategies"""
     @staticmethod
-    def create_tools(scan_id, domain):
-        return [
-            TheHarvesterStrategy(scan_id, domain),
-            AmassStrategy(scan_id, domain),
-            SocialProfilesStrategy(scan_id, domain)
+    def create_tools(scan_id, domain, on_findings=None):
+        tools = [
+            TheHarvesterStrategy(scan_id, domain, on_findings),
+            AmassStrategy(scan_id, domain, on_findings),
+            SocialProfilesStrategy(scan_id, domain, on_findings)
         ]
+        # Brute force only runs where a wordlist has been configured
+        wordlist = os.getenv("BRUTEFORCE_WORDLIST")
+        if wordlist and os.path.isfile(wordlist):
+            tools.append(WordlistBruteForceStrategy(scan_id, domain, on_findings, wordlist=wordlist))
+        return tools
 
 
-async def merge_results(results_list):
-    """Merge and deduplicate results from multiple tools"""
-    merged = {
-        "subdomains": set(),
-        "emails": set(),
-        "ips": set(),
-        "social_profiles": set(),
-        "errors": []
-    }
-    
-    for result in results_list:
-        if "error" in result:
-            merged["errors"].append(result["error"])
-            continue
-            
-        # Merge subdomains
-        if "subdomains" in result:
-            merged["subdomains"].update(result["subdomains"])
-        
-        # Merge emails
-        if "emails" in result:
-            merged["emails"].update(result["emails"])
-        
-        # Merge IPs
-        if "ips" in result:
-            merged["ips"].update(result["ips"])
-        
-        # Merge social profiles
-        if "social_profiles" in result:
-            merged["social_profiles"].update(result["social_profiles"])
-    
-    # Convert sets to lists for JSON serialization
-    return {
-        "subdomains": list(merged["subdomains"]),
-        "emails": list(merged["emails"]),
-        "ips": list(merged["ips"]),
-        "social_profiles": list(merged["social_profiles"]),
-        "errors": merged["errors"]
-    }
+async def merge_results(results_list, tools=None, sources=None):
+    """Merge and deduplicate results from multiple tools
+
+    Values are compared in normalized form (see merge.normalize). When the
+    tools' names are given, in the order of results_list, the merged result
+    also carries "overlap": how many findings each tool shares with the
+    others (see FindingsMerger.overlap). If sources is a dict, it is filled
+    with the tools that found each merged value, {kind: {value: [tools]}}
+    (see FindingsMerger.provenance), which is what storage attributes
+    findings by.
+    """
+    merger = FindingsMerger(tools or ())
+    for index, result in enumerate(results_list):
+        merger.add(tools[index] if tools else index, result)
+
+    merged = merger.result()
+    if tools:
+        merged["overlap"] = merger.overlap()
+    if sources is not None:
+        sources.update((kind, merger.provenance(kind)) for kind in KINDS)
+    return merged
+
+
+async def run_tool(tool, timeout=None):
+    """Run a tool, stopping it after timeout seconds with what it found so far"""
+    tool.state = "running"
+    try:
+        result = await asyncio.wait_for(tool.execute(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(json.dumps({
+            "scan_id": tool.scan_id,
+            "tool": tool.name,
+            "domain": tool.domain,
+            "status": "timeout",
+            "timeout_seconds": timeout
+        }))
+        tool.state = "timed_out"
+        return tool.partial_result(f"{tool.name} timed out after {timeout:g} seconds")
+    tool.state = "failed" if "error" in result else "completed"
+    return result
+
+
+async def run_tools_async(scan_id, domain, tool_results=None, on_findings=None,
+                          priority=INTERACTIVE, submitter="", timeout=None, cancelled=None, on_progress=None,
+                          sources=None):
+    """Run all OSINT tools in parallel using asyncio
+
+    Each tool starts once the tool scheduler (storage.tool_scheduler) gives
+    it a slot, by priority class and fair share between submitters, and is
+    stopped after tool_timeout(name) seconds of running. Tools still going
+    after timeout seconds in all, or once the cancelled asyncio.Event is set,
+    are stopped too. A stopped tool's child processes are killed, what it
+    found so far is kept and the reason is added to errors.
+    If tool_results is a dict, it is filled with each tool's raw result keyed
+    by tool name, and sources with the tools that found each merged value
+    (see merge_results), as of the last merge, so the caller can attribute
+    findings to their source.
+    on_findings is passed on to every tool (see ToolStrategy).
+    on_progress, if given, is awaited as on_progress(tools, merged) when
+    tools change state (ToolStrategy.state): tools lists the ones that did,
+    and merged is the merged result of the tools done so far when one of
+    them finished while others are still running (None otherwise).
+    """
+    tools = ScanToolsFactory.create_tools(scan_id, domain, on_findings)
+    scheduler = storage.tool_scheduler()
+    results = {} if tool_results is None else tool_results
+    stopped = None
 
+    async def progress(changed, merged=None):
+        if on_progress is not None:
+            await on_progress(changed, merged)
 
-async def run_tools_async(scan_id, domain):
-    """Run all OSINT tools in parallel using asyncio"""
-    tools = ScanToolsFactory.create_tools(scan_id, domain)
+    async def execute(tool):
+        tool.state = "running"
+        await progress([tool])
+        return await run_tool(tool, tool_timeout(tool.name))
+
+    def collect(task):
+        tool = tasks[task]
+        if task.cancelled():
+            tool.state = "stopped"
+            results[tool.name] = tool.partial_result(f"{tool.name} was stopped: {stopped}")
+        elif task.exception() is not None:
+            tool.state = "failed"
+            results[tool.name] = {"error": f"{tool.name} failed: {task.exception()}"}
+        else:
+            results[tool.name] = task.result()
+        return tool
+    
+    # Run all tools concurrently, as slots allow, taking each result as it comes
+    await progress(tools)
+    tasks = {
+        asyncio.create_task(scheduler.run(
+            tool.name, functools.partial(execute, tool), scan_id=scan_id, submitter=submitter, priority=priority
+        )): tool
+        for tool in tools
+    }
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    stop = asyncio.ensure_future(cancelled.wait()) if cancelled is not None else None
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                stopped = f"the scan timed out after {timeout:g} seconds"
+                break
+            done, _ = await asyncio.wait(
+                pending | ({stop} if stop else set()), timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            finished = [task for task in done if task is not stop]
+            if finished:
+                pending.difference_update(finished)
+                await progress([collect(task) for task in finished],
+                               await merge_results(list(results.values()), list(results), sources) if pending else None)
+            if stop in done:
+                stopped = "the scan was cancelled"
+                break
+    finally:
+        # Stop whatever is still running, also when this scan is cancelled
+        if stop is not None:
+            stop.cancel()
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
     
-    # Run all tools concurrently and gather results
-    tasks = [tool.execute() for tool in tools]
-    results = await asyncio.gather(*tasks)
+    if pending:
+        await progress([collect(task) for task in pending])
     
-    # Merge and deduplicate results
-    return await merge_results(results)
+    # Merge and deduplicate results, in tool order
+    return await merge_results([results[tool.name] for tool in tools], [tool.name for tool in tools], sources)
 
 
-def run_osint_scan(scan_id: str, domain: str, start_time: datetime):
-    """Run OSINT scan on the given domain"""
+async def run_scan(scan_id: str, domain: str, start_time: datetime,
+                   priority: str = INTERACTIVE, submitter: str = "", cancelled: asyncio.Event = None):
+    """Run an OSINT scan on the current event loop and store its results
+
+    Setting cancelled stops the tools; the scan is then stored as
+    'cancelled' with whatever they found so far.
+    """
     logger.info(json.dumps({
         "scan_id": scan_id,
         "domain": domain,
@@ -311,13 +555,34 @@ def run_osint_scan(scan_id: str, domain: str, start_time: datetime):
     }))
     
     try:
-        # Create and run event loop for the async tasks
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
         # Run tools in parallel and get merged results
-        results = loop.run_until_complete(run_tools_async(scan_id, domain))
-        loop.close()
+        tool_results = {}
+        sources = {}
+
+        def report_findings(tool, kind, values):
+            # Not awaited: findings events ride along with the next commit
+            storage.submit_scan_events(scan_id, [("findings", {"tool": tool, "kind": kind, "values": values})])
+
+        async def publish(tools, merged):
+            # Findings of finished tools that were not reported as they came in
+            for tool in tools:
+                result = tool_results.get(tool.name, {})
+                for kind in storage.FINDING_KINDS:
+                    values = [value for value in result.get(kind) or () if value not in tool.findings.get(kind, ())]
+                    if values:
+                        report_findings(tool.name, kind, values)
+            # Tool states, and the merged findings so far as the scan's partial results
+            await async_storage.update_tool_states(
+                scan_id, [(tool.name, tool.state, tool_results.get(tool.name, {}).get("error")) for tool in tools]
+            )
+            if merged is not None:
+                await async_storage.update_scan_results(scan_id, merged, None, sources=sources, status=None)
+
+        results = await run_tools_async(scan_id, domain, tool_results, on_findings=report_findings,
+                                        priority=priority, submitter=submitter,
+                                        timeout=scan_timeout(), cancelled=cancelled, on_progress=publish,
+                                        sources=sources)
+        status = "cancelled" if cancelled is not None and cancelled.is_set() else "completed"
         
         # Calculate end time
         end_time = datetime.utcnow()
@@ -326,7 +591,7 @@ def run_osint_scan(scan_id: str, domain: str, start_time: datetime):
         logger.info(json.dumps({
             "scan_id": scan_id,
             "domain": domain,
-            "status": "completed",
+            "status": status,
             "duration_seconds": (end_time - start_time).total_seconds(),
             "results_summary": {
                 "subdomains": len(results["subdomains"]),
@@ -338,7 +603,7 @@ def run_osint_scan(scan_id: str, domain: str, start_time: datetime):
         }))
         
         # Update scan with results
-        update_scan_results(scan_id, results, end_time)
+        await async_storage.update_scan_results(scan_id, results, end_time, sources=sources, status=status)
     except Exception as e:
         logger.error(json.dumps({
             "scan_id": scan_id,
@@ -349,5 +614,16 @@ def run_osint_scan(scan_id: str, domain: str, start_time: datetime):
         
         # Update scan with error status
         error_results = {"error": str(e)}
-        update_scan_results(scan_id, error_results, datetime.utcnow())
+        await async_storage.update_scan_results(scan_id, error_results, datetime.utcnow())
+
 
+async def run_job(job):
+    """Run a scan job claimed from storage.scan_queue() (see worker_pool.py)"""
+    payload = job["payload"]
+    await run_scan(job["scan_id"], payload["domain"], datetime.fromisoformat(payload["start_time"]),
+                   priority=job["priority"], submitter=job["submitter"], cancelled=job.get("cancel_requested"))
+
+
+def run_osint_scan(scan_id: str, domain: str, start_time: datetime):
+    """Run OSINT scan on the given domain, on an event loop of its own"""
+    asyncio.run(run_scan(scan_id, domain, start_time))
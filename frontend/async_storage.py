@@ -0,0 +1,42 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import storage
+
+# Storage calls are blocking sqlite3 calls, so async code must never make
+# them on the event loop. Writes go to a single dedicated thread (SQLite only
+# allows one writer at a time anyway); reads get a small pool of their own
+# because WAL lets them run alongside the writer.
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+_read_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='db-reader')
+
+
+async def _run(executor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def store_scan(scan_id, domain, start_time):
+    """Async version of storage.store_scan."""
+    return await _run(_write_executor, storage.store_scan, scan_id, domain, start_time)
+
+
+async def enqueue_scan(scan_id, domain, start_time, options=None):
+    """Async version of storage.enqueue_scan."""
+    return await _run(_write_executor, storage.enqueue_scan, scan_id, domain, start_time, options)
+
+
+async def update_scan_results(scan_id, scan_result, status='completed'):
+    """Async version of storage.update_scan_results."""
+    return await _run(_write_executor, storage.update_scan_results, scan_id, scan_result, status)
+
+
+async def get_scan_by_id(scan_id):
+    """Async version of storage.get_scan_by_id."""
+    return await _run(_read_executor, storage.get_scan_by_id, scan_id)
+
+
+async def list_scans(limit=50, cursor=None, domain=None, status=None):
+    """Async version of storage.list_scans."""
+    return await _run(_read_executor, storage.list_scans, limit=limit, cursor=cursor, domain=domain, status=status)
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse
 from pydantic import BaseModel
@@ -10,8 +10,8 @@ import os
 import traceback
 from uuid import uuid4
 import pandas as pd
-from storage import store_scan, get_all_scans, get_scan_by_id
-from workers import start_scan
+import async_storage
+from workers import OsintToolFactory
 
 # Configure logging
 logging.basicConfig(
@@ -39,6 +39,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Define request model
@@ -52,9 +53,10 @@ class ErrorResponse(BaseModel):
 
 # Define routes
 @app.post("/api/scan", response_model=Dict[str, str])
-async def api_start_scan(request: ScanRequest, background_tasks: BackgroundTasks):
+async def api_start_scan(request: ScanRequest):
     """
-    Start a new scan for the given domain using selected OSINT tools
+    Queue a new scan for the given domain using selected OSINT tools;
+    the worker pool (worker_pool.py) runs it
     """
     try:
         logger.info(f"Starting scan for domain: {request.domain}")
@@ -63,10 +65,16 @@ async def api_start_scan(request: ScanRequest, background_tasks: BackgroundTasks
         if not request.domain or '.' not in request.domain:
             raise HTTPException(status_code=400, detail="Invalid domain format")
         
-        # Start the scan in the background
-        result = await start_scan(request.domain, request.options)
+        if not OsintToolFactory.create_tools(request.domain, request.options):
+            raise HTTPException(status_code=400, detail="No tools selected for the scan")
         
-        return result
+        # Store the scan and its job; a worker picks it up
+        scan_id = str(uuid4())
+        await async_storage.enqueue_scan(scan_id, request.domain, datetime.now(), request.options)
+        
+        return {"scanId": scan_id}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error starting scan: {str(e)}")
         logger.error(traceback.format_exc())
@@ -78,7 +86,7 @@ async def get_scan_status(scan_id: str):
     Get the status and results of a specific scan
     """
     try:
-        scan = get_scan_by_id(scan_id)
+        scan = await async_storage.get_scan_by_id(scan_id)
         if not scan:
             raise HTTPException(status_code=404, detail=f"Scan with ID {scan_id} not found")
         
@@ -91,13 +99,24 @@ async def get_scan_status(scan_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve scan: {str(e)}")
 
 @app.get("/api/scans", response_model=List[Dict[str, Any]])
-async def get_scans():
+async def get_scans(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    domain: Optional[str] = None,
+    status: Optional[str] = None
+):
     """
-    Get all scans
+    Get one page of scan summaries, newest first.
+    The next page cursor is returned in the X-Next-Cursor header.
     """
     try:
-        scans = get_all_scans()
+        scans, next_cursor = await async_storage.list_scans(limit=limit, cursor=cursor, domain=domain, status=status)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return scans
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving scans: {str(e)}")
         logger.error(traceback.format_exc())
@@ -109,7 +128,7 @@ async def export_scan(scan_id: str):
     Export scan results to Excel
     """
     try:
-        scan = get_scan_by_id(scan_id)
+        scan = await async_storage.get_scan_by_id(scan_id)
         if not scan:
             raise HTTPException(status_code=404, detail=f"Scan with ID {scan_id} not found")
         
@@ -0,0 +1,14 @@
+"""Put the backend directory on the import path.
+
+The modules both apps use (db, dns_cache, job_queue, merge, resolver,
+scheduler, social, tool_runner, worker_pool) live in backend/ only. It is
+appended, so this app's own storage, async_storage and workers still come
+first. Import this before any of the shared modules.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
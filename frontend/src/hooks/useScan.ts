@@ -1,4 +1,4 @@
-import { useState, useCallback, useEffect } from 'react';
+import { useState, useCallback, useEffect, useRef } from 'react';
 import type { ScanRequest, ScanResult, ScanState } from '../types';
 import { ScanStatus } from '../types';
 import { api } from '../services/api';
@@ -11,6 +11,11 @@ export const useScan = () => {
     error: null,
   });
 
+  // Stops following the scan in progress, if any
+  const stopWatching = useRef<(() => void) | null>(null);
+
+  useEffect(() => () => stopWatching.current?.(), []);
+
   // Load saved results from localStorage on init
   useEffect(() => {
     try {
@@ -46,35 +51,26 @@ export const useScan = () => {
       
       console.log(`Scan started with ID: ${scanId}`);
       
-      // Poll for status until completion
-      const pollInterval = setInterval(async () => {
-        try {
-          console.log(`Polling for scan status: ${scanId}`);
-          const result = await api.getScanStatus(scanId);
+      // Follow the scan's event stream until it finishes
+      stopWatching.current?.();
+      stopWatching.current = api.watchScan(scanId, {
+        onDone: (result) => {
           console.log(`Received scan result:`, result);
-          
-          if (result.endTime) {
-            clearInterval(pollInterval);
-            
-            setScanState(prev => ({
-              ...prev,
-              status: ScanStatus.COMPLETED,
-              results: [result, ...prev.results],
-            }));
-          }
-        } catch (error) {
-          console.error(`Error polling scan status:`, error);
-          clearInterval(pollInterval);
+          setScanState(prev => ({
+            ...prev,
+            status: ScanStatus.COMPLETED,
+            results: [result, ...prev.results],
+          }));
+        },
+        onError: (message) => {
+          console.error(`Error following scan ${scanId}:`, message);
           setScanState(prev => ({
             ...prev,
             status: ScanStatus.ERROR,
-            error: error instanceof Error ? error.message : 'Unknown error occurred',
+            error: message,
           }));
-        }
-      }, 2000);
-      
-      // Cleanup interval on component unmount
-      return () => clearInterval(pollInterval);
+        },
+      });
     } catch (error) {
       setScanState(prev => ({
         ...prev,
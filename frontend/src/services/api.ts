@@ -5,7 +5,8 @@ const API_BASE_URL = window.location.hostname === 'localhost'
   ? 'http://localhost:8000'  // Development - direct to backend
   : '';  // Production - use proxy pass through nginx
 
-// Helper to transform backend response format to frontend format
+// Helper to transform backend response format to frontend format.
+// List responses carry only per-kind `counts`; full scans carry `results`.
 const transformScanData = (data: any): ScanResult => {
   return {
     id: data.scan_id,
@@ -13,10 +14,10 @@ const transformScanData = (data: any): ScanResult => {
     startTime: data.start_time,
     endTime: data.end_time || '',
     summary: {
-      subdomains: data.results?.subdomains?.length || 0,
-      emails: data.results?.emails?.length || 0,
-      ips: data.results?.ips?.length || 0,
-      socialProfiles: data.results?.social_profiles?.length || 0
+      subdomains: data.counts?.subdomains ?? data.results?.subdomains?.length ?? 0,
+      emails: data.counts?.emails ?? data.results?.emails?.length ?? 0,
+      ips: data.counts?.ips ?? data.results?.ips?.length ?? 0,
+      socialProfiles: data.counts?.social_profiles ?? data.results?.social_profiles?.length ?? 0
     },
     details: {
       subdomains: data.results?.subdomains || [],
@@ -27,6 +28,14 @@ const transformScanData = (data: any): ScanResult => {
   };
 };
 
+// Scan statuses after which a scan's event stream ends
+const FINAL_STATUSES = ['completed', 'failed', 'cancelled'];
+
+export interface ScanWatchHandlers {
+  onDone: (result: ScanResult) => void;
+  onError: (message: string) => void;
+}
+
 export const api = {
   async startScan(request: ScanRequest): Promise<{ scanId: string }> {
     const response = await fetch(`${API_BASE_URL}/scan`, {
@@ -59,6 +68,37 @@ export const api = {
     return transformScanData(data);
   },
 
+  // Follow a scan over its Server-Sent Events stream until it finishes.
+  // EventSource reconnects by itself (resuming with Last-Event-ID).
+  // Returns a function that stops watching.
+  watchScan(scanId: string, handlers: ScanWatchHandlers): () => void {
+    const source = new EventSource(`${API_BASE_URL}/scans/${scanId}/events`);
+
+    const finishOn = (status: string) => {
+      if (!FINAL_STATUSES.includes(status)) {
+        return;
+      }
+      source.close();
+      api.getScanStatus(scanId)
+        .then(handlers.onDone)
+        .catch((error) => handlers.onError(error instanceof Error ? error.message : 'Failed to get scan'));
+    };
+
+    source.addEventListener('snapshot', (event) => {
+      finishOn(JSON.parse((event as MessageEvent).data).status);
+    });
+    source.addEventListener('status', (event) => {
+      finishOn(JSON.parse((event as MessageEvent).data).status);
+    });
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) {
+        handlers.onError('Lost connection to the scan progress stream');
+      }
+    };
+
+    return () => source.close();
+  },
+
   async getAllScans(): Promise<ScanResult[]> {
     const response = await fetch(`${API_BASE_URL}/scans`);
 
@@ -1,7 +1,11 @@
-import sqlite3
+import base64
 import json
 import os
 from datetime import datetime
+import shared  # the shared modules below live in backend/
+from db import get_connection
+from job_queue import JobQueue, create_schema as create_job_schema
+from scheduler import ToolScheduler, DEFAULT_GLOBAL_LIMIT, create_schema as create_scheduler_schema, parse_limits
 
 # Ensure the data directory exists
 os.makedirs('data', exist_ok=True)
@@ -9,9 +13,8 @@ os.makedirs('data', exist_ok=True)
 # SQLite database file
 DB_FILE = 'data/osint_scans.db'
 
-def init_db():
-    """Initialize the database with required tables."""
-    conn = sqlite3.connect(DB_FILE)
+def _create_schema(conn):
+    """Create the required tables on a fresh connection."""
     cursor = conn.cursor()
 
     # Create scans table if it doesn't exist
@@ -25,75 +28,121 @@ def init_db():
         status TEXT NOT NULL
     )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_start ON scans (start_time, scan_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_domain_start ON scans (domain, start_time, scan_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_status_start ON scans (status, start_time, scan_id)')
+
+    # Scans waiting for (or being run by) a worker process, and the tool
+    # runs of those scans waiting for (or holding) a scheduler slot
+    create_job_schema(conn)
+    create_scheduler_schema(conn)
 
     conn.commit()
-    conn.close()
+
+def _connection():
+    """Return this thread's pooled connection to the current DB_FILE."""
+    return get_connection(DB_FILE, _create_schema)
+
+def init_db():
+    """Initialize the database with required tables."""
+    _connection()
 
 # Initialize the database
 init_db()
 
 def store_scan(scan_id, domain, start_time):
     """Store initial scan record in the database."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    with _connection() as conn:
+        conn.execute(
+            'INSERT INTO scans (scan_id, domain, start_time, status) VALUES (?, ?, ?, ?)',
+            (scan_id, domain, start_time.isoformat(), 'running')
+        )
+
+def _mark_scan_running(conn, job):
+    conn.execute("UPDATE scans SET status = 'running' WHERE scan_id = ? AND status = 'queued'", (job['scan_id'],))
 
-    cursor.execute(
-        'INSERT INTO scans (scan_id, domain, start_time, status) VALUES (?, ?, ?, ?)',
-        (scan_id, domain, start_time.isoformat(), 'running')
+def _fail_abandoned_scan(conn, job):
+    conn.execute(
+        "UPDATE scans SET status = 'failed', end_time = ? WHERE scan_id = ?",
+        (datetime.now().isoformat(), job['scan_id'])
     )
 
-    conn.commit()
-    conn.close()
+def scan_queue():
+    """Return the queue of scans waiting for a worker (see worker_pool.py).
+
+    A scan is 'queued' until a worker leases its job, then 'running'. Scans
+    whose workers keep dying are marked 'failed'.
+    """
+    return JobQueue(DB_FILE, _create_schema, on_claim=_mark_scan_running, on_dead=_fail_abandoned_scan)
+
+# Tool runs allowed at once across all workers, for tools with a limit
+# (TOOL_LIMITS="AmassTool=2,TheHarvesterTool=4" overrides these)
+DEFAULT_TOOL_LIMITS = {'TheHarvesterTool': 4, 'AmassTool': 2}
+
+_schedulers = {}
 
-def update_scan_results(scan_id, scan_result):
+def tool_scheduler():
+    """Return this process's ToolScheduler for the current DB_FILE."""
+    scheduler = _schedulers.get(DB_FILE)
+    if scheduler is None:
+        limits = dict(DEFAULT_TOOL_LIMITS, **parse_limits(os.getenv('TOOL_LIMITS')))
+        global_limit = int(os.getenv('TOOL_GLOBAL_LIMIT', DEFAULT_GLOBAL_LIMIT))
+        scheduler = _schedulers[DB_FILE] = ToolScheduler(DB_FILE, _create_schema, limits, global_limit)
+    return scheduler
+
+def enqueue_scan(scan_id, domain, start_time, options=None):
+    """Store a new scan and queue it for the worker pool, in one transaction."""
+    with _connection() as conn:
+        conn.execute(
+            'INSERT INTO scans (scan_id, domain, start_time, status) VALUES (?, ?, ?, ?)',
+            (scan_id, domain, start_time.isoformat(), 'queued')
+        )
+        scan_queue().insert(conn, scan_id, {'domain': domain, 'options': options})
+
+def update_scan_results(scan_id, scan_result, status='completed'):
     """Update scan with complete scan result object.
     
     Args:
         scan_id (str): The ID of the scan to update
         scan_result (dict): Complete scan result object with all fields
+        status (str): 'completed', or 'cancelled' for a scan stopped early
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
     # Convert results to JSON string for storage
     results_json = json.dumps(scan_result)
 
-    cursor.execute(
-        'UPDATE scans SET domain = ?, start_time = ?, end_time = ?, results = ?, status = ? WHERE scan_id = ?',
-        (
-            scan_result.get('domain', ''),
-            scan_result.get('startTime', ''),
-            scan_result.get('endTime', ''),
-            results_json,
-            'completed',
-            scan_id
-        )
-    )
-
-    # If no rows were updated, this is a new scan, so insert it
-    if cursor.rowcount == 0:
+    with _connection() as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            'INSERT INTO scans (scan_id, domain, start_time, end_time, results, status) VALUES (?, ?, ?, ?, ?, ?)',
+            'UPDATE scans SET domain = ?, start_time = ?, end_time = ?, results = ?, status = ? WHERE scan_id = ?',
             (
-                scan_id,
                 scan_result.get('domain', ''),
                 scan_result.get('startTime', ''),
                 scan_result.get('endTime', ''),
                 results_json,
-                'completed'
+                status,
+                scan_id
             )
         )
 
-    conn.commit()
-    conn.close()
+        # If no rows were updated, this is a new scan, so insert it
+        if cursor.rowcount == 0:
+            cursor.execute(
+                'INSERT INTO scans (scan_id, domain, start_time, end_time, results, status) VALUES (?, ?, ?, ?, ?, ?)',
+                (
+                    scan_id,
+                    scan_result.get('domain', ''),
+                    scan_result.get('startTime', ''),
+                    scan_result.get('endTime', ''),
+                    results_json,
+                    status
+                )
+            )
 
 def get_all_scans():
     """Get all stored scans from the database."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute('SELECT scan_id, domain, start_time, end_time, results, status FROM scans')
-    rows = cursor.fetchall()
+    rows = _connection().execute(
+        'SELECT scan_id, domain, start_time, end_time, results, status FROM scans'
+    ).fetchall()
 
     scans = []
     for row in rows:
@@ -134,19 +183,72 @@ def get_all_scans():
             }
             scans.append(scan)
 
-    conn.close()
     return scans
 
+def _encode_cursor(start_time, scan_id):
+    raw = json.dumps([start_time, scan_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        start_time, scan_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(start_time), str(scan_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def list_scans(limit=50, cursor=None, domain=None, status=None):
+    """Get one page of scan summaries, newest first.
+
+    Only the summary object is extracted from each stored result (inside
+    SQLite), so the details lists are never loaded. Returns
+    (scans, next_cursor); next_cursor is None on the last page.
+    """
+    clauses = []
+    params = []
+    if domain:
+        clauses.append('domain = ?')
+        params.append(domain)
+    if status:
+        clauses.append('status = ?')
+        params.append(status)
+    if cursor:
+        clauses.append('(start_time, scan_id) < (?, ?)')
+        params.extend(_decode_cursor(cursor))
+
+    where = f"WHERE {' AND '.join(clauses)} " if clauses else ''
+    rows = _connection().execute(
+        "SELECT scan_id, domain, start_time, end_time, status, "
+        "CASE WHEN json_valid(results) THEN json_extract(results, '$.summary') END "
+        f"FROM scans {where}ORDER BY start_time DESC, scan_id DESC LIMIT ?",
+        (*params, limit + 1)
+    ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][2], rows[-1][0])
+
+    scans = []
+    for scan_id, scan_domain, start_time, end_time, scan_status, summary_json in rows:
+        scans.append({
+            'id': scan_id,
+            'domain': scan_domain,
+            'startTime': start_time,
+            'endTime': end_time,
+            'status': scan_status,
+            'summary': json.loads(summary_json) if summary_json else
+                {'subdomains': 0, 'emails': 0, 'ips': 0, 'socialProfiles': 0}
+        })
+
+    return scans, next_cursor
+
 def get_scan_by_id(scan_id):
     """Get a specific scan by ID."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute(
+    row = _connection().execute(
         'SELECT scan_id, domain, start_time, end_time, results, status FROM scans WHERE scan_id = ?',
         (scan_id,)
-    )
-    row = cursor.fetchone()
+    ).fetchone()
 
     if row:
         scan_id, domain, start_time, end_time, results_json, status = row
@@ -160,7 +262,6 @@ def get_scan_by_id(scan_id):
                 # Add scan_id if missing
                 if 'id' not in results:
                     results['id'] = scan_id
-                conn.close()
                 return results
             else:
                 # Otherwise construct a scan object from the database fields
@@ -173,7 +274,6 @@ def get_scan_by_id(scan_id):
                     'summary': {'subdomains': 0, 'emails': 0, 'ips': 0, 'socialProfiles': 0},
                     'details': {'subdomains': [], 'emails': [], 'ips': [], 'social_profiles': []}
                 }
-                conn.close()
                 return scan
         except (json.JSONDecodeError, TypeError):
             # Handle malformed JSON
@@ -186,8 +286,6 @@ def get_scan_by_id(scan_id):
                 'summary': {'subdomains': 0, 'emails': 0, 'ips': 0, 'socialProfiles': 0},
                 'details': {'subdomains': [], 'emails': [], 'ips': [], 'social_profiles': []}
             }
-            conn.close()
             return scan
 
-    conn.close()
     return None 
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""Worker pool that runs this app's queued scans (see backend/worker_pool.py).
+
+Run from the frontend directory:
+
+    python worker_pool.py [--workers 4] [--concurrency 8] [--db data/osint_scans.db]
+
+The pool is the backend's; run from here, it imports this app's storage
+and workers.
+"""
+import os
+import runpy
+
+import shared
+
+if __name__ == '__main__':
+    runpy.run_path(os.path.join(shared.BACKEND_DIR, 'worker_pool.py'), run_name='__main__')
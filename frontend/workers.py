@@ -1,16 +1,20 @@
 from datetime import datetime
 import subprocess
-import socket
-import dns.resolver
 import requests
 from bs4 import BeautifulSoup
-from storage import update_scan_results
+import shared  # the shared modules below live in backend/
+import async_storage
+import storage
+from resolver import AsyncResolver, addresses
+from tool_runner import stream_lines, parse_amass_line, TheHarvesterParser, ToolError
+from merge import FindingsMerger, KINDS
+from scheduler import parse_limits
 import time
 import asyncio
+import functools
 import json
-import uuid
 import os
-import re
+import uuid
 from typing import Dict, List, Any, Optional
 import logging
 from abc import ABC, abstractmethod
@@ -57,59 +61,21 @@ class TheHarvesterTool(OsintTool):
                 "python3", 
                 "/opt/theHarvester/theHarvester.py", 
                 "-d", self.domain,
-                "-b", sources,
-                "-f", f"/tmp/{self.domain}_theharvester"
+                "-b", sources
             ]
             
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                logger.error(f"theHarvester failed: {stderr.decode()}")
-                return self.result
-                
-            # Parse the output for useful information
-            output = stdout.decode()
-            
-            # Extract subdomains
-            subdomain_pattern = re.compile(r'(\w+\.)+' + re.escape(self.domain))
-            for line in output.splitlines():
-                matches = subdomain_pattern.findall(line)
-                for match in matches:
-                    if match.endswith(f".{self.domain}"):
-                        self.result.subdomains.add(match)
-            
-            # Extract emails
-            email_pattern = re.compile(r'[\w\.-]+@[\w\.-]+\.' + re.escape(self.domain.split('.')[-2]) + r'\.' + re.escape(self.domain.split('.')[-1]))
-            for line in output.splitlines():
-                matches = email_pattern.findall(line)
-                for match in matches:
-                    self.result.emails.add(match)
-            
-            # Parse JSON output if available
-            json_file = f"/tmp/{self.domain}_theharvester.json"
-            if os.path.exists(json_file):
-                with open(json_file, 'r') as f:
-                    data = json.load(f)
-                
-                if "hosts" in data:
-                    for host in data["hosts"]:
-                        # Extract IP and hostname
-                        if "ip" in host and "hostname" in host:
-                            self.result.ips.add(host["ip"])
-                            self.result.subdomains.add(host["hostname"])
-                
-                if "emails" in data:
-                    for email in data["emails"]:
-                        self.result.emails.add(email)
+            # Parse the report section by section as theHarvester prints it
+            parser = TheHarvesterParser(self.domain)
+            async for line in stream_lines(cmd):
+                for kind, value in parser.feed(line):
+                    getattr(self.result, kind).add(value)
             
             logger.info(f"theHarvester found {len(self.result.subdomains)} subdomains, {len(self.result.emails)} emails")
             return self.result
             
+        except ToolError as e:
+            logger.error(f"theHarvester failed: {str(e)}")
+            return self.result
         except Exception as e:
             logger.error(f"Error running theHarvester: {str(e)}")
             return self.result
@@ -119,68 +85,86 @@ class AmassTool(OsintTool):
     async def execute(self) -> OsintToolResult:
         logger.info(f"Running Amass against {self.domain}")
         try:
-            # Run Amass enum with default settings
-            output_file = f"/tmp/{self.domain}_amass.txt"
+            # Run Amass enum with default settings, JSON lines on stdout
             cmd = [
                 "amass",
                 "enum",
                 "-d", self.domain,
-                "-o", output_file
+                "-silent",
+                "-json", "/dev/stdout"
             ]
             
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                logger.error(f"Amass failed: {stderr.decode()}")
-                return self.result
+            async for line in stream_lines(cmd):
+                for kind, value in parse_amass_line(line, self.domain):
+                    getattr(self.result, kind).add(value)
             
-            # Read output file and extract subdomains
-            if os.path.exists(output_file):
-                with open(output_file, 'r') as f:
-                    for line in f:
-                        subdomain = line.strip()
-                        if subdomain:
-                            self.result.subdomains.add(subdomain)
-                
-                # Try to resolve IPs for the found subdomains
-                for subdomain in list(self.result.subdomains):
-                    try:
-                        ip = socket.gethostbyname(subdomain)
-                        self.result.ips.add(ip)
-                    except socket.gaierror:
-                        pass
+            # Resolve IPs for all found subdomains concurrently
+            records = await AsyncResolver().resolve_many(self.result.subdomains, rdtypes=("A", "AAAA"))
+            for subdomain_records in records.values():
+                self.result.ips.update(addresses(subdomain_records))
             
             logger.info(f"Amass found {len(self.result.subdomains)} subdomains, {len(self.result.ips)} IPs")
             return self.result
             
+        except ToolError as e:
+            logger.error(f"Amass failed: {str(e)}")
+            return self.result
         except Exception as e:
             logger.error(f"Error running Amass: {str(e)}")
             return self.result
 
+# Seconds a tool may run once it has a slot, and a whole scan may take
+# (tool slot waits included); the same settings as the backend's
+DEFAULT_TOOL_TIMEOUT = 900
+DEFAULT_SCAN_TIMEOUT = 3600
+
+def tool_timeout(name: str) -> Optional[int]:
+    """Seconds the named tool may run before it is stopped (None: no limit)
+
+    TOOL_TIMEOUT_SECONDS overrides the default for all tools and
+    TOOL_TIMEOUTS ("AmassTool=1800,TheHarvesterTool=600") for single tools;
+    0 means no limit.
+    """
+    timeouts = parse_limits(os.getenv("TOOL_TIMEOUTS"))
+    return timeouts.get(name, int(os.getenv("TOOL_TIMEOUT_SECONDS", DEFAULT_TOOL_TIMEOUT))) or None
+
+def scan_timeout() -> Optional[int]:
+    """Seconds a scan's tools may take in all (SCAN_TIMEOUT_SECONDS; None: no limit)"""
+    return int(os.getenv("SCAN_TIMEOUT_SECONDS", DEFAULT_SCAN_TIMEOUT)) or None
+
+async def run_tool(tool: OsintTool, timeout: Optional[int] = None):
+    """Run a tool, stopping it after timeout seconds with what it found so far
+
+    Returns (result, error); error is None unless the tool was stopped.
+    """
+    try:
+        return await asyncio.wait_for(tool.execute(), timeout), None
+    except asyncio.TimeoutError:
+        logger.warning(f"{tool.get_name()} timed out after {timeout:g} seconds")
+        return tool.result, f"{tool.get_name()} timed out after {timeout:g} seconds"
+
 # Strategy pattern for tool execution
 class ScanStrategy:
     """Strategy for executing different OSINT tools"""
     def __init__(self, tools: List[OsintTool]):
         self.tools = tools
     
-    async def execute(self) -> Dict[str, Any]:
-        """Execute all tools concurrently and merge results"""
+    async def execute(self, scan_id: Optional[str] = None, cancelled: Optional[asyncio.Event] = None) -> Dict[str, Any]:
+        """Execute all tools concurrently and merge results
+
+        Setting cancelled stops the tools; the scan is then stored as
+        'cancelled' with whatever they found so far.
+        """
         start_time = datetime.now().isoformat()
         
-        # Create a unique scan ID
-        scan_id = str(uuid.uuid4())
+        # Create a unique scan ID unless the scan was already queued under one
+        scan_id = scan_id or str(uuid.uuid4())
         
-        # Run all tools concurrently
-        tasks = [tool.execute() for tool in self.tools]
-        tool_results = await asyncio.gather(*tasks)
+        tool_results, errors = await self._run_tools(scan_id, cancelled)
         
         # Merge results
-        merged_result = self._merge_results(tool_results)
+        merged_result = self._merge_results(tool_results, [tool.get_name() for tool in self.tools])
+        merged_result["errors"] = errors
         
         end_time = datetime.now().isoformat()
         
@@ -200,38 +184,80 @@ class ScanStrategy:
         }
         
         # Update the scan results in storage
-        update_scan_results(scan_id, scan_result)
+        status = "cancelled" if cancelled is not None and cancelled.is_set() else "completed"
+        await async_storage.update_scan_results(scan_id, scan_result, status)
         
         return {"scanId": scan_id}
     
-    def _merge_results(self, tool_results: List[OsintToolResult]) -> Dict[str, List[str]]:
-        """Merge the results from multiple tools, removing duplicates"""
-        merged = {
-            "subdomains": [],
-            "emails": [],
-            "ips": [],
-            "social_profiles": []
-        }
-        
-        # Collect all unique findings
-        all_subdomains = set()
-        all_emails = set()
-        all_ips = set()
-        all_social_profiles = set()
-        
-        for result in tool_results:
-            all_subdomains.update(result.subdomains)
-            all_emails.update(result.emails)
-            all_ips.update(result.ips)
-            all_social_profiles.update(result.social_profiles)
+    async def _run_tools(self, scan_id: str, cancelled: Optional[asyncio.Event] = None):
+        """Run all tools concurrently, as the tool scheduler's slots allow
+
+        Each tool is stopped after tool_timeout(name) seconds of running, and
+        tools still going after scan_timeout() seconds in all, or once
+        cancelled is set, are stopped too. A stopped tool's child processes
+        are killed and what it found so far is kept. Returns (results,
+        errors), with the results in tool order.
+        """
+        scheduler = storage.tool_scheduler()
+        tasks = [
+            asyncio.create_task(scheduler.run(
+                tool.get_name(), functools.partial(run_tool, tool, tool_timeout(tool.get_name())), scan_id=scan_id
+            ))
+            for tool in self.tools
+        ]
+        timeout = scan_timeout()
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        stop = asyncio.ensure_future(cancelled.wait()) if cancelled is not None else None
+        stopped = None
+        pending = set(tasks)
+        try:
+            while pending:
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    stopped = f"the scan timed out after {timeout:g} seconds"
+                    break
+                done, _ = await asyncio.wait(
+                    pending | ({stop} if stop else set()), timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                pending.difference_update(done)
+                if stop in done:
+                    stopped = "the scan was cancelled"
+                    break
+        finally:
+            # Stop whatever is still running, also when this scan is cancelled
+            if stop is not None:
+                stop.cancel()
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
         
-        # Convert back to sorted lists
-        merged["subdomains"] = sorted(list(all_subdomains))
-        merged["emails"] = sorted(list(all_emails))
-        merged["ips"] = sorted(list(all_ips))
-        merged["social_profiles"] = sorted(list(all_social_profiles))
+        results = []
+        errors = []
+        for tool, task in zip(self.tools, tasks):
+            if task.cancelled():
+                results.append(tool.result)
+                errors.append(f"{tool.get_name()} was stopped: {stopped}")
+            elif task.exception() is not None:
+                results.append(tool.result)
+                errors.append(f"{tool.get_name()} failed: {task.exception()}")
+            else:
+                result, error = task.result()
+                results.append(result)
+                if error:
+                    errors.append(error)
+        return results, errors
+    
+    def _merge_results(self, tool_results: List[OsintToolResult],
+                       tool_names: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """Merge the results from multiple tools, removing duplicates in normalized form"""
+        tool_names = tool_names or [str(index) for index in range(len(tool_results))]
+        merger = FindingsMerger(tool_names)
+        for name, result in zip(tool_names, tool_results):
+            merger.add(name, {kind: getattr(result, kind) for kind in KINDS})
         
-        return merged
+        # Sorted lists, as before
+        return {kind: sorted(values) for kind, values in merger.findings.items()}
 
 # Factory for creating tool instances
 class OsintToolFactory:
@@ -258,7 +284,8 @@ class OsintToolFactory:
         return tools
 
 # Main function to start a scan
-async def start_scan(domain: str, options: Optional[Dict[str, bool]] = None) -> Dict[str, str]:
+async def start_scan(domain: str, options: Optional[Dict[str, bool]] = None,
+                     scan_id: Optional[str] = None, cancelled: Optional[asyncio.Event] = None) -> Dict[str, str]:
     """Start a scan with the specified tools"""
     # Create tools based on options
     tools = OsintToolFactory.create_tools(domain, options)
@@ -270,4 +297,10 @@ async def start_scan(domain: str, options: Optional[Dict[str, bool]] = None) ->
     strategy = ScanStrategy(tools)
     
     # Execute the scan
-    return await strategy.execute() 
\ No newline at end of file
+    return await strategy.execute(scan_id, cancelled)
+
+async def run_job(job: Dict[str, Any]) -> None:
+    """Run a scan job claimed from storage.scan_queue() (see worker_pool.py)"""
+    payload = job["payload"]
+    await start_scan(payload["domain"], payload.get("options"), scan_id=job["scan_id"],
+                     cancelled=job.get("cancel_requested"))